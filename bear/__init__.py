@@ -1,8 +1,11 @@
-import json
-import os
+import concurrent.futures
+import contextvars
 import re
-import tbx
 from bear import verinfo
+from bear.decode import iter_array, loads, parse, wrapped
+from bear.tags import note_tags, split_tags
+from bear.transport import default_transport, xcall_path
+from bear.url import FilePayload, build, payload, quote, split_text, stream
 
 """
 a - entry added
@@ -48,14 +51,48 @@ class Bear(object):
         https://bear.app/faq/X-callback-url%20Scheme%20documentation/
 
     as of 2019-01-09.
+
+    Urls are delivered by a transport (see bear.transport). By default that's
+    xcall; pass transport=bear.fake.FakeTransport() (or set
+    $BEAR_TRANSPORT=fake) to work against an in-memory database instead.
+
+    If a *reader* (e.g., bear.db.BearDB) is given, open_note, open_tag,
+    search and tags are answered by it rather than through a url. If a
+    *cache* (bear.cache.NoteCache) is given, open_note results are kept in
+    it and reused while the note is unchanged. If a *tagindex*
+    (bear.tags.TagIndex) is given, has_tag and idemp_add consult it before
+    fetching a note. If a *searchindex* (bear.search.SearchIndex) is given,
+    notes we open are indexed and search(local=True) is answered from it.
+    With *objects*, open_note returns bear.note.Note objects and search and
+    open_tag return bear.note.NoteSummary objects instead of dicts. If
+    *metrics* (bear.metrics.Metrics) is given, every call is counted and
+    timed in it. If *policy* (bear.policy.Policy) is given, failed calls are
+    retried and a circuit breaker trips when Bear stops answering. If a
+    *journal* (bear.writebehind.Journal) is given, writes are recorded in it
+    and return an Entry at once, and a background thread sends them on.
     """
 
     # -------------------------------------------------------------------------
-    def __init__(self):
+    def __init__(self, transport=None, reader=None, cache=None,
+                 tagindex=None, searchindex=None, objects=False,
+                 metrics=None, policy=None, journal=None):
         """
         Initialize the object
         """
-        pass
+        self.transport = transport or default_transport()
+        self.reader = reader
+        self.cache = cache
+        self.tagindex = tagindex
+        self.searchindex = searchindex
+        self.objects = objects
+        self.metrics = metrics
+        self.policy = policy
+        self.journal = journal
+        self._batch = None
+        if self.transport.token:
+            self.token_value = self.transport.token
+        if journal is not None:
+            journal.attach(self)
 
     # -------------------------------------------------------------------------
     def add_file(self, id=None, title=None, content=None, header=None,
@@ -64,6 +101,12 @@ class Bear(object):
         /add-file
             append or prepend a file to a note identified by its title or id.
 
+            *content* is passed as the file parameter. It may be a str or
+            bytes that is already base64, or a path (os.PathLike, e.g.
+            pathlib.Path) or binary file object, which is memory-mapped and
+            encoded a chunk at a time into the url. With a path or named
+            file, *filename* defaults to its base name.
+
         parameters
             id (optional): note unique identifier.
             title (optional): note title.
@@ -98,6 +141,9 @@ class Bear(object):
         """
         if content is None:
             raise Bearror("add_file requires content argument")
+        content = payload(content)
+        if filename is None and isinstance(content, FilePayload):
+            filename = content.name()
         if filename is None:
             raise Bearror("add_file requires filename argument")
 
@@ -222,6 +268,76 @@ class Bear(object):
         result = self._url_xcall('archive', **kw)
         return result
 
+    # -------------------------------------------------------------------------
+    def archive_older_than(self, age, tag=None, exclude_pinned=True):
+        """
+        Return a plan (bear.archiver.Plan) to archive the live notes (under
+        *tag*, if given) not modified in *age* (a timedelta, or a number of
+        days). Pinned notes are left out unless *exclude_pinned* is False.
+        Nothing is archived until the plan's execute() is called, so
+        describe() gives a dry run.
+        """
+        from bear.archiver import plan
+        return plan(self, age, tag=tag, exclude_pinned=exclude_pinned)
+
+    # -------------------------------------------------------------------------
+    def batch(self):
+        """
+        Return a Batch (see bear.batch) to use as a context manager. Inside
+        it, add_text, archive and trash are queued rather than sent, and
+        consecutive appends or prepends to the same note go out as one url
+        when the batch is flushed.
+        """
+        from bear.batch import Batch
+        return Batch(self)
+
+    # -------------------------------------------------------------------------
+    def bulk_idemp_add(self, ids, tags, parallel=4):
+        """
+        Make sure every note in *ids* has every tag in *tags* (a list or a
+        comma separated string). Duplicate ids are handled once. Each note's
+        tags come from the tag index if it knows the note, or else from one
+        open_note, and are checked against all of *tags* at once; each note
+        missing any tags gets one add_text call. Up to *parallel* notes are
+        worked on at once.
+
+        Return a dict mapping each id to {'added': [...], 'present': [...],
+        'error': None or the message}.
+        """
+        if isinstance(tags, str):
+            tags = split_tags(tags)
+        ids = list(dict.fromkeys(ids))
+        if self._batch:
+            parallel = 1
+
+        def check_and_add(id):
+            rval = {'added': [], 'present': [], 'error': None}
+            have = self._tags_of(id)
+            for tag in tags:
+                if tag.lstrip("#") in have:
+                    rval['present'].append(tag)
+                else:
+                    rval['added'].append(tag)
+            if rval['added']:
+                self.add_text(id=id, text="", mode="append",
+                              tags=",".join(rval['added']))
+            return rval
+
+        def one(id):
+            try:
+                if self.policy is not None:
+                    return self.policy.guarded(lambda: check_and_add(id))
+                return check_and_add(id)
+            except Bearror as err:
+                return {'added': [], 'present': [], 'error': str(err)}
+
+        # each task runs in a copy of our context, so a priority set by the
+        # caller (see bear.scheduler) applies in the pool's threads too
+        with concurrent.futures.ThreadPoolExecutor(parallel) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, one, id)
+                       for id in ids]
+            return {id: fut.result() for id, fut in zip(ids, futures)}
+
     # -------------------------------------------------------------------------
     def change_font(self, font):
         """
@@ -244,7 +360,7 @@ class Bear(object):
         if font not in ["Avenir Next", "System", "Helvetica Neue",
                         "Menlo", "Georgia", "Courier", "Open Dyslexic"]:
             raise Bearror("Font '{}' is not supported".format(font))
-        result = self._url_xcall('change-font', font=self._url_quote(font))
+        result = self._url_xcall('change-font', font=font)
         return result
 
     # -------------------------------------------------------------------------
@@ -274,7 +390,7 @@ class Bear(object):
                          "Duotone Snow", "Dieci", "Ayu", "Dark Graphite",
                          "Duotone Heat"]:
             raise Bearror("Theme '{}' is not supported".format(theme))
-        result = self._url_xcall('change-theme', theme=self._url_quote(theme))
+        result = self._url_xcall('change-theme', theme=theme)
         return result
 
     # -------------------------------------------------------------------------
@@ -290,7 +406,8 @@ class Bear(object):
             title (optional): note title.
             text (optional): note body.
             tags (optional): a comma separated list of tags.
-            file (optional): base64 representation of a file.
+            file (optional): base64 representation of a file (or a path or
+                binary file object, as for add_file()).
             filename (optional): file name with extension. Both file and
                 filename are required to successfully add a file.
             open_note (optional): if no do not display the new note in Bear's
@@ -325,7 +442,9 @@ class Bear(object):
         if tags:
             kw['tags'] = tags
         if file:
-            kw['file'] = file
+            kw['file'] = payload(file)
+            if filename is None and isinstance(kw['file'], FilePayload):
+                filename = kw['file'].name()
         if filename:
             kw['filename'] = filename
         if pin:
@@ -390,29 +509,32 @@ class Bear(object):
     # -------------------------------------------------------------------------
     def has_tag(self, id, tag):
         """
-        Open the note and check for the tag. If it is present, return True.
-        Otherwise, return False.
+        Check the note for the tag. If it is present, return True.
+        Otherwise, return False. If the tag index knows the note, it
+        answers; if not, we open the note.
         """
-        if tag[0] != "#":
-            tag = "#" + tag
+        tag = tag.lstrip("#")
+        if self.tagindex is not None:
+            rval = self.tagindex.has_tag(id, tag)
+            if rval is not None:
+                return rval
         content = self.open_note(id=id)
-        return tag in content["note"]
+        return tag in note_tags(content["note"])
 
     # -------------------------------------------------------------------------
     def idemp_add(self, id=None, tag=None):
         """
-        Open the note and check for the tag. If it is present, do nothing and
-        return False. Otherwise, add the tag to the note and return True.
+        Check the note for the tag (see has_tag). If it is present, do nothing
+        and return False. Otherwise, add the tag to the note and return True.
+
+        Since the check comes first, this is safe to repeat, and with a
+        policy it is retried as a whole if the add-text fails transiently.
         """
-        rval = False
         if tag is None or id is None:
-            return rval
-        t_hash = "#"
-        content = self.open_note(id=id)
-        if t_hash + tag not in content["note"]:
-            rval = True
-            self.add_text(id=id, text="", tags=tag, mode="append")
-        return rval
+            return False
+        if self.policy is not None:
+            return self.policy.guarded(lambda: self._idemp_add(id, tag))
+        return self._idemp_add(id, tag)
 
     # -------------------------------------------------------------------------
     def open_note(self, id=None, title=None, new_window=None, show_window=None,
@@ -450,6 +572,17 @@ class Bear(object):
         if id is None and title is None:
             raise Bearror("either id or title is required")
 
+        quiet = "yes" not in [new_window, show_window]
+        if self.cache is not None and id and quiet:
+            result = self.cache.get(id)
+            if result:
+                return self._note(result)
+
+        if self.reader and quiet:
+            result = self.reader.open_note(id=id, title=title,
+                                           exclude_trashed=exclude_trashed)
+            return self._learn(result)
+
         kw = {}
         if id:
             kw['id'] = id
@@ -468,14 +601,17 @@ class Bear(object):
             kw['new_window'] = new_window
 
         result = self._url_xcall('open-note', **kw)
-        return result
+        return self._learn(result)
 
     # -------------------------------------------------------------------------
-    def open_tag(self, name):
+    def open_tag(self, name, lazy=False):
         """
         /open-tag
             Get a list of all the notes which have a selected tag in bear.
 
+            With lazy=True, an iterator over the summaries comes back
+            instead of a list, and they are decoded as it's consumed.
+
         parameters
             name (required): tag name.
             token (optional): application token.
@@ -495,14 +631,18 @@ class Bear(object):
          * exclude_trashed does not work for open_tag, though it does not cause
            the API function to fail
         """
+        if self.reader:
+            return self._validate(self.reader.open_tag(name), lazy)
         try:
             result = self._url_xcall('open-tag',
+                                     lazy=lazy,
                                      name=name,
                                      token=self._token())
         except Bearror as err:
             if "The tag could not be found" in str(err):
                 raise Bearror("Tag '{}' was not found".format(name))
-        return result
+            raise
+        return self._validate(result, lazy)
 
     # -------------------------------------------------------------------------
     def raw_url(self, url):
@@ -532,11 +672,18 @@ class Bear(object):
         return result
 
     # -------------------------------------------------------------------------
-    def search(self, term=None, tag=None, show_window=None):
+    def search(self, term=None, tag=None, show_window=None, local=False,
+               k=20, lazy=False):
         """
         /search
             Show search results in Bear for all notes or for a specific tag.
 
+            With local=True, the search index answers instead of Bear: the
+            *k* best matches for *term*, ranked, each with a 'score'.
+
+            With lazy=True, an iterator over the summaries comes back
+            instead of a list, and they are decoded as it's consumed.
+
         parameters
             term (optional): string to search.
             tag (optional): tag to search into.
@@ -554,6 +701,14 @@ class Bear(object):
         example
             bear://x-callback-url/search?term=nemo&tag=movies
         """
+        if local:
+            if self.searchindex is None:
+                raise Bearror("local search needs a search index")
+            return self._validate(self.searchindex.query(term, k=k, tag=tag),
+                                  lazy)
+        if self.reader and show_window != "yes":
+            return self._validate(self.reader.search(term=term, tag=tag),
+                                  lazy)
         kw = {}
         if term:
             kw['term'] = term
@@ -564,8 +719,8 @@ class Bear(object):
         else:
             kw['show_window'] = "no"
         kw['token'] = self._token()
-        result = self._url_xcall('search', **kw)
-        return result
+        result = self._url_xcall('search', lazy=lazy, **kw)
+        return self._validate(result, lazy)
 
     # -------------------------------------------------------------------------
     def tags(self):
@@ -582,6 +737,8 @@ class Bear(object):
         example
             bear://x-callback-url/tags?token=123456-123456-123456
         """
+        if self.reader:
+            return self.reader.tags()
         result = self._url_xcall('tags', token=self._token())
         tags_l = [_['name'] for _ in result]
         return tags_l
@@ -696,6 +853,85 @@ class Bear(object):
         """
         return verinfo._v
 
+    # -------------------------------------------------------------------------
+    def _forget(self, cmd, kw):
+        """
+        *cmd* (with *kw*) has just gone to Bear and changed a note (or some
+        unknown set of notes), so drop what the cache and search index hold
+        of it. This is done on delivery, not when the write is queued in a
+        batch or journal: a read in between would cache the old note again.
+        """
+        if cmd not in ['add-file', 'add-text', 'archive', 'delete-tag',
+                       'rename-tag', 'trash']:
+            return
+        if self.searchindex is not None and cmd in ['archive', 'trash'] \
+           and kw.get('id'):
+            self.searchindex.remove(kw['id'])
+        if self.cache is None:
+            return
+        if cmd in ['delete-tag', 'rename-tag'] or kw.get('search'):
+            self.cache.clear()
+        else:
+            self.cache.forget(id=kw.get('id'), title=kw.get('title'))
+
+    # -------------------------------------------------------------------------
+    def _idemp_add(self, id, tag):
+        """
+        Add *tag* to note *id* unless it's there. Return True if we added it.
+        """
+        if self.has_tag(id, tag):
+            return False
+        self.add_text(id=id, text="", tags=tag, mode="append")
+        return True
+
+    # -------------------------------------------------------------------------
+    def _index(self, cmd, kw, result):
+        """
+        Bring the tag index up to date with a write Bear has just carried
+        out. This is called as *cmd* is delivered, not when it's queued in
+        a batch or journal, so a write that never lands leaves no trace.
+        """
+        if self.tagindex is None:
+            return
+        if cmd == 'add-text' and kw.get('id'):
+            if isinstance(result, dict) and 'note' in result:
+                self.tagindex.update(kw['id'], result['note'],
+                                     result.get('modificationDate'))
+            elif kw.get('mode') in ["append", "prepend"] and kw.get('tags'):
+                self.tagindex.add(kw['id'], split_tags(kw['tags']))
+            else:
+                self.tagindex.remove(kw['id'])
+        elif cmd == 'delete-tag':
+            self.tagindex.rename(kw['name'])
+        elif cmd == 'rename-tag':
+            self.tagindex.rename(kw['name'], kw['new_name'])
+
+    # -------------------------------------------------------------------------
+    def _learn(self, note):
+        """
+        Feed an open_note result to the cache and indexes, and return it (as
+        a Note, if we're handing out objects)
+        """
+        if isinstance(note, dict) and 'note' in note:
+            if self.cache is not None:
+                self.cache.put(note)
+            if self.tagindex is not None:
+                self.tagindex.update(note['identifier'], note['note'],
+                                     note.get('modificationDate'))
+            if self.searchindex is not None and note['is_trashed'] == "no":
+                self.searchindex.add(note)
+        return self._note(note)
+
+    # -------------------------------------------------------------------------
+    def _note(self, note):
+        """
+        Return an open_note result as a Note if we're handing out objects
+        """
+        if self.objects and isinstance(note, dict) and 'note' in note:
+            from bear.note import Note
+            return Note(note)
+        return note
+
     # -------------------------------------------------------------------------
     def _token(self):
         """
@@ -708,12 +944,30 @@ class Bear(object):
         return rval
 
     # -------------------------------------------------------------------------
-    def _url_xcall(self, cmd, **kw):
+    def _send(self, cmd, kw, lazy=False):
         """
-        Build the url and pass it to xcall
+        Build the url(s) for *cmd* and pass them to xcall, returning the last
+        result
         """
-        url = self._url(cmd, **kw)
-        result = self._xcall(url)
+        try:
+            for url, pieces in self._urls(cmd, kw):
+                result = self._xcall(url, pieces, lazy)
+        finally:
+            self._forget(cmd, kw)
+        self._index(cmd, kw, result)
+        return result
+
+    # -------------------------------------------------------------------------
+    def _url_xcall(self, cmd, lazy=False, **kw):
+        """
+        Build the url and pass it to xcall (or to the active batch, or the
+        journal). With *lazy*, a list reply comes back as an iterator.
+        """
+        if self._batch:
+            return self._batch.route(cmd, kw, lazy)
+        if self.journal is not None:
+            return self.journal.route(cmd, kw, lazy)
+        result = self._send(cmd, kw, lazy)
         return result
 
     # -------------------------------------------------------------------------
@@ -721,56 +975,171 @@ class Bear(object):
         """
         Build a bear url
         """
-        rval = "bear://x-callback-url/{}".format(cmd)
-        sep = "?"
-        for key in kw:
-            rval += "{}{}={}".format(sep, key, self._url_quote(kw[key]))
-            sep = "&"
-        return rval
+        return build(cmd, kw)
 
     # -------------------------------------------------------------------------
     def _url_quote(self, kv):
         """
-        Encode *kv* so that it won't freqk out Bear's URL processor
+        Encode *kv* so that it won't freak out Bear's URL processor
         """
-        hexf = "%{:02x}"
+        return quote(kv)
 
-        # characters that have been tested and do not need url quoting (at
-        # least for add_text): /, =, ', [, ], (, ), ., $, <comma>, *, -,
-        #                      !, @, +, ?, ~
-        clist = ["%", " ", "#", "\"", "\n", "\t", ">",
-                 "<", "^", "&", "{", "}", "|", "\\", "`"]
-        replables = {_: hexf.format(ord(_)) for _ in clist}
-        for char in replables:
-            if isinstance(kv, bytes):
-                kv = kv.replace(char.encode(), replables[char].encode())
-            else:
-                kv = kv.replace(char, replables[char])
-        return kv
+    # -------------------------------------------------------------------------
+    def _urls(self, cmd, kw):
+        """
+        Return (url, pieces) pairs that carry *cmd* with *kw*. Usually
+        that's one url and pieces is None, but an add-text too long for the
+        transport is split at newlines. The parts go out in order (reversed
+        for prepend, so they land in order), the replace modes replace with
+        the first part and append the rest, and the tags ride on the last
+        part of text.
+
+        If *kw* holds a file payload, pieces yields the url a chunk at a
+        time for transport.stream() (which joins it) and url leaves the
+        file out. A file that can't fit in a url is refused before any of
+        it is encoded.
+        """
+        limit = self.transport.max_url
+        files = [_ for _ in kw.values() if isinstance(_, FilePayload)]
+        if files:
+            url = self._url(cmd, **{k: "" if isinstance(v, FilePayload) else v
+                                    for k, v in kw.items()})
+            need = len(url) + sum(_.encoded_size() or 0 for _ in files)
+            if limit is not None and limit < need:
+                raise Bearror("A {} url of at least {} characters is longer "
+                              "than the {} the transport can carry"
+                              "".format(cmd, need, limit))
+            return [(url, stream(cmd, kw))]
+
+        url = self._url(cmd, **kw)
+        if limit is None or len(url) <= limit:
+            return [(url, None)]
+        if cmd != 'add-text':
+            raise Bearror("A {} url of {} characters is longer than the {} "
+                          "the transport can carry"
+                          "".format(cmd, len(url), limit))
+        budget = limit - len(self._url(cmd, **dict(kw, text="")))
+        try:
+            pieces = split_text(kw['text'], budget)
+        except ValueError as err:
+            raise Bearror(str(err))
+        rval = []
+        for idx, piece in enumerate(pieces):
+            part = dict(kw, text=piece)
+            if idx < len(pieces) - 1:
+                part.pop('tags', None)
+            if 0 < idx and part['mode'] in ["replace", "replace_all"]:
+                part['mode'] = "append"
+            rval.append((self._url(cmd, **part), None))
+        if kw['mode'] == "prepend":
+            rval.reverse()
+        return rval
+
+    # -------------------------------------------------------------------------
+    def _tags_of(self, id):
+        """
+        Return the set of note *id*'s tags, from the tag index if it knows
+        the note, or else by opening it
+        """
+        if self.tagindex is not None:
+            rval = self.tagindex.tags_of(id)
+            if rval is not None:
+                return rval
+        return note_tags(self.open_note(id=id)["note"])
+
+    # -------------------------------------------------------------------------
+    def _validate(self, summaries, lazy=False):
+        """
+        Check the cache and tag index against a list of note summaries and
+        return the list (or, with *lazy*, an iterator over it), made of
+        NoteSummary objects if we're handing out objects. An iterator is
+        checked an item at a time as it's consumed.
+        """
+        keepers = [_ for _ in (self.cache, self.tagindex) if _ is not None]
+        if keepers and isinstance(summaries, list):
+            for keeper in keepers:
+                keeper.validate(summaries)
+        elif keepers and lazy:
+            summaries = self._validate_each(summaries, keepers)
+        if self.objects and (lazy or isinstance(summaries, list)):
+            from bear.note import NoteSummary
+            summaries = (NoteSummary(_, self) for _ in summaries)
+            return summaries if lazy else list(summaries)
+        return iter(summaries) if lazy else summaries
 
     # -------------------------------------------------------------------------
-    def _xcall(self, url):
+    def _validate_each(self, summaries, keepers):
         """
-        Run xcall and pass it a url
+        Yield *summaries*, checking each against *keepers* (the cache and
+        tag index) on the way
+        """
+        for item in summaries:
+            for keeper in keepers:
+                keeper.validate([item])
+            yield item
+
+    # -------------------------------------------------------------------------
+    def _xcall(self, url, pieces=None, lazy=False):
+        """
+        Pass a url to the transport (streaming *pieces* instead, if given)
+        and decode the reply, under the policy if we have one
+        """
+        if self.policy is not None:
+            return self.policy.call(url, lambda: self._xcall_once(url, pieces,
+                                                                  lazy))
+        return self._xcall_once(url, pieces, lazy)
+
+    # -------------------------------------------------------------------------
+    def _xcall_once(self, url, pieces=None, lazy=False):
+        """
+        Make one trip to the transport with a url and decode the reply
+        """
+        if self.metrics is None:
+            return self._decode(url, self._deliver(url, pieces), lazy)
+        with self.metrics.call(url, self.transport) as probe:
+            result = self._deliver(url, pieces)
+            probe.replied(result)
+            return self._decode(url, result, lazy)
+
+    # -------------------------------------------------------------------------
+    def _deliver(self, url, pieces=None):
+        """
+        Hand a url (or its *pieces*) to the transport and return the reply
+        """
+        if pieces is None:
+            return self.transport.call(url)
+        return self.transport.stream(pieces)
+
+    # -------------------------------------------------------------------------
+    def _decode(self, url, result, lazy=False):
+        """
+        Turn the reply to *url* into python data, raising Bearror if Bear
+        reported an error. With *lazy*, a list reply is returned as an
+        iterator that decodes its elements as they're consumed.
         """
-        result = tbx.run("{} -url \"{}\"".format(self._xcall_path(), url))
         if result == '':
             return result
-        while type(result) == str:
-            result = json.loads(result)
+        result = parse(result)
         if 'errorMessage' in result:
+            from bear.policy import classify
             msg = result['errorMessage']
+            kind = classify(Bearror(msg))
             if 'tag' in msg:
                 q = re.findall("tag=([^&]+)", url)
                 if q:
                     tag = q[0]
                     msg = msg.replace('tag ', 'tag ' + tag + ' ')
-            raise Bearror(msg)
+            err = Bearror(msg)
+            err.kind = kind
+            raise err
         elif 'note' in result:
             pass
-        elif '' in result.keys() and len(result) == 2:
-            [other] = [_ for _ in result.keys() if _ != '']
-            result = json.loads(result[other])
+        else:
+            key = wrapped(result)
+            if key and lazy:
+                result = iter_array(result[key])
+            elif key:
+                result = loads(result[key])
         return result
 
     # -------------------------------------------------------------------------
@@ -778,9 +1147,7 @@ class Bear(object):
         """
         This method stores and provides the path to the xcall program
         """
-        path = os.path.join("$HOME/prj/bear/ulysses-python-client/lib",
-                            "xcall.app", "Contents", "MacOS", "xcall")
-        return os.path.expandvars(path)
+        return getattr(self.transport, 'path', xcall_path())
 
 
 class Bearror(Exception):
@@ -6,6 +6,15 @@ Usage:
     bear tags [-d] [-v]
     bear rename-tag [-d] OLD NEW
     bear trash [-d] [-t TITLE | -i NOTE_ID]
+    bear stats [-d] [--prom | --json] [FILE]
+    bear serve [-d] [-s SOCKET] [-p POOL]
+    bear client [-d] [-s SOCKET] METHOD [ARG...]
+
+Options:
+    -s SOCKET, --socket SOCKET  daemon socket (default: $BEAR_SOCKET or
+                                ~/.bear.sock)
+    -p POOL, --pool POOL        xcall runs the daemon makes at once
+                                [default: 4]
 
 Need to write:
     bear open-note
@@ -26,6 +35,8 @@ Need to write:
 
 """
 from docopt_dispatch import dispatch
+from bear.metrics import Metrics, default_path
+from bear.serve import BearClient, BearServer
 
 import json
 import os
@@ -59,6 +70,66 @@ def bear_trash(**kw):
 
 
 
+# -----------------------------------------------------------------------------
+@dispatch.on('stats')
+def bear_stats(**kw):
+    """
+    Show the call metrics recorded in kw['FILE'] (default:
+    ~/.bear-metrics.json) as a table, Prometheus text, or JSON
+    """
+    if kw['d']:
+        pdb.set_trace()
+    path = kw['FILE'] or default_path()
+    if not os.path.exists(path):
+        print("No metrics in {}".format(path))
+        return
+    metrics = Metrics.load(path)
+    if kw['prom']:
+        print(metrics.prometheus(), end="")
+    elif kw['json']:
+        print(json.dumps(metrics.to_dict(), indent=2, sort_keys=True))
+    else:
+        print(metrics.summary())
+
+
+# -----------------------------------------------------------------------------
+@dispatch.on('serve')
+def bear_serve(**kw):
+    """
+    Run the bear daemon on kw['socket'] (default: $BEAR_SOCKET or
+    ~/.bear.sock), making up to kw['pool'] xcall runs at once, until
+    interrupted
+    """
+    if kw['d']:
+        pdb.set_trace()
+    server = BearServer(kw['socket'], pool=int(kw['pool']))
+    print("Serving on {}".format(server.path))
+    server.serve_forever()
+
+
+# -----------------------------------------------------------------------------
+@dispatch.on('client')
+def bear_client(**kw):
+    """
+    Call kw['METHOD'] through the bear daemon and show the result. ARGs of
+    the form key=value are passed by keyword, the rest in order.
+    """
+    if kw['d']:
+        pdb.set_trace()
+    args, opts = [], {}
+    for arg in kw['ARG']:
+        if "=" in arg:
+            name, value = arg.split("=", 1)
+            opts[name] = value
+        else:
+            args.append(arg)
+    client = BearClient(kw['socket'])
+    try:
+        print(json.dumps(client.call(kw['METHOD'], *args, **opts), indent=2))
+    finally:
+        client.close()
+
+
 # -----------------------------------------------------------------------------
 @dispatch.on('rename-tag')
 def bear_rename_tag(**kw):
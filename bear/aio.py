@@ -0,0 +1,261 @@
+"""
+AsyncBear is an asyncio flavor of Bear. Each endpoint is a coroutine, urls
+go out through the transport's acall() (for xcall, that's
+asyncio.create_subprocess_exec), and a semaphore caps how many calls are
+outstanding at once, so hundreds of reads can be fanned out with
+asyncio.gather() without a thread per call.
+"""
+import asyncio
+import inspect
+from bear import Bear, Bearror
+from bear.tags import note_tags, split_tags
+
+
+class AsyncBear(Bear):
+    """
+    Argument checking and url building are inherited from Bear; only the
+    trip to the transport (and anything that looks at its result) differs.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, transport=None, reader=None, concurrency=16,
+                 metrics=None):
+        """
+        Initialize the object. At most *concurrency* urls are in flight at
+        any moment.
+        """
+        Bear.__init__(self, transport, reader, metrics=metrics)
+        self.concurrency = concurrency
+        self._sem = None
+
+    # -------------------------------------------------------------------------
+    async def add_file(self, *args, **kw):
+        """
+        See Bear.add_file()
+        """
+        return await self._await(Bear.add_file(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def add_text(self, *args, **kw):
+        """
+        See Bear.add_text()
+        """
+        return await self._await(Bear.add_text(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def archive(self, *args, **kw):
+        """
+        See Bear.archive()
+        """
+        return await self._await(Bear.archive(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    def batch(self):
+        """
+        Batches send their queue synchronously, so they're not available
+        here. Use asyncio.gather() to overlap calls instead.
+        """
+        raise Bearror("AsyncBear does not support batch()")
+
+    # -------------------------------------------------------------------------
+    async def bulk_idemp_add(self, ids, tags):
+        """
+        See Bear.bulk_idemp_add(). Parallelism is bounded by the
+        concurrency semaphore.
+        """
+        if isinstance(tags, str):
+            tags = split_tags(tags)
+        ids = list(dict.fromkeys(ids))
+
+        async def one(id):
+            rval = {'added': [], 'present': [], 'error': None}
+            try:
+                have = None
+                if self.tagindex is not None:
+                    have = self.tagindex.tags_of(id)
+                if have is None:
+                    content = await self.open_note(id=id)
+                    have = note_tags(content["note"])
+                for tag in tags:
+                    if tag.lstrip("#") in have:
+                        rval['present'].append(tag)
+                    else:
+                        rval['added'].append(tag)
+                if rval['added']:
+                    await self.add_text(id=id, text="", mode="append",
+                                        tags=",".join(rval['added']))
+            except Bearror as err:
+                rval['error'] = str(err)
+            return rval
+
+        return dict(zip(ids, await asyncio.gather(*[one(_) for _ in ids])))
+
+    # -------------------------------------------------------------------------
+    async def change_font(self, *args, **kw):
+        """
+        See Bear.change_font()
+        """
+        return await self._await(Bear.change_font(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def change_theme(self, *args, **kw):
+        """
+        See Bear.change_theme()
+        """
+        return await self._await(Bear.change_theme(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def create(self, *args, **kw):
+        """
+        See Bear.create()
+        """
+        return await self._await(Bear.create(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def delete_tag(self, *args, **kw):
+        """
+        See Bear.delete_tag()
+        """
+        return await self._await(Bear.delete_tag(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def has_tag(self, id, tag):
+        """
+        See Bear.has_tag()
+        """
+        content = await self.open_note(id=id)
+        return tag.lstrip("#") in note_tags(content["note"])
+
+    # -------------------------------------------------------------------------
+    async def idemp_add(self, id=None, tag=None):
+        """
+        See Bear.idemp_add()
+        """
+        rval = False
+        if tag is None or id is None:
+            return rval
+        if not await self.has_tag(id, tag):
+            rval = True
+            await self.add_text(id=id, text="", tags=tag, mode="append")
+        return rval
+
+    # -------------------------------------------------------------------------
+    async def open_note(self, *args, **kw):
+        """
+        See Bear.open_note()
+        """
+        return await self._await(Bear.open_note(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def open_tag(self, name, lazy=False):
+        """
+        See Bear.open_tag()
+        """
+        if self.reader:
+            return self._validate(self.reader.open_tag(name), lazy)
+        try:
+            result = await self._url_xcall('open-tag', lazy=lazy, name=name,
+                                           token=self._token())
+        except Bearror as err:
+            if "The tag could not be found" in str(err):
+                raise Bearror("Tag '{}' was not found".format(name))
+            raise
+        return result
+
+    # -------------------------------------------------------------------------
+    async def raw_url(self, url):
+        """
+        See Bear.raw_url()
+        """
+        return await self._xcall(url)
+
+    # -------------------------------------------------------------------------
+    async def rename_tag(self, *args, **kw):
+        """
+        See Bear.rename_tag()
+        """
+        return await self._await(Bear.rename_tag(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def search(self, *args, **kw):
+        """
+        See Bear.search()
+        """
+        return await self._await(Bear.search(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def tags(self):
+        """
+        See Bear.tags()
+        """
+        if self.reader:
+            return self.reader.tags()
+        result = await self._url_xcall('tags', token=self._token())
+        return [_['name'] for _ in result]
+
+    # -------------------------------------------------------------------------
+    async def trash(self, *args, **kw):
+        """
+        See Bear.trash()
+        """
+        return await self._await(Bear.trash(self, *args, **kw))
+
+    # -------------------------------------------------------------------------
+    async def _await(self, result):
+        """
+        Bear's endpoint methods hand back whatever _xcall() returns, which
+        here is a coroutine. Await it if so.
+        """
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    # -------------------------------------------------------------------------
+    async def _deliver(self, url, pieces=None):
+        """
+        See Bear._deliver()
+        """
+        if pieces is None:
+            return await self.transport.acall(url)
+        return await self.transport.astream(pieces)
+
+    # -------------------------------------------------------------------------
+    async def _send(self, cmd, kw, lazy=False):
+        """
+        See Bear._send(). The urls of a split add-text go out one after
+        another.
+        """
+        try:
+            for url, pieces in self._urls(cmd, kw):
+                result = await self._xcall(url, pieces, lazy)
+        finally:
+            self._forget(cmd, kw)
+        self._index(cmd, kw, result)
+        return result
+
+    # -------------------------------------------------------------------------
+    def _validate(self, summaries, lazy=False):
+        """
+        See Bear._validate(). A reply still to be awaited is passed through
+        as is; _xcall() has already made it an iterator if *lazy*.
+        """
+        if inspect.isawaitable(summaries):
+            return summaries
+        return Bear._validate(self, summaries, lazy)
+
+    # -------------------------------------------------------------------------
+    async def _xcall(self, url, pieces=None, lazy=False):
+        """
+        Pass a url to the transport (streaming *pieces* instead, if given)
+        without blocking the event loop and decode the reply
+        """
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        async with self._sem:
+            if self.metrics is None:
+                return self._decode(url, await self._deliver(url, pieces),
+                                    lazy)
+            with self.metrics.call(url, self.transport) as probe:
+                result = await self._deliver(url, pieces)
+                probe.replied(result)
+                return self._decode(url, result, lazy)
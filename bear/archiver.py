@@ -0,0 +1,184 @@
+"""
+Archive notes that haven't been touched in a long time. Get a plan from
+Bear.archive_older_than(), look it over, then carry it out:
+
+    plan = cub.archive_older_than(datetime.timedelta(days=5 * 365))
+    print(plan.describe())
+    report = plan.execute(parallel=4, checkpoint="~/.bear-archive.ckpt")
+
+The candidates come from one search() call; no note is opened. The
+summaries are sorted by modificationDate once (AgeIndex), so the notes older
+than any cutoff are a bisect away.
+
+execute() archives the planned notes, a few at a time, and appends each
+identifier to the *checkpoint* file as it's done. Run the same plan again
+after an interruption and the notes already in the checkpoint are skipped.
+Archiving a note twice is harmless, so a crash between Bear archiving a
+note and the checkpoint recording it costs nothing but a repeat.
+"""
+import bisect
+import concurrent.futures
+import contextvars
+import datetime
+import os
+import threading
+from bear import Bearror
+
+ISO_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+# -----------------------------------------------------------------------------
+def cutoff(age, now=None):
+    """
+    Return the ISO 8601 stamp *age* (a timedelta, or a number of days)
+    before *now* (default: the current UTC time)
+    """
+    if not isinstance(age, datetime.timedelta):
+        age = datetime.timedelta(days=age)
+    now = now or datetime.datetime.utcnow()
+    return (now - age).strftime(ISO_FMT)
+
+
+# -----------------------------------------------------------------------------
+def plan(bear, age, tag=None, exclude_pinned=True, now=None):
+    """
+    Return a Plan to archive *bear*'s live notes (under *tag*, if given)
+    last modified more than *age* ago
+    """
+    stamp = cutoff(age, now)
+    index = AgeIndex(bear.search(tag=tag))
+    rows = index.older_than(stamp)
+    pinned = 0
+    if exclude_pinned:
+        keep = [_ for _ in rows if not _[3]]
+        pinned = len(rows) - len(keep)
+        rows = keep
+    return Plan(bear, stamp, rows, len(index), pinned)
+
+
+class AgeIndex(object):
+    """
+    Note summaries sorted by modificationDate
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, summaries):
+        """
+        Sort *summaries* (dicts or NoteSummary objects) by date, oldest
+        first
+        """
+        rows = sorted(((_['modificationDate'], _['identifier'], _['title'],
+                        _.get('pin') == "yes") for _ in summaries))
+        self.stamps = [_[0] for _ in rows]
+        self.rows = rows
+
+    # -------------------------------------------------------------------------
+    def __len__(self):
+        """
+        How many notes are indexed
+        """
+        return len(self.rows)
+
+    # -------------------------------------------------------------------------
+    def older_than(self, stamp):
+        """
+        Return the rows (modificationDate, identifier, title, pinned) for
+        the notes last modified before *stamp*, oldest first
+        """
+        return self.rows[:bisect.bisect_left(self.stamps, stamp)]
+
+
+class Plan(object):
+    """
+    The notes an archive sweep will archive
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, bear, stamp, rows, considered, pinned):
+        """
+        Initialize the plan
+        """
+        self.bear = bear
+        self.cutoff = stamp
+        self.rows = rows
+        self.considered = considered
+        self.pinned = pinned
+
+    # -------------------------------------------------------------------------
+    def __len__(self):
+        """
+        How many notes the plan would archive
+        """
+        return len(self.rows)
+
+    # -------------------------------------------------------------------------
+    def describe(self):
+        """
+        Return the plan as text, one note per line, for a dry run
+        """
+        lines = ["{} of {} notes last modified before {} ({} pinned kept)"
+                 "".format(len(self.rows), self.considered, self.cutoff,
+                           self.pinned)]
+        lines += ["  {}  {}  {}".format(stamp, nid, title)
+                  for stamp, nid, title, _ in self.rows]
+        return "\n".join(lines)
+
+    # -------------------------------------------------------------------------
+    def execute(self, parallel=4, checkpoint=None):
+        """
+        Archive the planned notes, *parallel* at a time, recording each in
+        *checkpoint* (if given) and skipping those already there. Return
+        {'archived': [...], 'skipped': [...], 'failed': {id: message}}.
+        """
+        done = set()
+        path = os.path.expanduser(checkpoint) if checkpoint else None
+        if path and os.path.exists(path):
+            with open(path) as fobj:
+                done = {_.strip() for _ in fobj if _.strip()}
+        todo = [_[1] for _ in self.rows if _[1] not in done]
+        rval = {'archived': [],
+                'skipped': [_[1] for _ in self.rows if _[1] in done],
+                'failed': {}}
+        lock = threading.Lock()
+        fobj = open(path, "a") if path else None
+
+        def one(nid):
+            try:
+                self.bear.archive(id=nid)
+            except Bearror as err:
+                with lock:
+                    rval['failed'][nid] = str(err)
+                return
+            with lock:
+                rval['archived'].append(nid)
+                if fobj:
+                    fobj.write(nid + "\n")
+                    fobj.flush()
+
+        # submitting a slice at a time keeps a 100k note plan from holding
+        # 100k futures
+        step = parallel * 64
+        try:
+            with concurrent.futures.ThreadPoolExecutor(parallel) as pool:
+                for start in range(0, len(todo), step):
+                    futures = [pool.submit(contextvars.copy_context().run,
+                                           one, nid)
+                               for nid in todo[start:start + step]]
+                    for fut in futures:
+                        fut.result()
+        finally:
+            if fobj:
+                fobj.close()
+        return rval
+
+    # -------------------------------------------------------------------------
+    def to_dict(self):
+        """
+        Return the plan as a JSON-ready dict
+        """
+        return {'cutoff': self.cutoff,
+                'considered': self.considered,
+                'pinned': self.pinned,
+                'notes': [{'identifier': nid, 'title': title,
+                           'modificationDate': stamp}
+                          for stamp, nid, title, _ in self.rows]}
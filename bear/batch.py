@@ -0,0 +1,149 @@
+"""
+Batch queues a Bear object's mutations (add_text, archive, trash) and sends
+them when the batch is flushed, merging appends (or prepends) to the same note
+into a single add-text url. Get one from Bear.batch():
+
+    with cub.batch() as batch:
+        cub.add_text(id=nid, text="log line", mode="append")
+        cub.add_text(id=nid, text="", tags="seen", mode="append")
+
+The two calls above cost one round trip. Inside the batch, the mutating
+methods return a BatchOp, whose result (or error) is filled in by the flush.
+Any other call flushes the queue first, so reads see earlier writes.
+"""
+from bear import Bearror
+from bear.tags import split_tags
+
+
+class BatchOp(object):
+    """
+    One queued url. Calls merged into it share it.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, cmd, kw):
+        """
+        Initialize the op
+        """
+        self.cmd = cmd
+        self.kw = kw
+        self.count = 1
+        self.result = None
+        self.error = None
+
+    # -------------------------------------------------------------------------
+    def merge(self, kw):
+        """
+        Fold a later add-text with the same note and mode into this one.
+        Appended text goes after ours, prepended text before, and the tag
+        lists are combined.
+        """
+        texts = [self.kw['text'], kw['text']]
+        if self.kw['mode'] == "prepend":
+            texts.reverse()
+        self.kw['text'] = "\n".join(_ for _ in texts if _)
+        tags = split_tags(self.kw.get('tags', ""))
+        tags += [_ for _ in split_tags(kw.get('tags', "")) if _ not in tags]
+        if tags:
+            self.kw['tags'] = ",".join(tags)
+        self.count += 1
+
+
+class Batch(object):
+    """
+    Queue mutations for *bear* and send them, merged, on flush() or on the
+    way out of a with block
+    """
+    queued = ['add-text', 'archive', 'trash']
+
+    # -------------------------------------------------------------------------
+    def __init__(self, bear):
+        """
+        Initialize the batch
+        """
+        self.bear = bear
+        self.ops = []
+        self.done = []
+        self.open = {}
+
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+        """
+        Start routing *bear*'s calls through the batch
+        """
+        if self.bear._batch is not None:
+            raise Bearror("A batch is already active")
+        self.bear._batch = self
+        return self
+
+    # -------------------------------------------------------------------------
+    def __exit__(self, exc_type, exc, tb):
+        """
+        Stop batching and send what's queued. If any op failed (and nothing
+        else went wrong first), raise Bearror.
+        """
+        self.bear._batch = None
+        self.flush()
+        failed = [_ for _ in self.done if _.error]
+        if failed and exc_type is None:
+            raise Bearror("{} of {} batched calls failed: {}"
+                          "".format(len(failed), len(self.done),
+                                    failed[0].error))
+
+    # -------------------------------------------------------------------------
+    def flush(self):
+        """
+        Send the queued urls in order, recording each one's result or error,
+        and return the ops sent
+        """
+        ops, self.ops, self.open = self.ops, [], {}
+        for op in ops:
+            try:
+                op.result = self.bear._send(op.cmd, op.kw)
+            except Bearror as err:
+                op.error = err
+        self.done.extend(ops)
+        return ops
+
+    # -------------------------------------------------------------------------
+    def route(self, cmd, kw, lazy=False):
+        """
+        Queue a mutation, or flush and make any other call directly
+        """
+        if cmd not in self.queued:
+            self.flush()
+            return self.bear._send(cmd, kw, lazy)
+
+        key = ('id', kw['id']) if kw.get('id') else ('title', kw.get('title'))
+        if key[0] != 'id':
+            self.open = {}
+        prev = self.open.pop(key, None)
+        if mergeable(cmd, kw):
+            if prev and same_shape(prev.kw, kw):
+                prev.merge(kw)
+                self.open[key] = prev
+                return prev
+            op = BatchOp(cmd, dict(kw))
+            self.open[key] = op
+        else:
+            op = BatchOp(cmd, dict(kw))
+        self.ops.append(op)
+        return op
+
+
+# -----------------------------------------------------------------------------
+def mergeable(cmd, kw):
+    """
+    Only appends and prepends can be merged
+    """
+    return cmd == 'add-text' and kw.get('mode') in ["append", "prepend"]
+
+
+# -----------------------------------------------------------------------------
+def same_shape(old, new):
+    """
+    Two add-text calls can be merged if they differ only in text and tags
+    """
+    skip = ['text', 'tags']
+    return ({k: v for k, v in old.items() if k not in skip} ==
+            {k: v for k, v in new.items() if k not in skip})
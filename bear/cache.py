@@ -0,0 +1,131 @@
+"""
+NoteCache holds open_note results keyed by note identifier so that repeated
+looks at an unchanged note (has_tag, idemp_add, ...) don't cost a round trip
+to Bear. Give one to a Bear object with Bear(cache=NoteCache()).
+
+Entries are dropped when
+ - they get older than *ttl* seconds,
+ - the modificationDate in a search/open_tag summary doesn't match,
+ - the Bear object changes the note (add_text, trash, archive, ...), or
+ - the cache goes over *max_bytes* of note text, counted as UTF-8 (least
+   recently used go first).
+
+A summary whose modificationDate does match renews the entry's ttl.
+"""
+import collections
+import threading
+import time
+
+
+class NoteCache(object):
+    """
+    An LRU/TTL cache of open_note results
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300.0, clock=None):
+        """
+        Initialize the cache. *clock* returns seconds and defaults to
+        time.monotonic.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock or time.monotonic
+        self.entries = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    def __len__(self):
+        """
+        Return the number of notes cached
+        """
+        return len(self.entries)
+
+    # -------------------------------------------------------------------------
+    def clear(self):
+        """
+        Drop everything
+        """
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    # -------------------------------------------------------------------------
+    def forget(self, id=None, title=None):
+        """
+        Drop the note with identifier *id* and any note titled *title*
+        """
+        with self.lock:
+            if id:
+                self._drop(id)
+            if title:
+                for key in [k for k, v in self.entries.items()
+                            if v[0]['title'] == title]:
+                    self._drop(key)
+
+    # -------------------------------------------------------------------------
+    def get(self, id):
+        """
+        Return a copy of the cached note with identifier *id*, or None
+        """
+        with self.lock:
+            entry = self.entries.get(id)
+            if entry and self.clock() - entry[1] < self.ttl:
+                self.entries.move_to_end(id)
+                self.hits += 1
+                return dict(entry[0])
+            if entry:
+                self._drop(id)
+            self.misses += 1
+            return None
+
+    # -------------------------------------------------------------------------
+    def put(self, note):
+        """
+        Cache an open_note result. Trashed notes aren't kept, and neither is
+        a note too big for the whole cache.
+        """
+        if note.get('is_trashed') == "yes":
+            self.forget(id=note['identifier'])
+            return
+        size = len(note['note'].encode())
+        with self.lock:
+            self._drop(note['identifier'])
+            if self.max_bytes < size:
+                return
+            self.entries[note['identifier']] = (dict(note), self.clock(),
+                                                size)
+            self.nbytes += size
+            while self.max_bytes < self.nbytes:
+                self._drop(next(iter(self.entries)))
+
+    # -------------------------------------------------------------------------
+    def validate(self, summaries):
+        """
+        Check cached notes against the modificationDate in a list of note
+        summaries (from search or open_tag). Stale entries are dropped and
+        current ones get a fresh ttl.
+        """
+        now = self.clock()
+        with self.lock:
+            for item in summaries:
+                entry = self.entries.get(item['identifier'])
+                if entry is None:
+                    continue
+                if entry[0]['modificationDate'] != item['modificationDate']:
+                    self._drop(item['identifier'])
+                else:
+                    self.entries[item['identifier']] = (entry[0], now,
+                                                        entry[2])
+
+    # -------------------------------------------------------------------------
+    def _drop(self, id):
+        """
+        Remove one entry (caller holds the lock)
+        """
+        entry = self.entries.pop(id, None)
+        if entry:
+            self.nbytes -= entry[2]
@@ -0,0 +1,145 @@
+"""
+Cassettes: recordings of the urls a Bear object sends and the replies it
+gets, for running tests and benchmarks offline.
+
+RecordingTransport wraps another transport and appends one JSON line per
+call to a file (gzipped if the name ends in .gz), with the API token
+redacted. ReplayTransport serves a recording back, with no Bear (or macOS)
+needed:
+
+    match='url'    each url gets the replies recorded for it, in order
+    match='order'  replies come back in recorded order, whatever the url
+                   (for sessions whose urls vary from run to run, e.g.,
+                   titles with timestamps in them)
+
+Setting $BEAR_TRANSPORT to 'record:PATH' or 'replay:PATH' has Bear objects
+created with no transport record to or replay from PATH.
+"""
+import collections
+import gzip
+import json
+import re
+import threading
+from bear import Bearror
+from bear.transport import Transport
+
+REDACTED = "REDACTED"
+TOKEN_RX = re.compile(r"([?&]token=)[^&]*")
+
+
+# -----------------------------------------------------------------------------
+def open_cassette(path, mode):
+    """
+    Open cassette *path* for text in *mode*, through gzip if it ends in .gz
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+# -----------------------------------------------------------------------------
+def redact(url):
+    """
+    Return *url* with the value of any token parameter replaced
+    """
+    return TOKEN_RX.sub(r"\g<1>" + REDACTED, url)
+
+
+class RecordingTransport(Transport):
+    """
+    Pass calls on to *inner* and append each url and its reply (or error)
+    to the cassette at *path*
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, inner, path):
+        """
+        Wrap *inner*, recording to *path*
+        """
+        self.inner = inner
+        self.path = path
+        self.token = inner.token
+        self.max_url = inner.max_url
+        self.lock = threading.Lock()
+        self.fobj = open_cassette(path, "a")
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Deliver *url* through the inner transport and record what happens
+        """
+        try:
+            reply = self.inner.call(url)
+        except Bearror as err:
+            self._write({'url': redact(url), 'error': str(err)})
+            raise
+        self._write({'url': redact(url), 'reply': reply})
+        return reply
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """
+        Close the cassette
+        """
+        with self.lock:
+            self.fobj.close()
+
+    # -------------------------------------------------------------------------
+    def _write(self, entry):
+        """
+        Append one entry to the cassette
+        """
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.fobj.write(line)
+            self.fobj.flush()
+
+
+class ReplayTransport(Transport):
+    """
+    Answer urls from the cassette at *path*
+    """
+    token = REDACTED
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path, match="url"):
+        """
+        Load the cassette. *match* is 'url' or 'order' (see above).
+        """
+        if match not in ["url", "order"]:
+            raise Bearror("match must be 'url' or 'order'")
+        self.path = path
+        self.match = match
+        self.lock = threading.Lock()
+        self.entries = collections.deque()
+        self.by_url = {}
+        with open_cassette(path, "r") as fobj:
+            for line in fobj:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.entries.append(entry)
+                self.by_url.setdefault(entry['url'],
+                                       collections.deque()).append(entry)
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Return the recorded reply for *url*, or raise the recorded error
+        """
+        key = redact(url)
+        with self.lock:
+            if self.match == "order":
+                if not self.entries:
+                    raise Bearror("The cassette {} has run out at {}"
+                                  "".format(self.path, key))
+                entry = self.entries.popleft()
+            else:
+                queue = self.by_url.get(key)
+                if not queue:
+                    raise Bearror("The cassette {} has no (more) replies "
+                                  "for {}".format(self.path, key))
+                entry = queue.popleft()
+        if 'error' in entry:
+            raise Bearror(entry['error'])
+        return entry['reply']
@@ -0,0 +1,215 @@
+"""
+BearDB answers reads (open_note, search, open_tag, tags) straight from
+Bear's sqlite database instead of going through the x-callback scheme. The
+database is opened read-only; writes still have to go through Bear.
+
+Results have the same shapes the x-callback replies do, so a Bear object
+built with reader=BearDB() hands back the same data, only faster.
+"""
+import datetime
+import os
+import re
+import sqlite3
+from bear import Bearror
+from urllib.parse import quote
+
+CORE_DATA_EPOCH = datetime.datetime(2001, 1, 1)
+ISO_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+# -----------------------------------------------------------------------------
+def db_path():
+    """
+    Return the default location of Bear's database
+    """
+    return os.path.expanduser(os.path.join(
+        "~/Library/Group Containers/9K33E3U3T4.net.shinyfrog.bear",
+        "Application Data", "database.sqlite"))
+
+
+# -----------------------------------------------------------------------------
+def iso(stamp):
+    """
+    Convert a Core Data timestamp (seconds since 2001-01-01 UTC) to the ISO
+    8601 form Bear's x-callback replies use
+    """
+    if stamp is None:
+        return None
+    when = CORE_DATA_EPOCH + datetime.timedelta(seconds=stamp)
+    return when.strftime(ISO_FMT)
+
+
+class BearDB(object):
+    """
+    Read-only access to Bear's sqlite database
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None, immutable=False):
+        """
+        Open the database at *path* (default: db_path()) read-only.
+
+        Bear keeps its database in WAL mode and writes to it while running;
+        plain read-only mode sees a consistent snapshot per query. Set
+        *immutable* only for a copy that nothing is writing to (it skips
+        locking entirely, which is faster but unsafe on a live database).
+        """
+        self.path = path or db_path()
+        uri = "file:{}?mode=ro".format(quote(os.path.abspath(self.path)))
+        if immutable:
+            uri += "&immutable=1"
+        try:
+            self.db = sqlite3.connect(uri, uri=True,
+                                      check_same_thread=False)
+        except sqlite3.OperationalError as err:
+            raise Bearror("Can't open {}: {}".format(self.path, err))
+        self.db.execute("pragma query_only = 1")
+        self.join, self.note_col, self.tag_col = self._join_table()
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """
+        Close the database
+        """
+        self.db.close()
+
+    # -------------------------------------------------------------------------
+    def open_note(self, id=None, title=None, exclude_trashed=None):
+        """
+        Return a note's content, as /open-note does. Trashed notes are
+        skipped unless *exclude_trashed* is 'no'.
+        """
+        if id:
+            where, args = "ZUNIQUEIDENTIFIER = ?", [id]
+        elif title:
+            where, args = "ZTITLE = ?", [title]
+        else:
+            raise Bearror("either id or title is required")
+        if exclude_trashed != "no":
+            where += " and ZTRASHED = 0"
+        row = self.db.execute("select ZTEXT, ZUNIQUEIDENTIFIER, ZTITLE, "
+                              "ZTRASHED, ZMODIFICATIONDATE, ZCREATIONDATE "
+                              "from ZSFNOTE where {} and {} "
+                              "order by ZMODIFICATIONDATE desc limit 1"
+                              "".format(self._present(), where),
+                              args).fetchone()
+        if row is None:
+            raise Bearror("The note could not be found")
+        return {'note': row[0] or "",
+                'identifier': row[1],
+                'title': row[2] or "",
+                'is_trashed': "yes" if row[3] else "no",
+                'modificationDate': iso(row[4]),
+                'creationDate': iso(row[5])}
+
+    # -------------------------------------------------------------------------
+    def open_tag(self, name):
+        """
+        Return summaries of the notes under tag *name* (or a child of it),
+        trashed and archived ones included, as /open-tag does
+        """
+        if not self._tag_pks(name):
+            raise Bearror("Tag '{}' was not found".format(name))
+        return self._summaries(self._tagged(name))
+
+    # -------------------------------------------------------------------------
+    def search(self, term=None, tag=None):
+        """
+        Return summaries of the live notes containing *term* and/or under
+        *tag*, as /search does
+        """
+        where = ["ZTRASHED = 0", "ZARCHIVED = 0"]
+        args = []
+        if term:
+            where.append("(ZTEXT like ? escape '\\' or "
+                         "ZTITLE like ? escape '\\')")
+            pat = "%{}%".format(re.sub(r"([\\%_])", r"\\\1", term))
+            args += [pat, pat]
+        if tag:
+            where.append(self._tagged(tag))
+        return self._summaries(" and ".join(where), args)
+
+    # -------------------------------------------------------------------------
+    def tags(self):
+        """
+        Return the names of the tags on live notes, as /tags does
+        """
+        rows = self.db.execute("select distinct t.ZTITLE from ZSFNOTETAG t "
+                               "join {0} j on j.{2} = t.Z_PK "
+                               "join ZSFNOTE n on n.Z_PK = j.{1} "
+                               "where n.ZTRASHED = 0 and n.ZARCHIVED = 0 "
+                               "and {3} order by t.ZTITLE"
+                               "".format(self.join, self.note_col,
+                                         self.tag_col, self._present("n")))
+        return [_[0] for _ in rows]
+
+    # -------------------------------------------------------------------------
+    def _join_table(self):
+        """
+        Core Data numbers the note/tag join table (Z_7TAGS, Z_5TAGS, ...)
+        differently across Bear versions, so look it up. Return the table
+        name and its note and tag columns.
+        """
+        rows = self.db.execute("select name from sqlite_master where "
+                               "type = 'table' and name like 'Z\\_%TAGS' "
+                               "escape '\\'").fetchall()
+        for (name,) in rows:
+            cols = [_[1] for _ in self.db.execute("pragma table_info({})"
+                                                  "".format(name))]
+            notes = [_ for _ in cols if _.endswith("NOTES")]
+            tags = [_ for _ in cols if _.endswith("TAGS")]
+            if notes and tags:
+                return name, notes[0], tags[0]
+        raise Bearror("{} does not look like a Bear database"
+                      "".format(self.path))
+
+    # -------------------------------------------------------------------------
+    def _present(self, alias=None):
+        """
+        Return a condition excluding notes deleted for good, if this version
+        of Bear tracks that
+        """
+        if not hasattr(self, '_has_perm'):
+            cols = [_[1] for _ in self.db.execute("pragma table_info"
+                                                  "(ZSFNOTE)")]
+            self._has_perm = "ZPERMANENTLYDELETED" in cols
+        if not self._has_perm:
+            return "1 = 1"
+        prefix = alias + "." if alias else ""
+        return "coalesce({}ZPERMANENTLYDELETED, 0) = 0".format(prefix)
+
+    # -------------------------------------------------------------------------
+    def _summaries(self, where, args=()):
+        """
+        Return [{title, identifier, modificationDate, creationDate, pin},
+        ...] for the notes matching *where*
+        """
+        rows = self.db.execute("select ZTITLE, ZUNIQUEIDENTIFIER, "
+                               "ZMODIFICATIONDATE, ZCREATIONDATE, ZPINNED "
+                               "from ZSFNOTE where {} and {} "
+                               "order by ZMODIFICATIONDATE desc"
+                               "".format(self._present(), where), args)
+        return [{'title': row[0] or "",
+                 'identifier': row[1],
+                 'modificationDate': iso(row[2]),
+                 'creationDate': iso(row[3]),
+                 'pin': "yes" if row[4] else "no"} for row in rows]
+
+    # -------------------------------------------------------------------------
+    def _tag_pks(self, name):
+        """
+        Return the primary keys of tag *name* and its children
+        """
+        pat = re.sub(r"([\\%_])", r"\\\1", name) + "/%"
+        rows = self.db.execute("select Z_PK from ZSFNOTETAG where ZTITLE = ? "
+                               "or ZTITLE like ? escape '\\'", [name, pat])
+        return [_[0] for _ in rows]
+
+    # -------------------------------------------------------------------------
+    def _tagged(self, name):
+        """
+        Return a condition selecting the notes under tag *name*
+        """
+        pks = ",".join(str(_) for _ in self._tag_pks(name)) or "null"
+        return ("Z_PK in (select {} from {} where {} in ({}))"
+                "".format(self.note_col, self.join, self.tag_col, pks))
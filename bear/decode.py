@@ -0,0 +1,71 @@
+"""
+Decoding xcall replies. Bear hands back a JSON object, and list replies
+(search, open_tag, tags, ...) carry their list as a JSON string inside it:
+
+    {"notes": "[{\"title\": ...}, ...]", "": ""}
+
+parse() takes one layer of that apart, with orjson or ujson if either is
+installed (they are several times faster than the json module on big
+replies). iter_array() walks the inner list one element at a time, so a
+caller that asks for an iterator never has the whole list of summaries in
+memory at once.
+"""
+import json
+import re
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+        loads = ujson.loads
+    except ImportError:
+        loads = json.loads
+
+DECODER = json.JSONDecoder()
+SPACE_RX = re.compile(r"\s*")
+SEP_RX = re.compile(r"\s*(?:,\s*)?")
+
+
+# -----------------------------------------------------------------------------
+def iter_array(text):
+    """
+    Yield the elements of the JSON array in *text* one at a time. Malformed
+    input raises ValueError when the iteration reaches it.
+    """
+    idx = SPACE_RX.match(text).end()
+    if not text.startswith("[", idx):
+        raise ValueError("Expected a JSON array")
+    idx = SPACE_RX.match(text, idx + 1).end()
+    while not text.startswith("]", idx):
+        if len(text) <= idx:
+            raise ValueError("Unterminated JSON array")
+        item, idx = DECODER.raw_decode(text, idx)
+        yield item
+        idx = SEP_RX.match(text, idx).end()
+
+
+# -----------------------------------------------------------------------------
+def parse(text):
+    """
+    Parse a reply from xcall. A reply that was encoded twice (a JSON string
+    holding the JSON) is parsed again, but each layer only once.
+    """
+    result = loads(text)
+    while isinstance(result, str):
+        result = loads(result)
+    return result
+
+
+# -----------------------------------------------------------------------------
+def wrapped(result):
+    """
+    If *result* has the {key: "<json>", "": ""} shape of a list reply,
+    return the key, else None
+    """
+    if isinstance(result, dict) and len(result) == 2 and '' in result:
+        [key] = [_ for _ in result if _ != '']
+        if isinstance(result[key], str):
+            return key
+    return None
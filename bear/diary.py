@@ -0,0 +1,232 @@
+"""
+Diary writes daily (or weekly) journal notes from templates:
+
+    diary = Diary(cub, title="{date:%Y-%m-%d} {weekday}",
+                  body="## Todo\\n{todos}\\n## Notes\\n",
+                  tags="journal/{date:%Y}, {weekend}")
+    diary.create(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+
+Templates use str.format syntax and are compiled once, so rendering a year
+of entries doesn't re-parse them. The variables are
+
+    date, yesterday, tomorrow   datetime.date; take strftime specs, e.g.,
+                                {date:%A %d %B}
+    week_start, week_end        the Monday and Sunday of date's week
+    year, month, day, week      numbers (week is the ISO week)
+    weekday                     the day's name
+    weekend                     'weekend' on Saturday and Sunday, else ''
+    todos                       the open todos carried over from the
+                                previous entry, one per line
+
+*tags* is a template too, rendered to a comma separated list; any entry
+that renders empty is dropped, so {weekend} tags only weekend notes.
+
+An entry is skipped if a note with its title already exists. The titles are
+looked up in an index built from one search() call (the live notes) and one
+open_tag() call per tag the entries get (which lists archived notes too,
+and trashed ones, so an entry in the trash also counts), not a search per
+day, so a run can be repeated safely. Open todos ('- [ ] ...') carry forward
+from each entry to the next: from the entry just rendered, or for the first
+one (or after a skipped day) from the existing note, which is opened once.
+"""
+import concurrent.futures
+import contextvars
+import datetime
+import re
+import string
+from bear import Bearror
+from bear.tags import split_tags
+
+FORMATTER = string.Formatter()
+TODO_RX = re.compile(r"^\s*[-*] \[ \] .*$", re.MULTILINE)
+VARIABLES = ['date', 'day', 'month', 'todos', 'tomorrow', 'week', 'week_end',
+             'week_start', 'weekday', 'weekend', 'year', 'yesterday']
+
+
+# -----------------------------------------------------------------------------
+def open_todos(text):
+    """
+    Return the open todo lines in *text*
+    """
+    return [_.strip() for _ in TODO_RX.findall(text or "")]
+
+
+# -----------------------------------------------------------------------------
+def variables(date, todos=()):
+    """
+    Return the template variables for *date*
+    """
+    one = datetime.timedelta(days=1)
+    start = date - datetime.timedelta(days=date.weekday())
+    return {'date': date,
+            'day': date.day,
+            'month': date.month,
+            'todos': "\n".join(todos),
+            'tomorrow': date + one,
+            'week': date.isocalendar()[1],
+            'week_end': start + 6 * one,
+            'week_start': start,
+            'weekday': date.strftime("%A"),
+            'weekend': "weekend" if 5 <= date.weekday() else "",
+            'year': date.year,
+            'yesterday': date - one}
+
+
+class Template(object):
+    """
+    A str.format template parsed once and rendered many times
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, text):
+        """
+        Parse *text*. A field naming an unknown variable is an error now,
+        rather than on the first render.
+        """
+        self.text = text
+        self.parts = []
+        try:
+            for literal, field, spec, conv in FORMATTER.parse(text):
+                if field is not None:
+                    root = re.split(r"[.\[]", field, 1)[0]
+                    if root not in VARIABLES:
+                        raise Bearror("Unknown template variable '{}' in "
+                                      "{!r}".format(field, text))
+                self.parts.append((literal, field, spec, conv))
+        except ValueError as err:
+            raise Bearror("Bad template {!r}: {}".format(text, err))
+
+    # -------------------------------------------------------------------------
+    def render(self, values):
+        """
+        Fill the template in from *values*
+        """
+        out = []
+        for literal, field, spec, conv in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value, _ = FORMATTER.get_field(field, (), values)
+            if conv:
+                value = FORMATTER.convert_field(value, conv)
+            out.append(format(value, spec))
+        return "".join(out)
+
+
+class Diary(object):
+    """
+    Journal entries for *bear*, one per day or per week
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, bear, title="{date:%Y-%m-%d}", body="{todos}",
+                 tags="journal", period="day", carry=True):
+        """
+        Compile the templates. *period* is 'day' or 'week' (entries fall on
+        Mondays). With *carry* False, todos aren't carried over.
+        """
+        if period not in ["day", "week"]:
+            raise Bearror("period must be 'day' or 'week'")
+        self.bear = bear
+        self.title = Template(title)
+        self.body = Template(body)
+        self.tags = Template(tags or "")
+        self.step = datetime.timedelta(days=7 if period == "week" else 1)
+        self.period = period
+        self.carry = carry
+
+    # -------------------------------------------------------------------------
+    def create(self, start, end=None, parallel=1):
+        """
+        Create the missing entries from *start* to *end* (default: just
+        *start*), *parallel* at a time, and return the results of the
+        create calls in date order
+        """
+        entries = self.plan(start, end)
+
+        def one(entry):
+            return self.bear.create(title=entry['title'], text=entry['text'],
+                                    tags=entry['tags'] or None)
+
+        with concurrent.futures.ThreadPoolExecutor(parallel) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, one, _)
+                       for _ in entries]
+            return [_.result() for _ in futures]
+
+    # -------------------------------------------------------------------------
+    def dates(self, start, end=None):
+        """
+        Return the entry dates from *start* to *end*, inclusive
+        """
+        if self.period == "week":
+            start -= datetime.timedelta(days=start.weekday())
+        end = end or start
+        rval = []
+        while start <= end:
+            rval.append(start)
+            start += self.step
+        return rval
+
+    # -------------------------------------------------------------------------
+    def plan(self, start, end=None):
+        """
+        Render the entries from *start* to *end* that don't exist yet and
+        return them as dicts of date, title, text, and tags, in date order
+        """
+        dates = self.dates(start, end)
+        titles = self.titles([dates[0] - self.step] + dates if dates else [])
+        rval = []
+        # the previous entry, as ('id', identifier) if it's in Bear or
+        # ('text', text) if we just rendered it
+        prev = None
+        if dates:
+            first = self.title.render(variables(dates[0] - self.step))
+            if first in titles:
+                prev = ('id', titles[first])
+        for date in dates:
+            values = variables(date)
+            title = self.title.render(values)
+            if title in titles:
+                prev = ('id', titles[title])
+                continue
+            if self.carry and prev is not None:
+                kind, value = prev
+                if kind == 'id':
+                    value = self.bear.open_note(id=value)['note']
+                values['todos'] = "\n".join(open_todos(value))
+            text = self.body.render(values)
+            tags = split_tags(self.tags.render(values))
+            rval.append({'date': date, 'title': title, 'text': text,
+                         'tags': ",".join(tags)})
+            prev = ('text', text)
+        return rval
+
+    # -------------------------------------------------------------------------
+    def render(self, date, todos=()):
+        """
+        Return the title, text, and tags for the entry on *date*
+        """
+        values = variables(date, todos)
+        return (self.title.render(values), self.body.render(values),
+                ",".join(split_tags(self.tags.render(values))))
+
+    # -------------------------------------------------------------------------
+    def titles(self, dates=()):
+        """
+        Return a map from the titles of existing notes to their identifiers:
+        the live notes, and the notes (archived ones included) under the
+        tags the entries for *dates* would get
+        """
+        tags = set()
+        for date in dates:
+            tags.update(split_tags(self.tags.render(variables(date))))
+        rval = {}
+        for tag in sorted(tags):
+            try:
+                rval.update({_['title']: _['identifier']
+                             for _ in self.bear.open_tag(tag)})
+            except Bearror as err:
+                if "was not found" not in str(err):
+                    raise
+        rval.update({_['title']: _['identifier'] for _ in self.bear.search()})
+        return rval
@@ -0,0 +1,456 @@
+"""
+An in-memory stand-in for the Bear app. FakeTransport answers bear urls the
+way Bear does through xcall, with the same reply shapes (note, identifier,
+errorMessage, and the ''-keyed wrapper around json arrays), so a Bear object
+built on it runs at full speed on a machine without Bear.
+"""
+import base64
+import binascii
+import datetime
+import json
+import re
+import threading
+import uuid
+from bear.tags import TAG_RX, hashtag, note_tags, split_tags
+from bear.transport import Transport
+from urllib.parse import unquote
+
+HDR_RX = re.compile(r"^#+\s+")
+ISO_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+# -----------------------------------------------------------------------------
+def parse_url(url):
+    """
+    Split a bear url into its command and a dict of unquoted parameters
+    """
+    head, _, query = url.partition("?")
+    cmd = head.rsplit("/", 1)[-1]
+    params = {}
+    for item in query.split("&") if query else []:
+        key, _, val = item.partition("=")
+        params[unquote(key)] = unquote(val)
+    return cmd, params
+
+
+class FakeNote(object):
+    """
+    One note in the fake database
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, identifier, text, when):
+        """
+        Initialize the note
+        """
+        self.identifier = identifier
+        self.text = text
+        self.created = when
+        self.modified = when
+        self.trashed = False
+        self.archived = False
+        self.pinned = False
+        self.files = {}
+
+    # -------------------------------------------------------------------------
+    @property
+    def title(self):
+        """
+        Bear takes the first line, less any header markup, as the title
+        """
+        return HDR_RX.sub("", self.text.split("\n", 1)[0]).strip()
+
+    # -------------------------------------------------------------------------
+    def summary(self):
+        """
+        Return the dict Bear reports for this note in a list of notes
+        """
+        return {'title': self.title,
+                'identifier': self.identifier,
+                'modificationDate': self.modified.strftime(ISO_FMT),
+                'creationDate': self.created.strftime(ISO_FMT),
+                'pin': "yes" if self.pinned else "no"}
+
+
+class FakeTransport(Transport):
+    """
+    Answer bear urls from an in-memory note database. Every url handled is
+    logged by command name in *calls*, which makes it easy to count round
+    trips.
+    """
+    token = "FAKE-TOKEN"
+
+    # -------------------------------------------------------------------------
+    def __init__(self, clock=None):
+        """
+        Initialize the object. *clock* returns the current (UTC) datetime and
+        defaults to datetime.datetime.utcnow.
+        """
+        self.clock = clock or datetime.datetime.utcnow
+        self.notes = {}
+        self.calls = []
+        self.font = "System"
+        self.theme = "Red Graphite"
+        self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    def add_note(self, text, created=None, modified=None, pin=False,
+                 trashed=False, archived=False):
+        """
+        Put a note straight into the database (bypassing the url interface)
+        and return its identifier. Handy for seeding tests and benchmarks.
+        """
+        note = self._new_note(text)
+        if created:
+            note.created = created
+        note.modified = modified or note.created
+        note.pinned = pin
+        note.trashed = trashed
+        note.archived = archived
+        return note.identifier
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Handle *url* and return the reply text xcall would have printed
+        """
+        cmd, params = parse_url(url)
+        handler = getattr(self, "_" + cmd.replace("-", "_"), None)
+        with self.lock:
+            self.calls.append(cmd)
+            if handler is None:
+                reply = self._error("Unknown action {}".format(cmd))
+            else:
+                reply = handler(params)
+        return json.dumps(reply)
+
+    # -------------------------------------------------------------------------
+    async def acall(self, url):
+        """
+        Nothing here blocks, so asyncio callers are answered inline
+        """
+        return self.call(url)
+
+    # -------------------------------------------------------------------------
+    def _add_file(self, params):
+        """
+        /add-file: attach a file to a note
+        """
+        note = self._find(params)
+        if note is None:
+            return self._error("The note could not be found")
+        if 'file' not in params or 'filename' not in params:
+            return self._error("file and filename are required")
+        try:
+            data = base64.b64decode(params['file'], validate=True)
+        except (binascii.Error, ValueError):
+            return self._error("File not in a valid base64 form")
+        note.files[params['filename']] = data
+        self._insert(note, "[file:{}]".format(params['filename']),
+                     params.get('mode', "append"))
+        return {'note': note.text}
+
+    # -------------------------------------------------------------------------
+    def _add_text(self, params):
+        """
+        /add-text: add text and/or tags to a note
+        """
+        note = self._find(params)
+        if note is None:
+            return self._error("The note could not be found")
+        chunk = params.get('text', "")
+        if params.get('timestamp') == "yes":
+            chunk = self._stamp() + "\n" + chunk
+        if params.get('tags'):
+            tagline = " ".join(hashtag(_)
+                               for _ in split_tags(params['tags']))
+            chunk = chunk + "\n\n" + tagline if chunk else tagline
+        self._insert(note, chunk, params.get('mode', "append"))
+        return {'note': note.text, 'title': note.title}
+
+    # -------------------------------------------------------------------------
+    def _archive(self, params):
+        """
+        /archive: move notes to the archive
+        """
+        for note in self._targets(params):
+            note.archived = True
+            note.modified = self.clock()
+        return {}
+
+    # -------------------------------------------------------------------------
+    def _change_font(self, params):
+        """
+        /change-font
+        """
+        self.font = params.get('font', self.font)
+        return {}
+
+    # -------------------------------------------------------------------------
+    def _change_theme(self, params):
+        """
+        /change-theme
+        """
+        self.theme = params.get('theme', self.theme)
+        return {}
+
+    # -------------------------------------------------------------------------
+    def _create(self, params):
+        """
+        /create: make a new note
+        """
+        parts = []
+        if params.get('title'):
+            parts.append("# " + params['title'])
+        if params.get('timestamp') == "yes":
+            parts.append(self._stamp())
+        if params.get('text'):
+            parts.append(params['text'])
+        if params.get('tags'):
+            parts.append(" ".join(hashtag(_)
+                                  for _ in split_tags(params['tags'])))
+        if params.get('file') and params.get('filename'):
+            try:
+                data = base64.b64decode(params['file'], validate=True)
+            except (binascii.Error, ValueError):
+                return self._error("File not in a valid base64 form")
+            parts.append("[file:{}]".format(params['filename']))
+        if not parts:
+            return self._error("Empty notes are not allowed")
+
+        note = self._new_note("\n".join(parts))
+        if params.get('file') and params.get('filename'):
+            note.files[params['filename']] = data
+        note.pinned = params.get('pin') == "yes"
+        return {'identifier': note.identifier, 'title': note.title}
+
+    # -------------------------------------------------------------------------
+    def _delete_tag(self, params):
+        """
+        /delete-tag: remove a tag (and its children) from every note
+        """
+        return self._retag(params.get('name', ""), None)
+
+    # -------------------------------------------------------------------------
+    def _grab_url(self, params):
+        """
+        /grab-url: there's no web here, so the note just records the url
+        """
+        if not params.get('url'):
+            return self._error("url is required")
+        parts = ["# " + params['url']]
+        if params.get('tags'):
+            parts.append(" ".join(hashtag(_)
+                                  for _ in split_tags(params['tags'])))
+        note = self._new_note("\n".join(parts))
+        note.pinned = params.get('pin') == "yes"
+        return {'identifier': note.identifier, 'title': note.title}
+
+    # -------------------------------------------------------------------------
+    def _open_note(self, params):
+        """
+        /open-note: return a note's content
+        """
+        note = self._find(params)
+        if note is None:
+            return self._error("The note could not be found")
+        rval = note.summary()
+        del rval['pin']
+        rval['note'] = note.text
+        rval['is_trashed'] = "yes" if note.trashed else "no"
+        return rval
+
+    # -------------------------------------------------------------------------
+    def _open_tag(self, params):
+        """
+        /open-tag: list the notes (trashed and archived included) under a tag
+        """
+        name = params.get('name', "")
+        notes = [_ for _ in self.notes.values() if name in note_tags(_.text)]
+        if not notes:
+            return self._error("The tag could not be found")
+        return self._wrap('notes', [_.summary() for _ in notes])
+
+    # -------------------------------------------------------------------------
+    def _rename_tag(self, params):
+        """
+        /rename-tag: rename a tag (and its children) in every note
+        """
+        return self._retag(params.get('name', ""), params.get('new_name'))
+
+    # -------------------------------------------------------------------------
+    def _search(self, params):
+        """
+        /search: list live notes matching term and/or tag
+        """
+        notes = self._live(params.get('term'))
+        if params.get('tag'):
+            notes = [_ for _ in notes if params['tag'] in note_tags(_.text)]
+        return self._wrap('notes', [_.summary() for _ in notes])
+
+    # -------------------------------------------------------------------------
+    def _tags(self, params):
+        """
+        /tags: list every tag on a live note
+        """
+        names = set()
+        for note in self._live():
+            names |= note_tags(note.text)
+        return self._wrap('tags', [{'name': _} for _ in sorted(names)])
+
+    # -------------------------------------------------------------------------
+    def _today(self, params):
+        """
+        /today: list the live notes modified today
+        """
+        today = self.clock().date()
+        notes = [_ for _ in self._live(params.get('search'))
+                 if _.modified.date() == today]
+        return self._wrap('notes', [_.summary() for _ in notes])
+
+    # -------------------------------------------------------------------------
+    def _todo(self, params):
+        """
+        /todo: list the live notes with an open todo item
+        """
+        notes = [_ for _ in self._live(params.get('search'))
+                 if "- [ ]" in _.text]
+        return self._wrap('notes', [_.summary() for _ in notes])
+
+    # -------------------------------------------------------------------------
+    def _trash(self, params):
+        """
+        /trash: move notes to the trash
+        """
+        for note in self._targets(params):
+            note.trashed = True
+            note.modified = self.clock()
+        return {}
+
+    # -------------------------------------------------------------------------
+    def _untagged(self, params):
+        """
+        /untagged: list the live notes with no tags
+        """
+        notes = [_ for _ in self._live(params.get('search'))
+                 if not note_tags(_.text)]
+        return self._wrap('notes', [_.summary() for _ in notes])
+
+    # -------------------------------------------------------------------------
+    def _error(self, msg):
+        """
+        Return the reply Bear sends on x-error
+        """
+        return {'errorMessage': msg, 'errorCode': 1}
+
+    # -------------------------------------------------------------------------
+    def _find(self, params):
+        """
+        Look up the note named by params['id'] or params['title']. The id
+        wins if both are present.
+        """
+        skip_trash = params.get('exclude_trashed') == "yes"
+        if params.get('id'):
+            cands = [self.notes.get(params['id'])]
+        elif params.get('title'):
+            cands = [_ for _ in self.notes.values()
+                     if _.title == params['title']]
+        else:
+            cands = []
+        for note in cands:
+            if note is not None and not (skip_trash and note.trashed):
+                return note
+        return None
+
+    # -------------------------------------------------------------------------
+    def _insert(self, note, chunk, mode):
+        """
+        Put *chunk* into *note* the way add-text does for *mode*
+        """
+        if mode == "replace_all":
+            note.text = chunk
+        else:
+            lines = note.text.split("\n", 1)
+            hdr, body = lines[0], lines[1:]
+            if mode == "replace":
+                note.text = "\n".join([hdr, chunk])
+            elif mode == "prepend":
+                note.text = "\n".join([hdr, chunk] + body)
+            else:
+                note.text = "\n".join([note.text, chunk])
+        note.modified = self.clock()
+
+    # -------------------------------------------------------------------------
+    def _live(self, term=None):
+        """
+        Return the notes that are neither trashed nor archived, optionally
+        limited to those containing *term*
+        """
+        rval = [_ for _ in self.notes.values()
+                if not _.trashed and not _.archived]
+        if term:
+            lterm = term.lower()
+            rval = [_ for _ in rval if lterm in _.text.lower()]
+        return rval
+
+    # -------------------------------------------------------------------------
+    def _new_note(self, text):
+        """
+        Create a note, file it, and return it
+        """
+        ident = "{}-{}".format(str(uuid.uuid4()).upper(), len(self.notes))
+        note = FakeNote(ident, text, self.clock())
+        self.notes[ident] = note
+        return note
+
+    # -------------------------------------------------------------------------
+    def _retag(self, old, new):
+        """
+        Rename tag *old* (and its children) to *new* in every note, or
+        remove it if *new* is None
+        """
+        hits = []
+
+        def sub(match):
+            name = match.group(1) or match.group(2)
+            if name != old and not name.startswith(old + "/"):
+                return match.group(0)
+            hits.append(name)
+            return "" if new is None else hashtag(new + name[len(old):])
+
+        for note in self.notes.values():
+            text = TAG_RX.sub(sub, note.text)
+            if text != note.text:
+                note.text = text
+                note.modified = self.clock()
+        if not hits:
+            return self._error("The tag could not be found")
+        return {}
+
+    # -------------------------------------------------------------------------
+    def _stamp(self):
+        """
+        Return the timestamp Bear inserts for timestamp=yes
+        """
+        return self.clock().strftime("%Y-%m-%d %H:%M")
+
+    # -------------------------------------------------------------------------
+    def _targets(self, params):
+        """
+        Return the notes an archive or trash call applies to: the note named
+        by id, or else every live note matching search
+        """
+        if params.get('id'):
+            note = self.notes.get(params['id'])
+            return [note] if note else []
+        if params.get('search'):
+            return self._live(params['search'])
+        return []
+
+    # -------------------------------------------------------------------------
+    def _wrap(self, key, value):
+        """
+        Bear hands back json arrays as a string under *key*, next to an
+        empty-named item. Bear._xcall unwraps this shape.
+        """
+        return {key: json.dumps(value), '': ""}
@@ -0,0 +1,110 @@
+"""
+Feed turns "what changed in Bear since last time?" into a stream of events,
+so indexes and rules downstream can update incrementally instead of
+rescanning every note:
+
+    feed = Feed(cub, "~/.bear-feed.json")
+    for event in feed.changes():
+        ...
+
+One search() call lists every live note with its modificationDate. That
+list is compared with a snapshot (identifier -> modificationDate and title)
+kept in a JSON file from the last run, and only the notes whose date moved
+are opened. Events come oldest first, shaped like
+
+    {'event': 'created' | 'modified' | 'trashed',
+     'identifier': ..., 'title': ..., 'modificationDate': ...,
+     'note': the body (None for trashed, or if bodies=False)}
+
+A note that drops out of the live list (trashed, archived, or deleted) is
+reported as 'trashed'. The snapshot is saved once the events have all been
+consumed, so a run that stops part way repeats its events next time rather
+than losing them.
+"""
+import json
+import os
+
+
+class Feed(object):
+    """
+    Changes to *bear*'s notes since the snapshot at *path*
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, bear, path=None, bodies=True):
+        """
+        Load the snapshot at *path*, if there is one. With no *path*, the
+        snapshot only lives as long as the object. With *bodies* False,
+        events don't carry note text (and no note is opened).
+        """
+        self.bear = bear
+        self.path = os.path.expanduser(path) if path else None
+        self.bodies = bodies
+        self.notes = {}
+        self.watermark = None
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as fobj:
+                data = json.load(fobj)
+            self.notes = data['notes']
+            self.watermark = data['watermark']
+
+    # -------------------------------------------------------------------------
+    def changes(self, since=None):
+        """
+        Generate the events since the snapshot was taken. A note that isn't
+        in the snapshot is 'created' if it was modified after *since*
+        (default: the snapshot's watermark, the newest modificationDate it
+        saw) and otherwise quietly joins the snapshot. So with no snapshot
+        and no *since*, every note is new, and a caller that keeps its own
+        watermark can start a fresh snapshot from it.
+        """
+        since = since or self.watermark
+        current = {}
+        events = []
+        for summary in self.bear.search():
+            nid = summary['identifier']
+            stamp = summary['modificationDate']
+            current[nid] = [stamp, summary['title']]
+            old = self.notes.get(nid)
+            if old is None:
+                if since is None or since < stamp:
+                    events.append(('created', summary))
+            elif old[0] < stamp:
+                events.append(('modified', summary))
+        gone = [_ for _ in self.notes if _ not in current]
+
+        events.sort(key=lambda _: _[1]['modificationDate'])
+        for kind, summary in events:
+            body = None
+            if self.bodies:
+                body = self.bear.open_note(id=summary['identifier'])['note']
+            yield {'event': kind,
+                   'identifier': summary['identifier'],
+                   'title': summary['title'],
+                   'modificationDate': summary['modificationDate'],
+                   'note': body}
+        for nid in gone:
+            stamp, title = self.notes[nid]
+            yield {'event': 'trashed',
+                   'identifier': nid,
+                   'title': title,
+                   'modificationDate': stamp,
+                   'note': None}
+
+        self.notes = current
+        self.watermark = max([since or ""] +
+                             [_[0] for _ in current.values()]) or None
+        self.save()
+
+    # -------------------------------------------------------------------------
+    def save(self):
+        """
+        Write the snapshot to our path, replacing the file in one step
+        """
+        if not self.path:
+            return
+        tmp = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp, "w") as fobj:
+            json.dump({'watermark': self.watermark, 'notes': self.notes},
+                      fobj, separators=(",", ":"))
+        os.replace(tmp, self.path)
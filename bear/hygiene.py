@@ -0,0 +1,232 @@
+"""
+Find tags that are probably the same tag spelled differently, and plan the
+rename_tag calls that merge them:
+
+    report = analyze(cub.tags(), counts=tag_counts(tagindex))
+    for old, new in report.plan():
+        cub.rename_tag(old, new)
+
+analyze() looks for
+
+    case variants   'Work' and 'work'
+    plurals         'project' and 'projects', 'story' and 'stories'
+    near misses     'meeting' and 'meetng': within *radius* edits of each
+                    other. Only tags that share a string after deleting
+                    up to *radius* characters are compared, so 8k tags
+                    cost about 8k * length lookups, not 32M comparisons
+    orphans         nested tags whose parent isn't in the list (Bear lists
+                    parents along with their children, so these point at
+                    an interrupted rename or a stale index)
+
+Case variants and plurals share a key (lowercase, each part singular), so
+they're grouped in one pass. Near misses are more often two real tags
+('cart' and 'card') than one typo, so they're only merged if plan() is
+asked to (fuzzy=True). In each group the tag on the most notes is kept
+(with no counts, the lowercase, then the shortest, spelling).
+"""
+import collections
+import itertools
+
+ES_ENDINGS = ("ches", "shes", "sses", "xes", "zes")
+
+
+# -----------------------------------------------------------------------------
+def analyze(tags, counts=None, radius=1, min_len=5):
+    """
+    Examine the tag names in *tags* and return a Report. *counts* maps tags
+    to how many notes they're on. Near misses are looked for among names
+    at least *min_len* long (short tags like 'ai' and 'ml' are too close to
+    everything).
+    """
+    tags = sorted(set(tags))
+    groups = collections.defaultdict(list)
+    for name in tags:
+        groups[key(name)].append(name)
+
+    # two keys within *radius* edits of each other lose the same string
+    # when up to *radius* characters are deleted from each, so only keys
+    # sharing a deletion variant need to be compared
+    blocks = collections.defaultdict(set)
+    for gkey in groups:
+        if min_len <= len(gkey):
+            for variant in deletions(gkey, radius):
+                blocks[variant].add(gkey)
+    pairs = set()
+    for block in blocks.values():
+        if 1 < len(block):
+            pairs.update(itertools.combinations(sorted(block), 2))
+    near = []
+    for one, two in sorted(pairs):
+        dist = distance(one, two)
+        if dist <= radius:
+            near.append((one, two, dist))
+
+    present = set(tags)
+    orphans = [_ for _ in tags
+               if "/" in _ and _.rsplit("/", 1)[0] not in present]
+    return Report(groups, near, orphans, counts or {})
+
+
+# -----------------------------------------------------------------------------
+def deletions(word, depth):
+    """
+    Return the set of strings made by deleting up to *depth* characters
+    from *word*
+    """
+    rval = {word}
+    edge = {word}
+    for _ in range(depth):
+        edge = {w[:idx] + w[idx + 1:] for w in edge for idx in range(len(w))}
+        rval |= edge
+    return rval
+
+
+# -----------------------------------------------------------------------------
+def distance(one, two):
+    """
+    Return the Levenshtein distance between strings *one* and *two*
+    """
+    if len(one) < len(two):
+        one, two = two, one
+    prev = list(range(len(two) + 1))
+    for idx, char in enumerate(one, 1):
+        cur = [idx]
+        for jdx, other in enumerate(two, 1):
+            cur.append(min(prev[jdx] + 1, cur[jdx - 1] + 1,
+                           prev[jdx - 1] + (char != other)))
+        prev = cur
+    return prev[-1]
+
+
+# -----------------------------------------------------------------------------
+def key(name):
+    """
+    Return the key *name* shares with its case and plural variants
+    """
+    return "/".join(singular(_) for _ in name.lower().split("/"))
+
+
+# -----------------------------------------------------------------------------
+def singular(word):
+    """
+    Return a rough singular of English *word* (good enough to pair tags,
+    not to print)
+    """
+    if len(word) < 4 or not word.endswith("s") or word.endswith("ss"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(ES_ENDINGS):
+        return word[:-2]
+    return word[:-1]
+
+
+# -----------------------------------------------------------------------------
+def tag_counts(tagindex):
+    """
+    Return a map from each tag in *tagindex* (bear.tags.TagIndex) to the
+    number of notes under it
+    """
+    with tagindex.lock:
+        return {tag: len(ids) for tag, ids in tagindex.notes.items()}
+
+
+class Report(object):
+    """
+    What analyze() found
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, groups, near, orphans, counts):
+        """
+        *groups* maps each key to its tags, *near* holds (key, key,
+        distance) for keys within the radius, *orphans* lists nested tags
+        with no parent
+        """
+        self.groups = groups
+        self.near = near
+        self.orphans = orphans
+        self.counts = counts
+
+    # -------------------------------------------------------------------------
+    def duplicates(self):
+        """
+        Return the groups of two or more tags, as {'tags': [...], 'keep':
+        tag, 'reason': 'case' or 'plural'}
+        """
+        rval = []
+        for names in self.groups.values():
+            if len(names) < 2:
+                continue
+            lowered = {_.lower() for _ in names}
+            rval.append({'tags': names,
+                         'keep': self.keep(names),
+                         'reason': "case" if len(lowered) == 1 else "plural"})
+        return sorted(rval, key=lambda _: _['keep'])
+
+    # -------------------------------------------------------------------------
+    def execute(self, bear, fuzzy=False):
+        """
+        Carry out plan() through *bear* and return the renames made
+        """
+        rval = []
+        for old, new in self.plan(fuzzy):
+            bear.rename_tag(old, new)
+            rval.append((old, new))
+        return rval
+
+    # -------------------------------------------------------------------------
+    def keep(self, names):
+        """
+        Return the tag in *names* the others should be merged into
+        """
+        return min(names, key=lambda _: (-self.counts.get(_, 0),
+                                         _ != _.lower(), len(_), _))
+
+    # -------------------------------------------------------------------------
+    def plan(self, fuzzy=False):
+        """
+        Return the (old, new) rename_tag calls that merge each group into
+        its keeper, near misses too if *fuzzy*. Bear renames a tag's
+        children with it, so parents go first, later names (old and new)
+        are rewritten to what the earlier renames made of them, and renames
+        that an earlier one already did (so the old name is gone) are left
+        out.
+        """
+        merged = {k: list(v) for k, v in self.groups.items()}
+        if fuzzy:
+            parent = {_: _ for _ in merged}
+
+            def find(node):
+                while parent[node] != node:
+                    parent[node] = parent[parent[node]]
+                    node = parent[node]
+                return node
+
+            for one, two, _ in self.near:
+                parent[find(two)] = find(one)
+            for gkey in list(merged):
+                root = find(gkey)
+                if root != gkey:
+                    merged[root] += merged.pop(gkey)
+
+        wanted = []
+        for names in merged.values():
+            keeper = self.keep(names)
+            wanted += [(_, keeper) for _ in names if _ != keeper]
+        wanted.sort(key=lambda _: (_[0].count("/"), _[0]))
+
+        names = set(itertools.chain(*merged.values()))
+        rval = []
+        for old, new in wanted:
+            for done_old, done_new in rval:
+                if old.startswith(done_old + "/"):
+                    old = done_new + old[len(done_old):]
+                if new.startswith(done_old + "/"):
+                    new = done_new + new[len(done_old):]
+            if old != new and old in names and (old, new) not in rval:
+                rval.append((old, new))
+                names = {new + _[len(old):]
+                         if _ == old or _.startswith(old + "/") else _
+                         for _ in names}
+        return rval
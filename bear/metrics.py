@@ -0,0 +1,339 @@
+"""
+Metrics counts the calls a Bear object makes, per endpoint: how many, how
+many failed, bytes sent and received, and latency histograms for each phase
+of a call:
+
+    transport  handing the url over and getting the reply back
+    spawn      starting xcall (XcallTransport only)
+    wait       waiting for Bear to answer (XcallTransport only)
+    decode     turning the reply into python data
+    total      all of the above
+
+Give one to a Bear object with Bear(metrics=Metrics()). Counts are kept
+under a client name (by default, the name of the running script), and
+flush() adds them to the totals in a file (at exit, if not sooner):
+default_path() unless another *path* is given, or none with path=False.
+'bear stats' prints the totals from the same file; prometheus() and
+to_dict() export them.
+"""
+import atexit
+import bisect
+import contextlib
+import fcntl
+import json
+import os
+import sys
+import threading
+import time
+
+BOUNDS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+          30.0]
+PHASES = ['transport', 'spawn', 'wait', 'decode', 'total']
+
+
+# -----------------------------------------------------------------------------
+def default_path():
+    """
+    Return where metrics are kept unless told otherwise
+    """
+    return os.path.expanduser("~/.bear-metrics.json")
+
+
+# -----------------------------------------------------------------------------
+def endpoint(url):
+    """
+    Return the endpoint (e.g., 'open-note') a bear url calls
+    """
+    return url.split("?", 1)[0].rsplit("/", 1)[-1]
+
+
+# -----------------------------------------------------------------------------
+def quantile(hist, frac):
+    """
+    Estimate the *frac* quantile of histogram *hist* as the upper bound of
+    the bucket it falls in (None for an empty histogram, inf past the last
+    bound)
+    """
+    if not hist['count']:
+        return None
+    want = frac * hist['count']
+    seen = 0
+    for bound, count in zip(BOUNDS + [float("inf")], hist['buckets']):
+        seen += count
+        if want <= seen:
+            return bound
+    return float("inf")
+
+
+# -----------------------------------------------------------------------------
+def _bound(value):
+    """
+    Format a quantile estimate for the summary
+    """
+    if value is None:
+        return "-"
+    if value == float("inf"):
+        return ">{}".format(BOUNDS[-1])
+    return "<={}".format(value)
+
+
+# -----------------------------------------------------------------------------
+def _histogram():
+    """
+    Return an empty latency histogram
+    """
+    return {'count': 0, 'sum': 0.0, 'buckets': [0] * (len(BOUNDS) + 1)}
+
+
+class Metrics(object):
+    """
+    Per-endpoint call counts, sizes, errors, and latency histograms
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None, client=None):
+        """
+        Record calls under *client* (default: the script's name). flush()
+        adds them to the file at *path* (default: default_path()), and runs
+        at exit. With path=False, they're only kept in memory.
+        """
+        self.path = default_path() if path is None else path
+        self.client = client or os.path.basename(sys.argv[0]) or "python"
+        self.data = {}
+        self.lock = threading.Lock()
+        if self.path:
+            atexit.register(self.flush)
+
+    # -------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def call(self, url, transport=None):
+        """
+        Time one call to *url* in a with block. The block calls replied()
+        on what it's given once the transport answers; anything raised in
+        the block counts the call as an error.
+        """
+        probe = _Probe(url)
+        try:
+            yield probe
+        except BaseException:
+            probe.failed = True
+            raise
+        finally:
+            now = time.monotonic()
+            phases = {'total': now - probe.start}
+            if probe.answered is not None:
+                phases['transport'] = probe.answered - probe.start
+                phases['decode'] = now - probe.answered
+                timing = getattr(transport, 'timing', None) or {}
+                for name in ['spawn', 'wait']:
+                    if name in timing:
+                        phases[name] = timing[name]
+            self.record(endpoint(url), phases, sent=probe.sent,
+                        received=probe.received, error=probe.failed)
+
+    # -------------------------------------------------------------------------
+    def export(self, path):
+        """
+        Write the metrics to *path*: Prometheus text if it ends with '.prom'
+        (for node_exporter's textfile collector), JSON otherwise. The file
+        is replaced in one step, so a reader never sees half of it.
+        """
+        if path.endswith(".prom"):
+            text = self.prometheus()
+        else:
+            text = json.dumps(self.to_dict(), indent=1, sort_keys=True)
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "w") as fobj:
+            fobj.write(text)
+        os.replace(tmp, path)
+
+    # -------------------------------------------------------------------------
+    def flush(self, path=None):
+        """
+        Add what we've counted to the totals in *path* (default: the path we
+        were given) and start counting afresh. The file is locked while it's
+        updated, so several processes can share it.
+        """
+        path = path or self.path
+        if not path:
+            return
+        with self.lock:
+            data, self.data = self.data, {}
+        if not data:
+            return
+        with open(path, "a+") as fobj:
+            fcntl.flock(fobj, fcntl.LOCK_EX)
+            fobj.seek(0)
+            text = fobj.read()
+            total = Metrics(path=False)
+            total.data = json.loads(text) if text.strip() else {}
+            total.merge(data)
+            fobj.seek(0)
+            fobj.truncate()
+            json.dump(total.data, fobj, indent=1, sort_keys=True)
+
+    # -------------------------------------------------------------------------
+    @classmethod
+    def load(cls, path=None):
+        """
+        Return a Metrics object holding the totals in *path* (default:
+        default_path())
+        """
+        rval = cls(path=False, client="-")
+        with open(path or default_path()) as fobj:
+            text = fobj.read()
+        rval.data = json.loads(text) if text.strip() else {}
+        return rval
+
+    # -------------------------------------------------------------------------
+    def merge(self, data):
+        """
+        Add the counts in *data* (shaped like self.data) to ours
+        """
+        with self.lock:
+            for client, endpoints in data.items():
+                for name, stats in endpoints.items():
+                    mine = self._stats(client, name)
+                    for key in ['calls', 'errors', 'sent', 'received']:
+                        mine[key] += stats.get(key, 0)
+                    for phase, hist in stats.get('latency', {}).items():
+                        have = mine['latency'].setdefault(phase,
+                                                          _histogram())
+                        have['count'] += hist['count']
+                        have['sum'] += hist['sum']
+                        have['buckets'] = [a + b for a, b in
+                                           zip(have['buckets'],
+                                               hist['buckets'])]
+
+    # -------------------------------------------------------------------------
+    def prometheus(self):
+        """
+        Return the metrics in Prometheus' text exposition format
+        """
+        lines = []
+        counters = [('calls', "bear_calls_total", "Calls made"),
+                    ('errors', "bear_errors_total", "Calls that failed"),
+                    ('sent', "bear_sent_bytes_total", "Url bytes sent"),
+                    ('received', "bear_received_bytes_total",
+                     "Reply bytes received")]
+        with self.lock:
+            rows = sorted((client, name, stats)
+                          for client, endpoints in self.data.items()
+                          for name, stats in endpoints.items())
+            for key, metric, text in counters:
+                lines.append("# HELP {} {}".format(metric, text))
+                lines.append("# TYPE {} counter".format(metric))
+                for client, name, stats in rows:
+                    lines.append('{}{{client="{}",endpoint="{}"}} {}'
+                                 "".format(metric, client, name, stats[key]))
+            metric = "bear_latency_seconds"
+            lines.append("# HELP {} Call latency by phase".format(metric))
+            lines.append("# TYPE {} histogram".format(metric))
+            for client, name, stats in rows:
+                for phase in PHASES:
+                    hist = stats['latency'].get(phase)
+                    if hist is None:
+                        continue
+                    labels = 'client="{}",endpoint="{}",phase="{}"'.format(
+                        client, name, phase)
+                    seen = 0
+                    for bound, count in zip(BOUNDS + ["+Inf"],
+                                            hist['buckets']):
+                        seen += count
+                        lines.append('{}_bucket{{{},le="{}"}} {}'
+                                     "".format(metric, labels, bound, seen))
+                    lines.append("{}_sum{{{}}} {}".format(metric, labels,
+                                                          hist['sum']))
+                    lines.append("{}_count{{{}}} {}".format(metric, labels,
+                                                            hist['count']))
+        return "\n".join(lines) + "\n"
+
+    # -------------------------------------------------------------------------
+    def record(self, name, phases, sent=0, received=0, error=False):
+        """
+        Count one call to endpoint *name* that took *phases* ({phase:
+        seconds})
+        """
+        with self.lock:
+            stats = self._stats(self.client, name)
+            stats['calls'] += 1
+            stats['errors'] += 1 if error else 0
+            stats['sent'] += sent
+            stats['received'] += received
+            for phase, secs in phases.items():
+                hist = stats['latency'].setdefault(phase, _histogram())
+                hist['count'] += 1
+                hist['sum'] += secs
+                hist['buckets'][bisect.bisect_left(BOUNDS, secs)] += 1
+
+    # -------------------------------------------------------------------------
+    def summary(self):
+        """
+        Return a table of calls, error rate, bytes, and mean/p50/p95 total
+        latency for each client and endpoint, busiest first
+        """
+        rows = []
+        with self.lock:
+            for client, endpoints in self.data.items():
+                for name, stats in endpoints.items():
+                    rows.append((client, name, stats))
+        rows.sort(key=lambda _: -_[2]['calls'])
+        lines = ["{:16s} {:14s} {:>7s} {:>6s} {:>9s} {:>9s} {:>8s} {:>8s} "
+                 "{:>8s}".format("client", "endpoint", "calls", "err%",
+                                 "sent", "received", "mean", "p50", "p95")]
+        for client, name, stats in rows:
+            hist = stats['latency'].get('total', _histogram())
+            mean = hist['sum'] / hist['count'] if hist['count'] else 0.0
+            lines.append("{:16s} {:14s} {:7d} {:6.1f} {:9d} {:9d} {:8.3f} "
+                         "{:>8s} {:>8s}"
+                         "".format(client[:16], name[:14], stats['calls'],
+                                   100.0 * stats['errors'] / stats['calls'],
+                                   stats['sent'], stats['received'], mean,
+                                   _bound(quantile(hist, 0.5)),
+                                   _bound(quantile(hist, 0.95))))
+        return "\n".join(lines)
+
+    # -------------------------------------------------------------------------
+    def to_dict(self):
+        """
+        Return a copy of the metrics as plain data (for JSON)
+        """
+        with self.lock:
+            return json.loads(json.dumps(self.data))
+
+    # -------------------------------------------------------------------------
+    def _stats(self, client, name):
+        """
+        Return the counters for *client*'s calls to endpoint *name* (caller
+        holds the lock)
+        """
+        endpoints = self.data.setdefault(client, {})
+        if name not in endpoints:
+            endpoints[name] = {'calls': 0, 'errors': 0, 'sent': 0,
+                               'received': 0, 'latency': {}}
+        return endpoints[name]
+
+
+class _Probe(object):
+    """
+    What Metrics.call() learns about one call as it goes
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, url):
+        """
+        Start the clock
+        """
+        self.start = time.monotonic()
+        self.sent = len(url)
+        self.received = 0
+        self.answered = None
+        self.failed = False
+
+    # -------------------------------------------------------------------------
+    def replied(self, result):
+        """
+        Note that the transport has answered with *result*
+        """
+        self.answered = time.monotonic()
+        self.received = len(result)
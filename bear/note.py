@@ -0,0 +1,187 @@
+"""
+Compact result objects. A Bear object built with Bear(objects=True) hands
+back a Note from open_note and NoteSummary objects from search and
+open_tag, instead of dicts.
+
+Both keep their fields in __slots__, with dates parsed to (UTC) datetimes
+and flags to bools, so holding the metadata of a whole library takes a
+fraction of the memory the dicts do. They still answer dict-style lookups
+(summary['identifier'], note.get('note')) with the values the dicts had, so
+code written against the dicts keeps working.
+
+A NoteSummary's .body fetches the note with open_note the first time it's
+asked for, and keeps it.
+"""
+import datetime
+
+ISO_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+# -----------------------------------------------------------------------------
+def format_date(when):
+    """
+    Turn a datetime back into the ISO 8601 form Bear uses
+    """
+    if when is None:
+        return None
+    return when.strftime(ISO_FMT)
+
+
+# -----------------------------------------------------------------------------
+def parse_date(stamp):
+    """
+    Turn one of Bear's ISO 8601 timestamps into a UTC datetime
+    """
+    if not stamp:
+        return None
+    if stamp.endswith("Z"):
+        stamp = stamp[:-1] + "+00:00"
+    return datetime.datetime.fromisoformat(stamp)
+
+
+class NoteSummary(object):
+    """
+    One entry of a search or open_tag result
+    """
+    __slots__ = ('title', 'identifier', 'modified', 'created', 'pinned',
+                 'score', '_bear', '_body')
+
+    # -------------------------------------------------------------------------
+    def __init__(self, item, bear=None):
+        """
+        Build from a summary dict. *bear* is used to fetch the body.
+        """
+        self.title = item.get('title', "")
+        self.identifier = item['identifier']
+        self.modified = parse_date(item.get('modificationDate'))
+        self.created = parse_date(item.get('creationDate'))
+        self.pinned = item.get('pin') == "yes"
+        self.score = item.get('score')
+        self._bear = bear
+        self._body = None
+
+    # -------------------------------------------------------------------------
+    def __getitem__(self, key):
+        """
+        Look a field up by its key in the summary dict
+        """
+        if key == 'title':
+            return self.title
+        if key == 'identifier':
+            return self.identifier
+        if key == 'modificationDate':
+            return format_date(self.modified)
+        if key == 'creationDate':
+            return format_date(self.created)
+        if key == 'pin':
+            return "yes" if self.pinned else "no"
+        if key == 'score' and self.score is not None:
+            return self.score
+        raise KeyError(key)
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """
+        Show which note this is
+        """
+        return "NoteSummary({!r}, {!r})".format(self.identifier, self.title)
+
+    # -------------------------------------------------------------------------
+    @property
+    def body(self):
+        """
+        The note's text, fetched with open_note on first use
+        """
+        if self._body is None:
+            if self._bear is None:
+                raise AttributeError("This NoteSummary has no Bear object "
+                                     "to fetch its body with")
+            self._body = self._bear.open_note(id=self.identifier)['note']
+        return self._body
+
+    # -------------------------------------------------------------------------
+    def get(self, key, default=None):
+        """
+        Like dict.get()
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    # -------------------------------------------------------------------------
+    def to_dict(self):
+        """
+        Return the dict this summary was built from
+        """
+        rval = {_: self[_] for _ in ['title', 'identifier',
+                                     'modificationDate', 'creationDate',
+                                     'pin']}
+        if self.score is not None:
+            rval['score'] = self.score
+        return rval
+
+
+class Note(object):
+    """
+    An open_note result
+    """
+    __slots__ = ('title', 'identifier', 'modified', 'created', 'trashed',
+                 'body')
+
+    # -------------------------------------------------------------------------
+    def __init__(self, item):
+        """
+        Build from an open_note dict
+        """
+        self.title = item.get('title', "")
+        self.identifier = item['identifier']
+        self.modified = parse_date(item.get('modificationDate'))
+        self.created = parse_date(item.get('creationDate'))
+        self.trashed = item.get('is_trashed') == "yes"
+        self.body = item['note']
+
+    # -------------------------------------------------------------------------
+    def __getitem__(self, key):
+        """
+        Look a field up by its key in the open_note dict
+        """
+        if key == 'note':
+            return self.body
+        if key == 'title':
+            return self.title
+        if key == 'identifier':
+            return self.identifier
+        if key == 'modificationDate':
+            return format_date(self.modified)
+        if key == 'creationDate':
+            return format_date(self.created)
+        if key == 'is_trashed':
+            return "yes" if self.trashed else "no"
+        raise KeyError(key)
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """
+        Show which note this is
+        """
+        return "Note({!r}, {!r})".format(self.identifier, self.title)
+
+    # -------------------------------------------------------------------------
+    def get(self, key, default=None):
+        """
+        Like dict.get()
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    # -------------------------------------------------------------------------
+    def to_dict(self):
+        """
+        Return the dict this note was built from
+        """
+        return {_: self[_] for _ in ['note', 'title', 'identifier',
+                                     'is_trashed', 'modificationDate',
+                                     'creationDate']}
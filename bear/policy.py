@@ -0,0 +1,200 @@
+"""
+Policy decides what happens when a call to Bear fails. Give one to a Bear
+object with Bear(policy=Policy()).
+
+Failures are sorted into kinds (see classify()):
+
+    empty           Bear answered a read with nothing (it dropped the
+                    callback); worth another try
+    timeout         xcall (or the bear daemon) gave up waiting; worth
+                    another try
+    transient       the transport fell over; worth another try
+    note-not-found  Bear's definite answer; not retried
+    tag-not-found   Bear's definite answer; not retried
+    error           anything else; not retried
+
+Reads (and the few writes that are safe to repeat) are retried on the first
+three kinds, with exponential backoff and full jitter. Other writes are
+never retried on their own: repeating a create or add-text that did land
+would do it twice. An operation that checks before it writes, like
+idemp_add, can be retried as a whole with guarded().
+
+Too many retryable failures in a row open the circuit breaker: for
+*cooldown* seconds, calls fail at once rather than each spawning an xcall
+that is going to time out. After that one trial call is let through; if it
+succeeds the breaker closes, if not it opens again.
+"""
+import collections
+import random
+import threading
+import time
+from bear import Bearror
+from bear.metrics import endpoint
+
+DATA_READS = ['open-note', 'open-tag', 'search', 'tags', 'today', 'todo',
+              'untagged']
+IDEMPOTENT = DATA_READS + ['archive', 'change-font', 'change-theme', 'trash']
+RETRYABLE = ['empty', 'timeout', 'transient']
+
+
+# -----------------------------------------------------------------------------
+def classify(outcome, cmd=None):
+    """
+    Return the kind of failure *outcome* (a Bearror, or the result of a
+    call to endpoint *cmd*) is, or None if it isn't one. A Bearror raised
+    for an error Bear reported carries the kind of Bear's own message (as
+    *kind*), since the text raised may have had the tag name added.
+    """
+    if not isinstance(outcome, Exception):
+        if outcome == '' and cmd in DATA_READS:
+            return 'empty'
+        return None
+    if getattr(outcome, 'kind', None):
+        return outcome.kind
+    msg = str(outcome)
+    if "sent an empty reply" in msg:
+        return 'empty'
+    if "did not finish in" in msg or "did not answer in" in msg:
+        return 'timeout'
+    if "has gone away" in msg:
+        return 'transient'
+    if "note could not be found" in msg:
+        return 'note-not-found'
+    if "tag could not be found" in msg or "was not found" in msg:
+        return 'tag-not-found'
+    return 'error'
+
+
+class Policy(object):
+    """
+    Retries with backoff, and a circuit breaker
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, retries=3, base=0.25, cap=5.0, threshold=5,
+                 cooldown=30.0, clock=None, sleep=None, rand=None):
+        """
+        retries: extra attempts a retryable call gets
+        base, cap: the n'th retry waits a random time up to
+            min(cap, base * 2**n) seconds
+        threshold: retryable failures in a row that open the breaker
+        cooldown: seconds the breaker stays open
+        clock, sleep, rand: time.monotonic, time.sleep, and random.random
+            by default (tests pass their own)
+        """
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+        self.rand = rand or random.random
+        self.failures = collections.Counter()
+        self.streak = 0
+        self.opened = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    def call(self, url, func):
+        """
+        Run *func* (one trip to Bear with *url*) under the policy and return
+        its result
+        """
+        cmd = endpoint(url)
+        retry = cmd in IDEMPOTENT
+        attempt = 0
+        while True:
+            self._admit(cmd)
+            try:
+                result = func()
+                kind = classify(result, cmd)
+                err = None
+            except Bearror as exc:
+                kind = classify(exc, cmd)
+                err = exc
+            except Exception:
+                self._settle('error')
+                raise
+            self._settle(kind)
+            if kind is None:
+                return result
+            if kind == 'empty':
+                err = Bearror("Bear sent an empty reply to {}".format(cmd))
+            if not retry or kind not in RETRYABLE or self.retries <= attempt:
+                raise err
+            self.sleep(self.backoff(attempt))
+            attempt += 1
+
+    # -------------------------------------------------------------------------
+    def backoff(self, attempt):
+        """
+        Return how long to wait before retry number *attempt* (from 0)
+        """
+        return self.rand() * min(self.cap, self.base * 2 ** attempt)
+
+    # -------------------------------------------------------------------------
+    def guarded(self, func):
+        """
+        Run *func*, an operation that checks Bear before it writes (so it's
+        safe to repeat), retrying it as a whole on retryable failures
+        """
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except Bearror as exc:
+                if classify(exc) not in RETRYABLE or \
+                   self.state() != "closed" or self.retries <= attempt:
+                    raise
+            self.sleep(self.backoff(attempt))
+            attempt += 1
+
+    # -------------------------------------------------------------------------
+    def state(self):
+        """
+        Return 'closed', 'open', or 'half-open'
+        """
+        with self.lock:
+            if self.opened is None:
+                return "closed"
+            if self.clock() - self.opened < self.cooldown:
+                return "open"
+            return "half-open"
+
+    # -------------------------------------------------------------------------
+    def _admit(self, cmd):
+        """
+        Raise if the breaker is open, or half-open with its trial call
+        already out
+        """
+        with self.lock:
+            if self.opened is None:
+                return
+            left = self.cooldown - (self.clock() - self.opened)
+            if 0 < left:
+                raise Bearror("Bear is not responding; not sending {} for "
+                              "another {:.1f} seconds".format(cmd, left))
+            if self.trial:
+                raise Bearror("Bear is not responding; waiting on a trial "
+                              "call before sending {}".format(cmd))
+            self.trial = True
+
+    # -------------------------------------------------------------------------
+    def _settle(self, kind):
+        """
+        Update the breaker after a call that ended with *kind* of failure
+        (None for success)
+        """
+        with self.lock:
+            self.trial = False
+            if kind is not None:
+                self.failures[kind] += 1
+            if kind in RETRYABLE:
+                self.streak += 1
+                if self.opened is not None or self.threshold <= self.streak:
+                    self.opened = self.clock()
+            else:
+                self.streak = 0
+                self.opened = None
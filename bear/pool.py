@@ -0,0 +1,98 @@
+"""
+XcallPool is a transport that lets a threaded caller (bulk_idemp_add, the
+archiver, the bear daemon) have up to *size* xcall runs in flight at once,
+and makes any more wait for a free slot, so a bulk job can't start hundreds
+of xcall processes at the same moment.
+
+xcall takes one url per run and Bear answers each through its own
+x-callback, so there is no channel to Bear that could be kept open between
+calls: each url still costs one exec of xcall. What the pool buys is
+concurrency, bounded. It runs xcall in the calling thread, with no helper
+process or extra pipe in between.
+"""
+import contextlib
+import threading
+from bear import Bearror
+from bear.transport import Transport, XcallTransport
+
+
+class XcallPool(Transport):
+    """
+    Deliver urls through *inner* (default: XcallTransport), at most *size*
+    at a time
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, size=4, inner=None, timeout=None):
+        """
+        Initialize the pool. *timeout* is passed to the default
+        XcallTransport: a run that takes longer is killed (default:
+        bear.transport.default_timeout()).
+        """
+        self.size = size
+        self.inner = inner or XcallTransport(timeout=timeout)
+        self.token = self.inner.token
+        self.max_url = self.inner.max_url
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+        self.closed = False
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+        """
+        Let the pool be used as a context manager
+        """
+        return self
+
+    # -------------------------------------------------------------------------
+    def __exit__(self, *args):
+        """
+        Close the pool on the way out of the context
+        """
+        self.close()
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Deliver *url* when a slot is free and return the reply
+        """
+        with self._slot():
+            return self.inner.call(url)
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """
+        Refuse further calls. Calls already running finish.
+        """
+        self.closed = True
+
+    # -------------------------------------------------------------------------
+    def stream(self, pieces):
+        """
+        Deliver a url given in *pieces* when a slot is free and return the
+        reply
+        """
+        with self._slot():
+            return self.inner.stream(pieces)
+
+    # -------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def _slot(self):
+        """
+        Hold one of the pool's slots for the length of a call
+        """
+        if self.closed:
+            raise Bearror("The xcall pool is closed")
+        with self.slots:
+            with self.lock:
+                self.running += 1
+                self.calls += 1
+                self.peak = max(self.peak, self.running)
+            try:
+                yield
+            finally:
+                with self.lock:
+                    self.running -= 1
@@ -0,0 +1,236 @@
+"""
+Scheduler is a transport that sits in front of another one and decides
+which waiting call goes next when several threads (or scripts) share one
+Bear object. Bear works through urls one at a time, so a bulk sweep that
+keeps the transport busy would otherwise leave someone at the keyboard
+waiting behind thousands of calls.
+
+Each call belongs to a priority class and a client, set with priority():
+
+    cub = Bear(transport=Scheduler(XcallTransport(),
+                                   rates={'bulk': (5, 10)}))
+    with priority("bulk", client="nightly"):
+        for id in ids:
+            cub.archive(id=id)
+
+The classes, highest first, are
+
+    interactive  someone is waiting on the answer
+    normal       the default
+    bulk         background sweeps
+
+When a slot frees up, it goes to the highest class with a call waiting
+whose token bucket (if it has one) holds a token, so a rate limited class
+never stops a lower one from using idle time. Within a class, clients take
+turns: one client with eight threads queued doesn't crowd out another with
+one. A call made outside any priority() context is 'normal' with the
+thread's name as its client.
+"""
+import asyncio
+import collections
+import contextlib
+import contextvars
+import threading
+import time
+from bear import Bearror
+from bear.transport import Transport
+
+CLASSES = ['interactive', 'normal', 'bulk']
+CURRENT = contextvars.ContextVar("bear_priority", default=("normal", None))
+
+
+# -----------------------------------------------------------------------------
+@contextlib.contextmanager
+def priority(klass, client=None):
+    """
+    Calls made inside the context belong to priority class *klass* and to
+    *client* (the thread's name if None). The setting is a context
+    variable, so it follows asyncio tasks; Bear carries it into the threads
+    it starts itself (e.g., bulk_idemp_add).
+    """
+    if klass not in CLASSES:
+        raise Bearror("priority class must be one of {}"
+                      "".format(", ".join(CLASSES)))
+    token = CURRENT.set((klass, client))
+    try:
+        yield
+    finally:
+        CURRENT.reset(token)
+
+
+class Bucket(object):
+    """
+    A token bucket: *rate* tokens a second, holding at most *burst*
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, rate, burst=None, clock=None):
+        """
+        Start full. *burst* defaults to one second's worth (at least 1).
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self.clock = clock or time.monotonic
+        self.tokens = self.burst
+        self.stamp = self.clock()
+
+    # -------------------------------------------------------------------------
+    def ready(self):
+        """
+        Return 0 if a token is available, or else how many seconds until
+        one will be
+        """
+        now = self.clock()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if 1 <= self.tokens:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    # -------------------------------------------------------------------------
+    def take(self):
+        """
+        Use up a token
+        """
+        self.tokens -= 1
+
+
+class Scheduler(Transport):
+    """
+    Hand urls to *inner* at most *slots* at a time, in priority order, with
+    per class rate limits and round robin between clients
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, inner, slots=1, rates=None, clock=None):
+        """
+        Wrap *inner*.
+
+        slots: how many calls may be with *inner* at once
+        rates: maps a class to its rate limit, either calls a second or a
+            (rate, burst) tuple. Classes not mentioned are not limited.
+        clock: for the token buckets; time.monotonic by default
+        """
+        self.inner = inner
+        self.token = inner.token
+        self.max_url = inner.max_url
+        self.slots = slots
+        self.busy = 0
+        self.cond = threading.Condition()
+        self.queues = {klass: collections.OrderedDict() for klass in CLASSES}
+        self.served = collections.Counter()
+        self.buckets = {}
+        for klass, rate in (rates or {}).items():
+            if klass not in CLASSES:
+                raise Bearror("priority class must be one of {}"
+                              "".format(", ".join(CLASSES)))
+            if not isinstance(rate, tuple):
+                rate = (rate,)
+            self.buckets[klass] = Bucket(*rate, clock=clock)
+
+    # -------------------------------------------------------------------------
+    async def acall(self, url):
+        """
+        Run call() in the event loop's executor, keeping the caller's
+        priority
+        """
+        ctx = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, ctx.run, self.call, url)
+        return result
+
+    # -------------------------------------------------------------------------
+    async def astream(self, pieces):
+        """
+        Run stream() in the event loop's executor, keeping the caller's
+        priority
+        """
+        ctx = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, ctx.run, self.stream,
+                                            pieces)
+        return result
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Wait for our turn, then pass *url* to the inner transport
+        """
+        with self._turn():
+            return self.inner.call(url)
+
+    # -------------------------------------------------------------------------
+    def stream(self, pieces):
+        """
+        Wait for our turn, then pass *pieces* to the inner transport
+        """
+        with self._turn():
+            return self.inner.stream(pieces)
+
+    # -------------------------------------------------------------------------
+    def waiting(self):
+        """
+        Return how many calls are queued in each class
+        """
+        with self.cond:
+            return {klass: sum(len(_) for _ in self.queues[klass].values())
+                    for klass in CLASSES}
+
+    # -------------------------------------------------------------------------
+    def _next(self):
+        """
+        Return the ticket that gets the next slot (None if no call can go
+        now) and, if one is waiting on a token, how long until it arrives
+        """
+        if self.slots <= self.busy:
+            return None, None
+        delay = None
+        for klass in CLASSES:
+            queue = self.queues[klass]
+            if not queue:
+                continue
+            bucket = self.buckets.get(klass)
+            wait = bucket.ready() if bucket else 0
+            if wait:
+                delay = wait if delay is None else min(delay, wait)
+                continue
+            tickets = next(iter(queue.values()))
+            return tickets[0], None
+        return None, delay
+
+    # -------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def _turn(self):
+        """
+        Queue the caller, wait until the scheduler picks it, and hold a slot
+        for the length of the context
+        """
+        klass, client = CURRENT.get()
+        if client is None:
+            client = threading.current_thread().name
+        ticket = object()
+        with self.cond:
+            queue = self.queues[klass]
+            queue.setdefault(client, collections.deque()).append(ticket)
+            while True:
+                chosen, delay = self._next()
+                if chosen is ticket:
+                    break
+                self.cond.wait(delay)
+            # round robin: the client goes to the back of its class
+            tickets = queue.pop(client)
+            tickets.popleft()
+            if tickets:
+                queue[client] = tickets
+            if klass in self.buckets:
+                self.buckets[klass].take()
+            self.busy += 1
+            self.served[klass] += 1
+            self.cond.notify_all()
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.busy -= 1
+                self.cond.notify_all()
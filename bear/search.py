@@ -0,0 +1,213 @@
+"""
+SearchIndex is a local, on-disk full-text index of note titles and bodies,
+ranked with BM25 (title matches count ten times as much as body matches).
+It is kept in an sqlite FTS5 table, so it stays quick well past the size
+where Bear's own search gets sluggish.
+
+Give one to a Bear object with Bear(searchindex=SearchIndex(path)); then
+every note open_note fetches is indexed, refresh() brings the whole index up
+to date (fetching only notes whose modificationDate moved), and
+bear.search(term, local=True) answers from it. Each note's tags are kept
+in a table of their own, so a search within a tag is filtered (and
+limited) in sqlite.
+
+Queries are words, all of which must match. "Quoted words" must match as a
+phrase, and a trailing * matches any word with that prefix.
+"""
+import os
+import re
+import sqlite3
+import threading
+from bear import Bearror
+from bear.tags import note_tags
+
+QUERY_RX = re.compile(r'"([^"]*)"|(\S+)')
+
+
+# -----------------------------------------------------------------------------
+def fts_query(text):
+    """
+    Turn a user's query into an FTS5 match expression. Every word or phrase
+    is quoted so punctuation in it can't be taken for FTS5 syntax.
+    """
+    terms = []
+    for match in QUERY_RX.finditer(text or ""):
+        phrase, word = match.groups()
+        if phrase is not None:
+            if phrase.strip():
+                terms.append('"{}"'.format(phrase.replace('"', '""')))
+        elif word.endswith("*") and word.strip("*"):
+            terms.append('"{}"*'.format(word.strip("*").replace('"', '""')))
+        elif word.strip("*"):
+            terms.append('"{}"'.format(word.replace('"', '""')))
+    return " ".join(terms)
+
+
+class SearchIndex(object):
+    """
+    A BM25-ranked full-text index of notes
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None):
+        """
+        Open (or create) the index at *path*, which defaults to
+        ~/.bear-search.sqlite. Use ':memory:' for a throwaway index.
+        """
+        self.path = path or os.path.expanduser("~/.bear-search.sqlite")
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        try:
+            self.db.executescript("""
+                create virtual table if not exists fulltext using fts5(
+                    title, body, tokenize = 'unicode61 remove_diacritics 2');
+                create table if not exists note (
+                    rowid integer primary key, identifier text unique,
+                    title text, modificationDate text, creationDate text,
+                    pin text);
+                create table if not exists note_tag (
+                    rowid integer, tag text, primary key (tag, rowid))
+                    without rowid;
+                create index if not exists note_tag_rowid
+                    on note_tag (rowid);
+            """)
+        except sqlite3.OperationalError as err:
+            raise Bearror("Can't set up a search index in {}: {}"
+                          "".format(self.path, err))
+
+    # -------------------------------------------------------------------------
+    def __len__(self):
+        """
+        Return the number of notes indexed
+        """
+        return self.db.execute("select count(*) from note").fetchone()[0]
+
+    # -------------------------------------------------------------------------
+    def add(self, note, pin=None):
+        """
+        Index an open_note result, unless we already have this version of it
+        """
+        with self.lock:
+            self._add(note, pin)
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """
+        Close the index
+        """
+        self.db.close()
+
+    # -------------------------------------------------------------------------
+    def query(self, text, k=20, tag=None):
+        """
+        Return summaries of the (at most) *k* best matches for *text*, best
+        first, each with its BM25 'score' added. With *tag*, only notes
+        under that tag are considered.
+        """
+        expr = fts_query(text)
+        if not expr:
+            return []
+        sql = ("select n.title, n.identifier, n.modificationDate, "
+               "n.creationDate, n.pin, -bm25(fulltext, 10.0, 1.0) "
+               "from fulltext b join note n on n.rowid = b.rowid "
+               "where fulltext match ? ")
+        args = [expr]
+        if tag is not None:
+            sql += ("and exists (select 1 from note_tag t "
+                    "where t.tag = ? and t.rowid = b.rowid) ")
+            args.append(tag)
+        sql += "order by bm25(fulltext, 10.0, 1.0) limit ?"
+        args.append(k)
+        with self.lock:
+            rows = self.db.execute(sql, args).fetchall()
+        return [{'title': row[0],
+                 'identifier': row[1],
+                 'modificationDate': row[2],
+                 'creationDate': row[3],
+                 'pin': row[4],
+                 'score': row[5]} for row in rows]
+
+    # -------------------------------------------------------------------------
+    def refresh(self, bear, summaries=None):
+        """
+        Bring the index in line with *summaries* (default: bear.search(),
+        i.e., every live note). Notes that are new or whose modificationDate
+        moved are fetched and indexed; notes no longer listed are dropped.
+        Return the number of notes fetched.
+        """
+        if summaries is None:
+            summaries = bear.search()
+        with self.lock:
+            have = dict(self.db.execute("select identifier, "
+                                        "modificationDate from note"))
+        fetched = 0
+        for item in summaries:
+            stamp = have.pop(item['identifier'], None)
+            if stamp == item['modificationDate']:
+                continue
+            note = bear.open_note(id=item['identifier'])
+            self.add(note, pin=item.get('pin'))
+            fetched += 1
+        for ident in have:
+            self.remove(ident)
+        return fetched
+
+    # -------------------------------------------------------------------------
+    def remove(self, id):
+        """
+        Drop note *id* from the index
+        """
+        with self.lock:
+            row = self.db.execute("select rowid from note "
+                                  "where identifier = ?", [id]).fetchone()
+            if row:
+                with self.db:
+                    self._delete(row[0])
+
+    # -------------------------------------------------------------------------
+    def _add(self, note, pin):
+        """
+        Index a note (caller holds the lock)
+        """
+        row = self.db.execute("select rowid, modificationDate from note "
+                              "where identifier = ?",
+                              [note['identifier']]).fetchone()
+        if row and row[1] == note.get('modificationDate'):
+            if pin:
+                with self.db:
+                    self.db.execute("update note set pin = ? where rowid = ?",
+                                    [pin, row[0]])
+            return
+        with self.db:
+            if row:
+                self._delete(row[0])
+            cur = self.db.execute("insert into note (identifier, title, "
+                                  "modificationDate, creationDate, pin) "
+                                  "values (?, ?, ?, ?, ?)",
+                                  [note['identifier'], note.get('title', ""),
+                                   note.get('modificationDate'),
+                                   note.get('creationDate'), pin or "no"])
+            self.db.execute("insert into fulltext (rowid, title, body) "
+                            "values (?, ?, ?)",
+                            [cur.lastrowid, note.get('title', ""),
+                             note['note']])
+            self._tag(cur.lastrowid, note['note'])
+
+    # -------------------------------------------------------------------------
+    def _delete(self, rowid):
+        """
+        Remove one note's rows (caller manages the transaction)
+        """
+        self.db.execute("delete from fulltext where rowid = ?", [rowid])
+        self.db.execute("delete from note where rowid = ?", [rowid])
+        self.db.execute("delete from note_tag where rowid = ?", [rowid])
+
+    # -------------------------------------------------------------------------
+    def _tag(self, rowid, text):
+        """
+        Record the tags in note body *text* (caller manages the
+        transaction)
+        """
+        self.db.executemany("insert or ignore into note_tag (rowid, tag) "
+                            "values (?, ?)",
+                            [(rowid, _) for _ in note_tags(text)])
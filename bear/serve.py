@@ -0,0 +1,333 @@
+"""
+A long-lived Bear daemon, so one-off commands from shell scripts and
+editors don't each pay for starting Python, reading the token file, and
+warming a cache.
+
+BearServer owns one Bear object (by default with an XcallPool transport, a
+NoteCache, a TagIndex, and a SearchIndex) and answers requests on a
+Unix-domain socket, readable by its owner only. BearClient is a thin proxy
+with the same methods:
+
+    $ python -m bear serve &
+    >>> from bear.serve import connect
+    >>> cub = connect()         # a BearClient if the daemon is up, else Bear()
+    >>> cub.open_note(id=...)
+
+The protocol is one JSON object per line each way:
+
+    {"method": "open_note", "args": [], "kw": {"id": "..."},
+     "priority": "interactive"}
+        -> {"result": ...}  or  {"error": "..."}
+    {"method": "ping"}  ->  {"result": {"pid": ..., "calls": ..., ...}}
+
+"priority" is optional; if the server's transport is a bear.scheduler
+Scheduler, the call is made under that class, with each connection as its
+own client. Results are plain JSON: lists rather than iterators, dicts
+rather than Note objects. The socket path is $BEAR_SOCKET, or ~/.bear.sock.
+"""
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from bear import Bear, Bearror
+
+EXPORTED = ['add_file', 'add_text', 'archive', 'bulk_idemp_add',
+            'change_font', 'change_theme', 'create', 'delete_tag',
+            'grab_url', 'has_tag', 'idemp_add', 'open_note', 'open_tag',
+            'rename_tag', 'search', 'tags', 'today', 'todo', 'trash',
+            'untagged']
+
+
+# -----------------------------------------------------------------------------
+def connect(path=None, timeout=None):
+    """
+    Return a BearClient for the daemon at *path* if one answers there, or
+    else a plain Bear object
+    """
+    client = BearClient(path, timeout=timeout)
+    try:
+        client.ping()
+    except (OSError, Bearror):
+        client.close()
+        return Bear()
+    return client
+
+
+# -----------------------------------------------------------------------------
+def socket_path():
+    """
+    Return where the daemon listens: $BEAR_SOCKET, or ~/.bear.sock
+    """
+    return os.path.expanduser(os.getenv("BEAR_SOCKET") or "~/.bear.sock")
+
+
+# -----------------------------------------------------------------------------
+def to_json(obj):
+    """
+    Turn what a Bear method returns into something json can write
+    """
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError("Can't send a {}".format(type(obj).__name__))
+
+
+class BearClient(object):
+    """
+    Make Bear calls through the daemon at *path*. The connection is opened
+    on first use and kept; calls from several threads take turns on it.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None, timeout=None, priority=None):
+        """
+        Initialize the client. *priority*, if given, goes with every call
+        (see bear.scheduler).
+        """
+        self.path = path or socket_path()
+        self.timeout = timeout
+        self.priority = priority
+        self.sock = None
+        self.rbl = None
+        self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    def __getattr__(self, name):
+        """
+        Bear's methods, relayed
+        """
+        if name not in EXPORTED:
+            raise AttributeError(name)
+
+        def method(*args, **kw):
+            return self.call(name, *args, **kw)
+
+        method.__name__ = name
+        return method
+
+    # -------------------------------------------------------------------------
+    def call(self, method, *args, **kw):
+        """
+        Ask the daemon to run *method* and return its result, raising
+        Bearror if it fails there
+        """
+        req = {'method': method, 'args': list(args), 'kw': kw}
+        if self.priority:
+            req['priority'] = self.priority
+        line = (json.dumps(req) + "\n").encode()
+        with self.lock:
+            if self.sock is None:
+                self._connect()
+            try:
+                self.sock.sendall(line)
+                rsp = self.rbl.readline()
+            except OSError:
+                self._disconnect()
+                raise
+            if not rsp:
+                self._disconnect()
+                raise Bearror("The bear daemon at {} hung up"
+                              "".format(self.path))
+        rsp = json.loads(rsp)
+        if 'error' in rsp:
+            raise Bearror(rsp['error'])
+        return rsp['result']
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """
+        Drop the connection
+        """
+        with self.lock:
+            self._disconnect()
+
+    # -------------------------------------------------------------------------
+    def ping(self):
+        """
+        Return the daemon's pid, uptime, and call count
+        """
+        return self.call('ping')
+
+    # -------------------------------------------------------------------------
+    def _connect(self):
+        """
+        Open the connection
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.rbl = sock.makefile("rb")
+
+    # -------------------------------------------------------------------------
+    def _disconnect(self):
+        """
+        Close the connection, if it's open
+        """
+        if self.sock is not None:
+            self.rbl.close()
+            self.sock.close()
+        self.sock = self.rbl = None
+
+
+class BearServer(object):
+    """
+    Answer Bear calls on a Unix-domain socket
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None, bear=None, pool=4):
+        """
+        Serve *bear* at *path* (default: socket_path()). With no *bear*,
+        one is built on an XcallPool of *pool* slots (or the transport
+        $BEAR_TRANSPORT names, if it's set) and a cache and indexes.
+        """
+        self.path = path or socket_path()
+        self.bear = bear or self._default_bear(pool)
+        self.started = time.time()
+        self.calls = 0
+        self.conns = itertools.count(1)
+        self.server = None
+        self.thread = None
+
+    # -------------------------------------------------------------------------
+    def answer(self, req, client):
+        """
+        Carry out request *req* from *client* and return the reply
+        """
+        method = req.get('method')
+        if method == 'ping':
+            return {'result': {'pid': os.getpid(),
+                               'uptime': time.time() - self.started,
+                               'calls': self.calls}}
+        if method not in EXPORTED:
+            return {'error': "The bear daemon does not offer {!r}"
+                             "".format(method)}
+        self.calls += 1
+        func = getattr(self.bear, method)
+        try:
+            if req.get('priority'):
+                from bear.scheduler import priority
+                with priority(req['priority'], client):
+                    result = func(*req.get('args', []), **req.get('kw', {}))
+            else:
+                result = func(*req.get('args', []), **req.get('kw', {}))
+            return {'result': result}
+        except (Bearror, TypeError) as err:
+            return {'error': str(err)}
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """
+        Stop serving and remove the socket
+        """
+        if self.server is not None:
+            if self.thread is not None:
+                self.server.shutdown()
+                self.thread.join()
+                self.thread = None
+            self.server.server_close()
+            self.server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    # -------------------------------------------------------------------------
+    def serve_forever(self):
+        """
+        Listen and answer until interrupted
+        """
+        self._bind()
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    # -------------------------------------------------------------------------
+    def start(self):
+        """
+        Listen and answer in a background thread; return self
+        """
+        self._bind()
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="bear-serve", daemon=True)
+        self.thread.start()
+        return self
+
+    # -------------------------------------------------------------------------
+    def _bind(self):
+        """
+        Open the socket, clearing away one left by a daemon that died, and
+        make it private to its owner
+        """
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise Bearror("A bear daemon is already listening at {}"
+                              "".format(self.path))
+            finally:
+                probe.close()
+        old = os.umask(0o177)
+        try:
+            self.server = _Server(self.path, _Handler)
+        finally:
+            os.umask(old)
+        self.server.owner = self
+
+    # -------------------------------------------------------------------------
+    def _default_bear(self, pool):
+        """
+        Build the Bear object a daemon serves when it isn't given one
+        """
+        from bear.cache import NoteCache
+        from bear.search import SearchIndex
+        from bear.tags import TagIndex
+        transport = None
+        if not os.getenv("BEAR_TRANSPORT"):
+            from bear.pool import XcallPool
+            transport = XcallPool(size=pool)
+        return Bear(transport=transport, cache=NoteCache(),
+                    tagindex=TagIndex(), searchindex=SearchIndex())
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    One client connection
+    """
+
+    # -------------------------------------------------------------------------
+    def handle(self):
+        """
+        Answer requests until the client hangs up
+        """
+        owner = self.server.owner
+        client = "conn-{}".format(next(owner.conns))
+        for line in self.rfile:
+            try:
+                rsp = owner.answer(json.loads(line), client)
+                text = json.dumps(rsp, default=to_json)
+            except Exception as err:
+                text = json.dumps({'error': "{}: {}"
+                                   "".format(type(err).__name__, err)})
+            self.wfile.write(text.encode() + b"\n")
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    A threaded Unix-domain server whose threads don't hold up exit
+    """
+    daemon_threads = True
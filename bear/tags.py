@@ -0,0 +1,241 @@
+"""
+Bear's tag syntax, and TagIndex, a local map between tags and notes.
+
+Bear tags look like #tag, #multi word tag#, or #nested/tag. A note under a
+nested tag is also under each of its parents (as in Bear's sidebar), so
+'#todo/work' puts a note under 'todo' and 'todo/work'. Tags must match
+whole names: '#workshop' is not '#work'.
+"""
+import re
+import threading
+
+TAG_RX = re.compile(r"(?<![\w#])#(?:([^\s#][^#\n]*?[^\s#])#|([^\s#]+))")
+
+
+# -----------------------------------------------------------------------------
+def hashtag(name):
+    """
+    Return the text Bear writes for tag *name*
+    """
+    if " " in name:
+        return "#{}#".format(name)
+    return "#" + name
+
+
+# -----------------------------------------------------------------------------
+def lineage(name):
+    """
+    Return *name* and each of its parents ('a/b/c' -> a, a/b, a/b/c)
+    """
+    parts = name.split("/")
+    return ["/".join(parts[:idx]) for idx in range(1, len(parts) + 1)]
+
+
+# -----------------------------------------------------------------------------
+def note_tags(text):
+    """
+    Return the set of tags in *text*, parents of nested tags included
+    """
+    rval = set()
+    for name in written_tags(text):
+        rval.update(lineage(name))
+    return rval
+
+
+# -----------------------------------------------------------------------------
+def split_tags(tags):
+    """
+    Turn a comma separated tag list into a list of tag names
+    """
+    return [_.strip() for _ in tags.split(",") if _.strip()]
+
+
+# -----------------------------------------------------------------------------
+def written_tags(text):
+    """
+    Return the set of tags written in *text*, without the parents that
+    nested tags imply
+    """
+    return {_.group(1) or _.group(2) for _ in TAG_RX.finditer(text)}
+
+
+class TagIndex(object):
+    """
+    Map tags to note identifiers and back. Give one to a Bear object with
+    Bear(tagindex=TagIndex()) and has_tag and idemp_add are answered from it
+    for any note it knows. It learns notes from build(), from open_note
+    results, and from our own add_text calls.
+
+    Each note's modificationDate is kept with it, and validate() drops a
+    note whose date has moved in a search or open_tag summary (or whose
+    date we don't know, after a change of our own), so a tag removed
+    outside this client isn't reported for long.
+
+    Alongside each note's full set of tags (parents included), the index
+    keeps the tags written on it, so a rename or delete can work out which
+    parents the note keeps. A note learned from its text knows these
+    exactly; build() only sees which tags list a note, and keeps the
+    deepest ones, so if a rename might take away a parent the note could
+    have had on its own, the note is forgotten instead.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Start empty
+        """
+        self.notes = {}
+        self.tags = {}
+        self.own = {}
+        self.stamps = {}
+        self.exact = set()
+        self.lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    def add(self, id, tags, stamp=None):
+        """
+        Record that note *id* has (at least) *tags*, as of modificationDate
+        *stamp* (None if not known)
+        """
+        with self.lock:
+            own = set(self.own.get(id, set()))
+            own.update(_.lstrip("#") for _ in tags)
+            self._set(id, own)
+            self.stamps[id] = stamp
+
+    # -------------------------------------------------------------------------
+    def build(self, bear):
+        """
+        Rebuild the index with one tags() call and one open_tag() call per
+        tag. Notes with no tags are not learned this way.
+        """
+        with self.lock:
+            self.notes, self.tags, self.own = {}, {}, {}
+            self.stamps, self.exact = {}, set()
+        for name in bear.tags():
+            for item in bear.open_tag(name):
+                self.add(item['identifier'], [name],
+                         item.get('modificationDate'))
+        with self.lock:
+            for id, own in list(self.own.items()):
+                self._set(id, {_ for _ in own if not
+                               any(o.startswith(_ + "/") for o in own)})
+
+    # -------------------------------------------------------------------------
+    def has_tag(self, id, tag):
+        """
+        Return True or False if we know note *id*, or None if we don't
+        """
+        with self.lock:
+            if id not in self.tags:
+                return None
+            return tag.lstrip("#") in self.tags[id]
+
+    # -------------------------------------------------------------------------
+    def intersect(self, *tags):
+        """
+        Return the set of identifiers of the notes carrying every one of
+        *tags*
+        """
+        with self.lock:
+            sets = [self.notes.get(_.lstrip("#"), set()) for _ in tags]
+        if not sets:
+            return set()
+        sets.sort(key=len)
+        return set(sets[0]).intersection(*sets[1:])
+
+    # -------------------------------------------------------------------------
+    def remove(self, id):
+        """
+        Forget note *id*
+        """
+        with self.lock:
+            self._drop(id)
+
+    # -------------------------------------------------------------------------
+    def rename(self, old, new=None):
+        """
+        Rename tag *old* (and its children) to *new*, or drop it if *new* is
+        None, as rename_tag/delete_tag do in Bear. Each note under *old*
+        gets its tags again from the lineage of the ones it has left.
+        """
+        with self.lock:
+            for id in list(self.notes.get(old, set())):
+                own = set()
+                for name in self.own[id]:
+                    if name != old and not name.startswith(old + "/"):
+                        own.add(name)
+                    elif new is not None:
+                        own.add(new + name[len(old):])
+                kept = {_ for _ in self.tags[id]
+                        if _ != old and not _.startswith(old + "/")}
+                after = set()
+                for name in own:
+                    after.update(lineage(name))
+                if id not in self.exact and kept - after:
+                    self._drop(id)
+                else:
+                    self._set(id, own)
+
+    # -------------------------------------------------------------------------
+    def tags_of(self, id):
+        """
+        Return the set of note *id*'s tags, parents included, or None if we
+        don't know the note
+        """
+        with self.lock:
+            if id not in self.tags:
+                return None
+            return set(self.tags[id])
+
+    # -------------------------------------------------------------------------
+    def update(self, id, text, stamp=None):
+        """
+        Set note *id*'s tags from its full text, as of modificationDate
+        *stamp* (None if not known)
+        """
+        own = written_tags(text)
+        with self.lock:
+            self._set(id, own)
+            self.stamps[id] = stamp
+            self.exact.add(id)
+
+    # -------------------------------------------------------------------------
+    def validate(self, summaries):
+        """
+        Drop the notes whose modificationDate in a list of note summaries
+        (from search or open_tag) isn't the one we have
+        """
+        with self.lock:
+            for item in summaries:
+                id = item['identifier']
+                if id in self.tags and \
+                   self.stamps.get(id) != item['modificationDate']:
+                    self._drop(id)
+
+    # -------------------------------------------------------------------------
+    def _drop(self, id):
+        """
+        Forget note *id* (caller holds the lock)
+        """
+        for name in self.tags.pop(id, set()):
+            self.notes.get(name, set()).discard(id)
+        self.own.pop(id, None)
+        self.stamps.pop(id, None)
+        self.exact.discard(id)
+
+    # -------------------------------------------------------------------------
+    def _set(self, id, own):
+        """
+        Make *own* the tags written on note *id* and index it under them and
+        their parents (caller holds the lock)
+        """
+        found = set()
+        for name in own:
+            found.update(lineage(name))
+        for name in self.tags.get(id, set()) - found:
+            self.notes.get(name, set()).discard(id)
+        for name in found:
+            self.notes.setdefault(name, set()).add(id)
+        self.tags[id] = found
+        self.own[id] = own
@@ -0,0 +1,290 @@
+"""
+TagTree holds Bear's tag names as the hierarchy they describe ('todo/work'
+is 'work' under 'todo'), so looking a tag up costs one dict step per level,
+a subtree can be listed without scanning every tag, and each tag can carry
+the number of notes under it:
+
+    tree = TagTree.build(cub, tagindex)
+    tree.count("todo")              # notes under todo or any child
+    tree.subtree("todo")            # ['todo', 'todo/home', 'todo/work']
+    tree.execute(cub, {'todo/work': "work/todo",
+                       'todo/home': "home/todo"})
+
+plan() turns a set of moves (each carrying its subtree along, as Bear's
+rename-tag does) into the fewest rename_tag calls that make them, in an
+order that works:
+
+ - a move that a parent's move already makes is dropped,
+ - parents go before children, and a child is renamed from wherever its
+   parent's move left it,
+ - a move that would merge two tags bound for different places (one
+   moving into a name another move is about to vacate, or a child carried
+   along with its parent onto a tag already there) waits until it can be
+   made safely, and if every move waits (a swap, say), one tag in the way
+   is parked under a temporary name.
+
+Tags merge only where the moves send them to the same place.
+"""
+from bear import Bearror
+
+
+# -----------------------------------------------------------------------------
+def _moved(name, old, new):
+    """
+    Return what renaming tag *old* to *new* makes of tag *name*
+    """
+    if name == old or name.startswith(old + "/"):
+        return new + name[len(old):]
+    return name
+
+
+class TagNode(object):
+    """
+    One level of a tag name, with its children by name
+    """
+    __slots__ = ('children', 'count')
+
+    # -------------------------------------------------------------------------
+    def __init__(self, count=None):
+        """
+        Start with no children
+        """
+        self.children = {}
+        self.count = count
+
+
+class TagTree(object):
+    """
+    A trie of tag names split at '/'
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, names=(), counts=None):
+        """
+        Load tag *names*. *counts* maps a tag to the number of notes under
+        it (children included).
+        """
+        self.root = TagNode()
+        counts = counts or {}
+        for name in names:
+            self.add(name, counts.get(name))
+
+    # -------------------------------------------------------------------------
+    def __contains__(self, name):
+        """
+        Is *name* a tag in the tree?
+        """
+        return self.find(name) is not None
+
+    # -------------------------------------------------------------------------
+    def __iter__(self):
+        """
+        Generate every tag name, parents before their children
+        """
+        return iter(self.subtree(None))
+
+    # -------------------------------------------------------------------------
+    def __len__(self):
+        """
+        How many tags there are
+        """
+        return len(self.subtree(None))
+
+    # -------------------------------------------------------------------------
+    def add(self, name, count=None):
+        """
+        Add tag *name* (and its parents)
+        """
+        node = self.root
+        for part in name.split("/"):
+            node = node.children.setdefault(part, TagNode())
+        if count is not None:
+            node.count = count
+        return node
+
+    # -------------------------------------------------------------------------
+    @classmethod
+    def build(cls, bear, tagindex=None):
+        """
+        Return a tree of *bear*'s tags, with the note counts from
+        *tagindex* (bear.tags.TagIndex) if one is given
+        """
+        counts = None
+        if tagindex is not None:
+            with tagindex.lock:
+                counts = {k: len(v) for k, v in tagindex.notes.items()}
+        return cls(bear.tags(), counts)
+
+    # -------------------------------------------------------------------------
+    def count(self, name):
+        """
+        Return the number of notes under *name*, or None if not known
+        """
+        node = self.find(name)
+        return None if node is None else node.count
+
+    # -------------------------------------------------------------------------
+    def execute(self, bear, moves):
+        """
+        Make *moves* through *bear*, following plan(), and keep the tree in
+        step. Return the calls made.
+        """
+        rval = []
+        for old, new in self.plan(moves):
+            bear.rename_tag(old, new)
+            self.rename(old, new)
+            rval.append((old, new))
+        return rval
+
+    # -------------------------------------------------------------------------
+    def find(self, name):
+        """
+        Return the node for *name*, or None
+        """
+        node = self.root
+        for part in name.split("/"):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    # -------------------------------------------------------------------------
+    def plan(self, moves):
+        """
+        Return the (old, new) rename_tag calls that move each tag in
+        *moves* (a dict, old -> new) to its new name, along with its
+        children (see above)
+        """
+        for old in moves:
+            if old not in self:
+                raise Bearror("Tag '{}' was not found".format(old))
+        order = sorted(moves, key=lambda _: (_.count("/"), _))
+        names = list(self)
+        final = {_: self._destination(_, moves) for _ in names}
+        cur = {_: _ for _ in names}
+        done = []
+        parked = set()
+
+        def governor(name):
+            # the deepest tag in moves at or above *name*
+            while name not in moves:
+                name = name.rsplit("/", 1)[0]
+            return name
+
+        def clash(old, new):
+            # a group of tags that renaming *old* to *new* would merge
+            # though they're bound for different places, or None
+            after = {}
+            for name in names:
+                after.setdefault(_moved(cur[name], old, new), []).append(name)
+            for group in after.values():
+                if 1 < len({final[_] for _ in group}):
+                    return group
+            return None
+
+        def unused(stem):
+            taken = set(names) | set(cur.values()) | set(final.values())
+            idx = 1
+            while any(_ == "{}{}".format(stem, idx) or
+                      _.startswith("{}{}/".format(stem, idx)) for _ in taken):
+                idx += 1
+            return "{}{}".format(stem, idx)
+
+        while True:
+            pending = [_ for _ in order if cur[_] != final[_]]
+            if not pending:
+                return done
+            for old in pending:
+                if clash(cur[old], final[old]) is None:
+                    step = (cur[old], final[old])
+                    break
+            else:
+                # every move would merge tags bound for different places:
+                # park one that's in the way under a temporary name
+                old = pending[0]
+                group = clash(cur[old], final[old])
+                moving = [_ for _ in group if cur[_] == cur[old] or
+                          cur[_].startswith(cur[old] + "/")]
+                staying = [_ for _ in group if _ not in moving]
+                unsettled = [_ for _ in staying if cur[_] != final[_]]
+                park = governor((unsettled or moving)[0])
+                if park in parked:
+                    raise Bearror("Can't find an order for these moves")
+                parked.add(park)
+                step = (cur[park], unused(final[park] + "~"))
+            done.append(step)
+            cur = {k: _moved(v, *step) for k, v in cur.items()}
+
+    # -------------------------------------------------------------------------
+    def rename(self, old, new):
+        """
+        Move tag *old* and its subtree to *new*, merging with whatever is
+        there, as Bear's rename-tag does. Parents left with no children are
+        dropped (Bear drops a tag once no note has it; a parent that has
+        notes of its own will be back when the tree is rebuilt). The counts
+        of merged tags become unknown.
+        """
+        parts = old.split("/")
+        chain = [self.root]
+        for part in parts[:-1]:
+            chain.append(chain[-1].children.get(part))
+            if chain[-1] is None:
+                return
+        node = chain[-1].children.pop(parts[-1], None)
+        if node is None:
+            return
+        for idx in range(len(chain) - 1, 0, -1):
+            if chain[idx].children:
+                break
+            del chain[idx - 1].children[parts[idx - 1]]
+        parts = new.split("/")
+        target = self.add("/".join(parts[:-1])) if 1 < len(parts) \
+            else self.root
+        self._merge(target, parts[-1], node)
+
+    # -------------------------------------------------------------------------
+    def subtree(self, name):
+        """
+        Return *name* and every tag under it, parents before children (all
+        tags, for None)
+        """
+        if name is None:
+            todo = [(k, v) for k, v in
+                    sorted(self.root.children.items(), reverse=True)]
+        else:
+            node = self.find(name)
+            todo = [(name, node)] if node is not None else []
+        rval = []
+        while todo:
+            path, node = todo.pop()
+            rval.append(path)
+            todo += [(path + "/" + k, v) for k, v in
+                     sorted(node.children.items(), reverse=True)]
+        return rval
+
+    # -------------------------------------------------------------------------
+    def _destination(self, name, moves):
+        """
+        Return where tag *name* ends up once *moves* are made: where its
+        own move sends it, or where its nearest moved parent takes it
+        """
+        parts = name.split("/")
+        for idx in range(len(parts), 0, -1):
+            above = "/".join(parts[:idx])
+            if above in moves:
+                return moves[above] + name[len(above):]
+        return name
+
+    # -------------------------------------------------------------------------
+    def _merge(self, parent, name, node):
+        """
+        Put *node* under *parent* as *name*, merging it into any node
+        already there
+        """
+        have = parent.children.get(name)
+        if have is None:
+            parent.children[name] = node
+            return
+        have.count = None
+        for child, sub in node.children.items():
+            self._merge(have, child, sub)
@@ -0,0 +1,229 @@
+"""
+A transport carries a bear x-callback url to the Bear app and brings back the
+raw reply text. Bear._xcall decodes the reply, so every transport must hand
+back exactly what xcall would have written to stdout.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import time
+from bear.url import arg_limit
+
+
+CASSETTES = {}
+TIMEOUT = 30.0
+
+
+# -----------------------------------------------------------------------------
+def default_transport():
+    """
+    Return the transport a Bear object uses when none is passed in. Setting
+    $BEAR_TRANSPORT to 'fake' selects the in-memory backend so scripts (and
+    tests) can run dry on a machine without Bear. 'record:PATH' records
+    xcall traffic to cassette PATH, and 'replay:PATH' and
+    'replay-order:PATH' play it back, matching by url or by order (see
+    bear.cassette). Every Bear object in the process shares one cassette.
+    """
+    choice = os.getenv("BEAR_TRANSPORT") or ""
+    if choice == "fake":
+        from bear.fake import FakeTransport
+        return FakeTransport()
+    if choice.startswith(("record:", "replay:", "replay-order:")):
+        if choice not in CASSETTES:
+            from bear.cassette import RecordingTransport, ReplayTransport
+            mode, path = choice.split(":", 1)
+            if mode == "record":
+                CASSETTES[choice] = RecordingTransport(XcallTransport(), path)
+            elif mode == "replay":
+                CASSETTES[choice] = ReplayTransport(path)
+            else:
+                CASSETTES[choice] = ReplayTransport(path, match="order")
+        return CASSETTES[choice]
+    return XcallTransport()
+
+
+# -----------------------------------------------------------------------------
+def default_timeout():
+    """
+    Return how many seconds an xcall run may take unless told otherwise:
+    $BEAR_TIMEOUT, or TIMEOUT
+    """
+    value = os.getenv("BEAR_TIMEOUT")
+    try:
+        return float(value) if value else TIMEOUT
+    except ValueError:
+        from bear import Bearror
+        raise Bearror("$BEAR_TIMEOUT should be a number of seconds, not "
+                      "{!r}".format(value))
+
+
+# -----------------------------------------------------------------------------
+def xcall_path():
+    """
+    Return the default path to the xcall program
+    """
+    path = os.path.join("$HOME/prj/bear/ulysses-python-client/lib",
+                        "xcall.app", "Contents", "MacOS", "xcall")
+    return os.path.expandvars(path)
+
+
+class Transport(object):
+    """
+    Base class for transports. Subclasses provide call(url), which returns
+    the reply text for *url*.
+
+    A transport that does not need Bear's API token file (e.g., the fake
+    backend) sets *token* to the value Bear should use instead.
+
+    A transport that can only carry urls up to some length sets *max_url*;
+    Bear splits a longer add-text over several urls to stay under it.
+    """
+    token = None
+    max_url = None
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Deliver *url* and return the reply text
+        """
+        raise NotImplementedError("{} must define call()"
+                                  "".format(self.__class__.__name__))
+
+    # -------------------------------------------------------------------------
+    async def acall(self, url):
+        """
+        Deliver *url* for asyncio callers. By default, call() runs in the
+        event loop's executor so it doesn't block the loop.
+        """
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.call, url)
+        return result
+
+    # -------------------------------------------------------------------------
+    async def astream(self, pieces):
+        """
+        Deliver a url given in *pieces* for asyncio callers, running
+        stream() in the event loop's executor
+        """
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.stream, pieces)
+        return result
+
+    # -------------------------------------------------------------------------
+    def stream(self, pieces):
+        """
+        Deliver a url given as an iterable of *pieces* (see bear.url.stream)
+        and return the reply text. The pieces are joined and passed to
+        call(); none of the transports here can take a url in parts (xcall
+        wants it as one argument), so this is the hook for one that could.
+        """
+        url = "".join(pieces)
+        if self.max_url is not None and self.max_url < len(url):
+            from bear import Bearror
+            raise Bearror("A url of {} characters is longer than the {} "
+                          "the transport can carry"
+                          "".format(len(url), self.max_url))
+        return self.call(url)
+
+
+class XcallTransport(Transport):
+    """
+    Deliver urls to the Bear app by running xcall
+    (https://github.com/martinfinke/xcall) once per url.
+
+    xcall is exec'd directly with the url as an argument, so no shell is
+    involved and the url needs no shell quoting. When Bear answers through
+    its x-error callback, xcall writes the error to stderr and exits
+    nonzero; that comes back as an {"errorMessage": ...} reply, so Bear's
+    decoding raises it as Bearror. A call that takes longer than *timeout*
+    seconds (default: default_timeout()) is killed and raises Bearror, so
+    a Bear that never answers can't hang the caller. After each call, *timing*
+    holds the seconds spent starting xcall ('spawn'), waiting for Bear to
+    answer ('wait'), and overall ('total').
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None, timeout=None):
+        """
+        Initialize the object. *path* defaults to xcall_path().
+        """
+        self.path = path or xcall_path()
+        self.timeout = default_timeout() if timeout is None else timeout
+        self.timing = {}
+        self.max_url = arg_limit()
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Run xcall and pass it a url
+        """
+        start = time.monotonic()
+        proc = subprocess.Popen([self.path, "-url", url],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        spawned = time.monotonic()
+        try:
+            result, errors = proc.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            self._clock(start, spawned)
+            from bear import Bearror
+            raise Bearror("xcall did not finish in {} seconds"
+                          "".format(self.timeout))
+        self._clock(start, spawned)
+        return self._reply(proc.returncode, result, errors)
+
+    # -------------------------------------------------------------------------
+    async def acall(self, url):
+        """
+        Run xcall as an asyncio subprocess and pass it a url
+        """
+        start = time.monotonic()
+        proc = await asyncio.create_subprocess_exec(
+            self.path, "-url", url,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        spawned = time.monotonic()
+        try:
+            result, errors = await asyncio.wait_for(proc.communicate(),
+                                                    self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.communicate()
+            self._clock(start, spawned)
+            from bear import Bearror
+            raise Bearror("xcall did not finish in {} seconds"
+                          "".format(self.timeout))
+        self._clock(start, spawned)
+        return self._reply(proc.returncode, result.decode(), errors.decode())
+
+    # -------------------------------------------------------------------------
+    def _clock(self, start, spawned):
+        """
+        Record where the time went in the last call
+        """
+        done = time.monotonic()
+        self.timing = {'spawn': spawned - start,
+                       'wait': done - spawned,
+                       'total': done - start}
+
+    # -------------------------------------------------------------------------
+    def _reply(self, status, out, err):
+        """
+        Return the reply text for an xcall run that exited with *status*,
+        having written *out* and *err*. A failed run's error becomes an
+        {"errorMessage": ...} reply unless xcall already wrote one.
+        """
+        if status == 0:
+            return out.strip()
+        text = err.strip() or out.strip()
+        try:
+            if 'errorMessage' in json.loads(text):
+                return text
+        except (ValueError, TypeError):
+            pass
+        if not text:
+            text = "xcall exited with status {}".format(status)
+        return json.dumps({'errorMessage': text})
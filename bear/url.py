@@ -0,0 +1,235 @@
+"""
+Building bear urls: quoting parameter values, splitting text that would
+make a url too long to hand to xcall, and streaming file attachments.
+
+The quoting table is built once, at import. Quoting is a chain of
+str.replace calls rather than one pass with str.translate or re.sub: each
+replace runs at memchr speed in C, and on large note text the chain is about
+five times faster than either single-pass approach.
+
+A file passed to add_file or create as a path or file object is wrapped in
+a FilePayload, which memory-maps it and yields its base64 encoding a chunk
+at a time, so the raw file is never read into memory and its encoded size
+is checked against the transport's limit before any of it is encoded.
+xcall takes the url as a single argument, though, so every transport here
+joins the pieces into one string: the encoded file does sit in memory
+once, as part of the url.
+"""
+import base64
+import io
+import mmap
+import os
+import sys
+
+# characters that have been tested and do not need url quoting (at least for
+# add_text): /, =, ', [, ], (, ), ., $, <comma>, *, -, !, @, +, ?, ~
+QUOTED = "% #\"\n\t><^&{}|\\`"
+STR_PAIRS = [(_, "%{:02x}".format(ord(_))) for _ in QUOTED]
+BYTES_PAIRS = [(old.encode(), new.encode()) for old, new in STR_PAIRS]
+PREFIX = "bear://x-callback-url/"
+CHUNK = 3 * 256 * 1024
+B64_PAIRS = [("+", "%2b"), ("/", "%2f"), ("=", "%3d")]
+
+
+# -----------------------------------------------------------------------------
+def arg_limit():
+    """
+    Return the longest url we can pass to xcall as a single argument: the
+    system's ARG_MAX less the environment and some slack, and on Linux no
+    more than MAX_ARG_STRLEN (128 KiB), the cap on any one argument.
+    """
+    try:
+        total = os.sysconf("SC_ARG_MAX")
+    except (ValueError, OSError):
+        total = 256 * 1024
+    env = sum(len(k) + len(v) + 2 for k, v in os.environ.items())
+    limit = total - env - 4096
+    if sys.platform.startswith("linux"):
+        limit = min(limit, 128 * 1024 - 1)
+    return limit
+
+
+# -----------------------------------------------------------------------------
+def build(cmd, kw):
+    """
+    Build a bear url for *cmd* with parameters *kw*
+    """
+    if not kw:
+        return PREFIX + cmd
+    return PREFIX + cmd + "?" + "&".join([key + "=" + quote(val)
+                                          for key, val in kw.items()])
+
+
+# -----------------------------------------------------------------------------
+def payload(value):
+    """
+    Wrap *value* in a FilePayload if it is a path or a file object. Anything
+    else (e.g., a str or bytes that is already base64) is returned as is.
+    """
+    if isinstance(value, os.PathLike) or hasattr(value, "read"):
+        return FilePayload(value)
+    return value
+
+
+# -----------------------------------------------------------------------------
+def quote(kv):
+    """
+    Encode *kv* so that it won't freak out Bear's URL processor. Bytes are
+    quoted and then decoded as utf-8, so the result is always a str.
+    """
+    if isinstance(kv, FilePayload):
+        return "".join(kv)
+    if isinstance(kv, bytes):
+        for old, new in BYTES_PAIRS:
+            kv = kv.replace(old, new)
+        return kv.decode()
+    kv = str(kv)
+    for old, new in STR_PAIRS:
+        kv = kv.replace(old, new)
+    return kv
+
+
+# -----------------------------------------------------------------------------
+def split_text(text, budget):
+    """
+    Split *text* at newlines into pieces that each take no more than
+    *budget* characters once quoted. Joining the pieces with newlines gives
+    back *text*. A single line too long for *budget* raises ValueError.
+    """
+    pieces = []
+    cur = []
+    size = 0
+    for line in text.split("\n"):
+        qlen = len(quote(line))
+        if budget < qlen:
+            raise ValueError("A line of {} characters is too long for one "
+                             "url".format(len(line)))
+        if cur and budget < size + 3 + qlen:
+            pieces.append("\n".join(cur))
+            cur = []
+            size = 0
+        size += qlen + (3 if cur else 0)
+        cur.append(line)
+    pieces.append("\n".join(cur))
+    return pieces
+
+
+# -----------------------------------------------------------------------------
+def stream(cmd, kw):
+    """
+    Yield the url build(cmd, kw) would return in pieces, with any
+    FilePayload in *kw* coming a chunk at a time
+    """
+    yield PREFIX + cmd
+    sep = "?"
+    for key, val in kw.items():
+        yield sep + key + "="
+        if isinstance(val, FilePayload):
+            yield from val
+        else:
+            yield quote(val)
+        sep = "&"
+
+
+class FilePayload(object):
+    """
+    The content of a file (a path or an open binary file) to be sent as a
+    url parameter. Iterating yields its base64 encoding, with +, /, and =
+    percent-encoded as Bear's docs ask, *chunk* input bytes at a time.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, source, chunk=CHUNK):
+        """
+        Wrap *source*. *chunk* is rounded down to a multiple of 3 so the
+        chunks encode without padding and can simply be concatenated.
+        """
+        self.source = source
+        self.chunk = max(3, chunk - chunk % 3)
+
+    # -------------------------------------------------------------------------
+    def __iter__(self):
+        """
+        Yield the encoded file a chunk at a time
+        """
+        for raw in self._chunks():
+            text = base64.b64encode(raw).decode()
+            for old, new in B64_PAIRS:
+                text = text.replace(old, new)
+            yield text
+
+    # -------------------------------------------------------------------------
+    def encoded_size(self):
+        """
+        Return the length of the base64 encoding before percent-encoding
+        (so, a lower bound on what iterating yields), or None if the size
+        of the source can't be told
+        """
+        size = self.size()
+        if size is None:
+            return None
+        return 4 * ((size + 2) // 3)
+
+    # -------------------------------------------------------------------------
+    def name(self):
+        """
+        Return the source's file name, or None if it has none
+        """
+        name = self.source
+        if not isinstance(name, os.PathLike):
+            name = getattr(self.source, "name", None)
+        if isinstance(name, (str, os.PathLike)):
+            return os.path.basename(os.fspath(name))
+        return None
+
+    # -------------------------------------------------------------------------
+    def size(self):
+        """
+        Return the number of bytes to be encoded, or None if that can't be
+        told without reading the source
+        """
+        if isinstance(self.source, os.PathLike):
+            return os.stat(self.source).st_size
+        try:
+            return os.fstat(self.source.fileno()).st_size - self.source.tell()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    # -------------------------------------------------------------------------
+    def _chunks(self):
+        """
+        Yield the raw bytes of the source a chunk at a time
+        """
+        if isinstance(self.source, os.PathLike):
+            with open(self.source, "rb") as fobj:
+                yield from self._read(fobj)
+        else:
+            yield from self._read(self.source)
+
+    # -------------------------------------------------------------------------
+    def _read(self, fobj):
+        """
+        Yield *fobj*'s bytes from its current position, through a memory map
+        if it's a real file, else with read(). Every piece but the last is a
+        multiple of 3 bytes long, even if read() comes up short.
+        """
+        try:
+            start = fobj.tell()
+            view = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            view = None
+        if view is None:
+            rest = b""
+            raw = fobj.read(self.chunk)
+            while raw:
+                raw = rest + raw
+                cut = len(raw) - len(raw) % 3
+                rest = raw[cut:]
+                yield raw[:cut]
+                raw = fobj.read(self.chunk)
+            if rest:
+                yield rest
+            return
+        with view:
+            for offset in range(start, len(view), self.chunk):
+                yield view[offset:offset + self.chunk]
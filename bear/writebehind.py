@@ -0,0 +1,352 @@
+"""
+Journal is a durable write-behind queue. Give one to a Bear object with
+Bear(journal=Journal(path)) and its writes (create, add_text, archive,
+trash, rename_tag, delete_tag, grab_url) are recorded in a sqlite file and
+return at once with an Entry; a background thread sends them to Bear in the
+order they were made. Reads go straight to Bear and don't wait for queued
+writes (call drain() first if they need to). A write carrying a file is
+sent directly, after the journal has drained, to keep writes in order.
+
+Each entry moves through these states, each change committed before the
+next step is taken:
+
+    queued   waiting to be sent
+    sent     handed to Bear, no answer yet
+    done     Bear answered; the reply is in result
+    failed   Bear refused it (the error is kept); the flusher moves on
+    unknown  we can't tell whether Bear applied it
+    skipped  an unknown entry that resolve() said not to send again
+
+An entry found in 'sent' when the journal is opened was cut off by a crash
+(or a sleep, or Bear quitting). If sending it twice is harmless (archive,
+trash; see bear.policy.IDEMPOTENT) it is queued again; otherwise it is
+marked unknown. A timeout on such a write is treated the same way. While
+any entry is unknown the flusher holds off, since later writes may depend on
+it; look at unknown() and settle each with resolve().
+"""
+import json
+import sqlite3
+import threading
+import time
+from bear import Bearror
+from bear.policy import IDEMPOTENT, RETRYABLE, classify
+from bear.url import FilePayload
+
+SCHEMA = """
+create table if not exists journal (
+    seq integer primary key autoincrement,
+    cmd text not null,
+    kw text not null,
+    state text not null default 'queued',
+    result text,
+    error text,
+    queued real,
+    finished real)
+"""
+
+
+class Entry(object):
+    """
+    One journaled write, as handed back to the caller
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, seq, cmd, kw, state="queued", result=None,
+                 error=None):
+        """
+        Initialize the entry
+        """
+        self.seq = seq
+        self.cmd = cmd
+        self.kw = kw
+        self.state = state
+        self.result = result
+        self.error = error
+        self.settled = threading.Event()
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """
+        Show which write this is and how far it's got
+        """
+        return "Entry({}, {!r}, {})".format(self.seq, self.cmd, self.state)
+
+    # -------------------------------------------------------------------------
+    def wait(self, timeout=None):
+        """
+        Wait until the entry is done, failed, or unknown. Return Bear's reply,
+        or raise Bearror if it didn't land.
+        """
+        if not self.settled.wait(timeout):
+            raise Bearror("Journal entry {} is still {}"
+                          "".format(self.seq, self.state))
+        if self.state != "done":
+            raise Bearror("Journal entry {} is {}: {}"
+                          "".format(self.seq, self.state, self.error))
+        return self.result
+
+
+class Journal(object):
+    """
+    A sqlite-backed queue of Bear writes and the thread that flushes it
+    """
+    journaled = ['add-text', 'archive', 'create', 'delete-tag', 'grab-url',
+                 'rename-tag', 'trash']
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path, idle=1.0, backoff=5.0):
+        """
+        Open (or create) the journal at *path* and recover from any crash.
+        The flusher starts when a Bear object is attached.
+
+        idle: seconds the flusher sleeps when there's nothing to send (new
+            entries wake it at once)
+        backoff: seconds to wait before retrying an idempotent write that
+            hit a timeout
+        """
+        self.path = path
+        self.idle = idle
+        self.backoff = backoff
+        self.bear = None
+        self.thread = None
+        self.stopping = False
+        self.entries = {}
+        self.cond = threading.Condition()
+        self.db = sqlite3.connect(path, check_same_thread=False,
+                                  isolation_level=None)
+        self.db.execute("pragma journal_mode = wal")
+        self.db.execute("pragma synchronous = full")
+        self.db.execute(SCHEMA)
+        self._recover()
+
+    # -------------------------------------------------------------------------
+    def attach(self, bear):
+        """
+        Send the journal's entries through *bear*, starting the flusher
+        """
+        if self.bear is not None and self.bear is not bear:
+            raise Bearror("The journal is already attached to a Bear object")
+        self.bear = bear
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._flusher,
+                                           name="bear-journal", daemon=True)
+            self.thread.start()
+
+    # -------------------------------------------------------------------------
+    def close(self, timeout=None):
+        """
+        Let the flusher finish what's queued (for up to *timeout* seconds),
+        then stop it and close the file. Anything left over is sent next
+        time the journal is opened.
+        """
+        if self.thread is not None:
+            self.drain(timeout)
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.cond:
+            self.db.close()
+
+    # -------------------------------------------------------------------------
+    def counts(self):
+        """
+        Return how many entries are in each state
+        """
+        with self.cond:
+            rows = self.db.execute("select state, count(*) from journal "
+                                   "group by state").fetchall()
+        return dict(rows)
+
+    # -------------------------------------------------------------------------
+    def drain(self, timeout=None):
+        """
+        Wait until nothing is queued or in flight, or the flusher is held
+        up by an unknown entry, or *timeout* seconds pass. Return the number
+        of entries still waiting.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                left = self._pending()
+                if not left or self._held():
+                    return left
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        return left
+                self.cond.wait(wait)
+
+    # -------------------------------------------------------------------------
+    def entry(self, seq):
+        """
+        Return the Entry for *seq*, as it stands in the file
+        """
+        with self.cond:
+            row = self.db.execute("select seq, cmd, kw, state, result, error "
+                                  "from journal where seq = ?",
+                                  (seq,)).fetchone()
+        if row is None:
+            raise Bearror("No journal entry {}".format(seq))
+        return self._entry(row)
+
+    # -------------------------------------------------------------------------
+    def resolve(self, seq, resend):
+        """
+        Settle unknown entry *seq*: queue it again if *resend* (Bear didn't
+        get it), or mark it skipped (Bear did)
+        """
+        state = "queued" if resend else "skipped"
+        with self.cond:
+            cur = self.db.execute("update journal set state = ? where "
+                                  "seq = ? and state = 'unknown'",
+                                  (state, seq))
+            if cur.rowcount == 0:
+                raise Bearror("Journal entry {} is not unknown".format(seq))
+            self.cond.notify_all()
+
+    # -------------------------------------------------------------------------
+    def route(self, cmd, kw, lazy=False):
+        """
+        Record a write and return its Entry, or send anything else through
+        the Bear object directly
+        """
+        files = any(isinstance(_, FilePayload) for _ in kw.values())
+        if cmd not in self.journaled or files:
+            if files:
+                self.drain()
+            return self.bear._send(cmd, kw, lazy)
+        text = json.dumps(kw, separators=(",", ":"))
+        with self.cond:
+            cur = self.db.execute("insert into journal (cmd, kw, queued) "
+                                  "values (?, ?, ?)",
+                                  (cmd, text, time.time()))
+            entry = Entry(cur.lastrowid, cmd, kw)
+            self.entries[entry.seq] = entry
+            self.cond.notify_all()
+        return entry
+
+    # -------------------------------------------------------------------------
+    def unknown(self):
+        """
+        Return the entries we can't tell whether Bear applied
+        """
+        with self.cond:
+            rows = self.db.execute("select seq, cmd, kw, state, result, "
+                                   "error from journal where state = "
+                                   "'unknown' order by seq").fetchall()
+        return [self._entry(_) for _ in rows]
+
+    # -------------------------------------------------------------------------
+    def _claim(self):
+        """
+        Mark the oldest queued entry sent and return its seq, cmd, and kw,
+        or None if there's nothing we may send
+        """
+        if self._held():
+            return None
+        row = self.db.execute("select seq, cmd, kw from journal where "
+                              "state = 'queued' order by seq "
+                              "limit 1").fetchone()
+        if row is None:
+            return None
+        self.db.execute("update journal set state = 'sent' where seq = ?",
+                        (row[0],))
+        return row
+
+    # -------------------------------------------------------------------------
+    def _entry(self, row):
+        """
+        Build an Entry from a journal row
+        """
+        seq, cmd, kw, state, result, error = row
+        entry = Entry(seq, cmd, json.loads(kw), state,
+                      json.loads(result) if result else None, error)
+        if state not in ["queued", "sent"]:
+            entry.settled.set()
+        return entry
+
+    # -------------------------------------------------------------------------
+    def _finish(self, seq, state, result=None, error=None):
+        """
+        Record how entry *seq* ended and tell anyone waiting on it
+        """
+        text = None if result is None else json.dumps(result)
+        with self.cond:
+            self.db.execute("update journal set state = ?, result = ?, "
+                            "error = ?, finished = ? where seq = ?",
+                            (state, text, error, time.time(), seq))
+            entry = self.entries.get(seq)
+            if entry is not None:
+                entry.state, entry.result, entry.error = state, result, error
+                if state != "queued":
+                    del self.entries[seq]
+                    entry.settled.set()
+            self.cond.notify_all()
+
+    # -------------------------------------------------------------------------
+    def _flusher(self):
+        """
+        Send queued entries, oldest first, until told to stop
+        """
+        while True:
+            with self.cond:
+                row = None
+                while not self.stopping:
+                    row = self._claim()
+                    if row is not None:
+                        break
+                    self.cond.wait(self.idle)
+                if self.stopping:
+                    return
+            seq, cmd, kw = row
+            try:
+                result = self.bear._send(cmd, json.loads(kw))
+            except Bearror as err:
+                kind = classify(err, cmd)
+                if kind not in RETRYABLE:
+                    self._finish(seq, "failed", error=str(err))
+                elif cmd in IDEMPOTENT:
+                    self._finish(seq, "queued", error=str(err))
+                    with self.cond:
+                        self.cond.wait(self.backoff)
+                else:
+                    self._finish(seq, "unknown", error=str(err))
+                continue
+            except Exception as err:
+                self._finish(seq, "unknown", error=repr(err))
+                continue
+            self._finish(seq, "done", result)
+
+    # -------------------------------------------------------------------------
+    def _held(self):
+        """
+        Is the flusher held up by an unknown entry?
+        """
+        return self.db.execute("select 1 from journal where state = "
+                               "'unknown' limit 1").fetchone() is not None
+
+    # -------------------------------------------------------------------------
+    def _pending(self):
+        """
+        Return how many entries are queued or in flight
+        """
+        return self.db.execute("select count(*) from journal where state in "
+                               "('queued', 'sent')").fetchone()[0]
+
+    # -------------------------------------------------------------------------
+    def _recover(self):
+        """
+        Entries left 'sent' by a crash are queued again if it's safe to send
+        them twice, and otherwise marked unknown
+        """
+        rows = self.db.execute("select seq, cmd from journal where "
+                               "state = 'sent'").fetchall()
+        for seq, cmd in rows:
+            state = "queued" if cmd in IDEMPOTENT else "unknown"
+            self.db.execute("update journal set state = ?, error = ? "
+                            "where seq = ?",
+                            (state, "interrupted before Bear answered", seq))
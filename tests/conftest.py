@@ -1,6 +1,7 @@
 """
 Customizations for pytest
 """
+import os
 import pdb
 import pytest
 
@@ -12,6 +13,27 @@ def pytest_addoption(parser):
     """
     parser.addoption("--dbg", action='append', default=[],
                      help="start debugger on named test or all")
+    parser.addoption("--record", action='store', default=None,
+                     help="record xcall traffic to this cassette")
+    parser.addoption("--replay", action='store', default=None,
+                     help="answer xcall traffic from this cassette")
+    parser.addoption("--replay-match", action='store', default="url",
+                     choices=["url", "order"],
+                     help="match replayed calls by url or by order")
+
+
+# -----------------------------------------------------------------------------
+def pytest_configure(config):
+    """
+    With --record or --replay, Bear objects built without a transport
+    record to or replay from a cassette (see bear.cassette)
+    """
+    if config.getoption("record"):
+        os.environ["BEAR_TRANSPORT"] = "record:" + config.getoption("record")
+    elif config.getoption("replay"):
+        mode = {'url': "replay:", 'order': "replay-order:"}
+        os.environ["BEAR_TRANSPORT"] = (mode[config.getoption("replay_match")]
+                                        + config.getoption("replay"))
 
 
 # -----------------------------------------------------------------------------
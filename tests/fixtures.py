@@ -1,5 +1,7 @@
 from bear import Bear, Bearror
+from bear.fake import FakeTransport
 import pytest
+import sqlite3
 import uuid
 
 
@@ -48,3 +50,50 @@ def tnt():
     (data['hdr'], data['body']) = note['note'].split("\n", 1)
     yield data
     data["cub"].trash(id=data['id'])
+
+
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def fcub():
+    """
+    Provide a Bear object that talks to a fresh in-memory fake database
+    """
+    return Bear(transport=FakeTransport())
+
+
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def beardb(tmpdir):
+    """
+    Build a small database with Bear's schema and return its path. Note N
+    (N = 0..4) has identifier 'NOTE-N', title 'Note N', and tag 'all'; note
+    1 is also tagged 'work/home', note 2 is trashed, note 3 is archived, and
+    note 4 is pinned.
+    """
+    path = tmpdir.join("database.sqlite").strpath
+    db = sqlite3.connect(path)
+    db.executescript("""
+        create table ZSFNOTE (Z_PK integer primary key, ZTITLE varchar,
+            ZTEXT varchar, ZUNIQUEIDENTIFIER varchar, ZTRASHED integer,
+            ZARCHIVED integer, ZPINNED integer, ZPERMANENTLYDELETED integer,
+            ZCREATIONDATE timestamp, ZMODIFICATIONDATE timestamp);
+        create table ZSFNOTETAG (Z_PK integer primary key, ZTITLE varchar);
+        create table Z_7TAGS (Z_7NOTES integer, Z_14TAGS integer);
+        insert into ZSFNOTETAG values (1, 'all'), (2, 'work'),
+                                      (3, 'work/home');
+        pragma journal_mode = wal;
+    """)
+    for idx in range(5):
+        text = "# Note {}\nbody {}\n#all".format(idx, idx)
+        if idx == 1:
+            text += " #work/home"
+            db.execute("insert into Z_7TAGS values (2, 2), (2, 3)")
+        db.execute("insert into ZSFNOTE values (?, ?, ?, ?, ?, ?, ?, 0, "
+                   "?, ?)",
+                   [idx + 1, "Note {}".format(idx), text,
+                    "NOTE-{}".format(idx), int(idx == 2), int(idx == 3),
+                    int(idx == 4), 600000000.0, 600000000.0 + idx])
+        db.execute("insert into Z_7TAGS values (?, 1)", [idx + 1])
+    db.commit()
+    db.close()
+    return path
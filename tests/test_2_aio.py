@@ -0,0 +1,80 @@
+"""
+Tests for AsyncBear
+"""
+import asyncio
+from bear import Bearror
+from bear.aio import AsyncBear
+from bear.fake import FakeTransport
+import pytest
+
+
+class SlowFake(FakeTransport):
+    """
+    A fake that takes a while to answer and keeps track of how many calls
+    are in flight at once
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Start with nothing in flight
+        """
+        FakeTransport.__init__(self)
+        self.inflight = self.peak = 0
+
+    # -------------------------------------------------------------------------
+    async def acall(self, url):
+        """
+        Count the call in, wait a bit, count it out, and answer it
+        """
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        await asyncio.sleep(0.01)
+        self.inflight -= 1
+        return self.call(url)
+
+
+# -----------------------------------------------------------------------------
+def test_aio_endpoints():
+    """
+    The async endpoints give the same results as the Bear ones
+    """
+    pytest.dbgfunc()
+
+    async def body(cub):
+        made = await cub.create(title="Async", text="body", tags="one")
+        nid = made['identifier']
+        await cub.add_text(id=nid, text="more", mode="append")
+        note = await cub.open_note(id=nid)
+        assert note['note'] == "# Async\nbody\n#one\nmore"
+        assert await cub.tags() == ["one"]
+        assert [_['identifier'] for _ in await cub.open_tag("one")] == [nid]
+        assert await cub.has_tag(nid, "one")
+        assert await cub.idemp_add(id=nid, tag="two")
+        assert not await cub.idemp_add(id=nid, tag="two")
+        await cub.archive(id=nid)
+        assert await cub.search(term="Async") == []
+        with pytest.raises(Bearror) as err:
+            await cub.open_tag("nonesuch")
+        assert "Tag 'nonesuch' was not found" in str(err.value)
+        with pytest.raises(Bearror):
+            await cub.add_text(id=nid, text="x", mode="bogus")
+
+    asyncio.run(body(AsyncBear(transport=FakeTransport())))
+
+
+# -----------------------------------------------------------------------------
+def test_aio_concurrency():
+    """
+    Calls run concurrently, but no more than concurrency at a time
+    """
+    pytest.dbgfunc()
+    xport = SlowFake()
+    ids = [xport.add_note("# Note {}".format(_)) for _ in range(40)]
+
+    async def body(cub):
+        return await asyncio.gather(*[cub.open_note(id=_) for _ in ids])
+
+    notes = asyncio.run(body(AsyncBear(transport=xport, concurrency=8)))
+    assert [_['identifier'] for _ in notes] == ids
+    assert xport.peak == 8
@@ -0,0 +1,116 @@
+"""
+Tests for archiving stale notes
+"""
+from bear import Bear, Bearror
+from bear.archiver import AgeIndex, cutoff
+from bear.fake import FakeTransport
+import datetime
+import pytest
+
+NOW = datetime.datetime.utcnow()
+
+
+class Refusing(FakeTransport):
+    """
+    A fake Bear that can't find the notes in *refuse*
+    """
+    refuse = set()
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Refuse or answer
+        """
+        if any(_ in url for _ in self.refuse):
+            raise Bearror("The note could not be found")
+        return FakeTransport.call(self, url)
+
+
+# -----------------------------------------------------------------------------
+def seed(fake):
+    """
+    Put notes of various ages (in days) into *fake* and return their ids by
+    title
+    """
+    rval = {}
+    for title, days, kw in [("Ancient", 4000, {}),
+                            ("Old", 2000, {}),
+                            ("Pinned", 3000, {'pin': True}),
+                            ("Tagged", 2500, {}),
+                            ("Shelved", 3000, {'archived': True}),
+                            ("Recent", 10, {})]:
+        text = title + ("\n#keep" if title == "Tagged" else "")
+        when = NOW - datetime.timedelta(days=days)
+        rval[title] = fake.add_note(text, created=when, **kw)
+    return rval
+
+
+# -----------------------------------------------------------------------------
+def test_cutoff_and_index():
+    """
+    The index hands back the notes older than a stamp, oldest first
+    """
+    pytest.dbgfunc()
+    assert cutoff(1, datetime.datetime(2020, 3, 2)) == "2020-03-01T00:00:00Z"
+    index = AgeIndex([{'identifier': str(_), 'title': "",
+                       'modificationDate': "2020-01-{:02d}T00:00:00Z"
+                       "".format(_), 'pin': "no"} for _ in [5, 1, 3]])
+    assert len(index) == 3
+    assert [_[1] for _ in index.older_than("2020-01-04T00:00:00Z")] == \
+        ["1", "3"]
+    assert index.older_than("2020-01-01T00:00:00Z") == []
+
+
+# -----------------------------------------------------------------------------
+def test_plan():
+    """
+    The plan picks the old live notes, minus pinned ones, without opening
+    any, and archives nothing
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    ids = seed(fake)
+    cub = Bear(transport=fake)
+    plan = cub.archive_older_than(5 * 365)
+    assert [_[2] for _ in plan.rows] == ["Ancient", "Tagged", "Old"]
+    assert (plan.considered, plan.pinned) == (5, 1)
+    assert "3 of 5 notes" in plan.describe()
+    assert plan.to_dict()['notes'][0]['identifier'] == ids['Ancient']
+    assert fake.calls == ["search"]
+    assert not any(_.archived for _ in fake.notes.values()
+                   if _.identifier != ids['Shelved'])
+
+    plan = cub.archive_older_than(datetime.timedelta(days=5 * 365),
+                                  exclude_pinned=False)
+    assert len(plan) == 4
+    plan = cub.archive_older_than(365, tag="keep")
+    assert [_[2] for _ in plan.rows] == ["Tagged"]
+
+
+# -----------------------------------------------------------------------------
+def test_execute(tmpdir):
+    """
+    Executing archives the plan, checkpointing as it goes, and a rerun
+    skips what's done
+    """
+    pytest.dbgfunc()
+    fake = Refusing()
+    ids = seed(fake)
+    cub = Bear(transport=fake)
+    ckpt = tmpdir.join("archive.ckpt")
+    plan = cub.archive_older_than(5 * 365)
+    fake.refuse = {ids['Old']}
+    report = plan.execute(parallel=2, checkpoint=ckpt.strpath)
+    assert sorted(report['archived']) == sorted([ids['Ancient'],
+                                                 ids['Tagged']])
+    assert list(report['failed']) == [ids['Old']]
+    assert fake.notes[ids['Ancient']].archived
+    assert not fake.notes[ids['Pinned']].archived
+    assert sorted(ckpt.read().split()) == sorted(report['archived'])
+
+    del fake.calls[:]
+    fake.refuse = set()
+    report = plan.execute(checkpoint=ckpt.strpath)
+    assert sorted(report['skipped']) == sorted([ids['Ancient'],
+                                                ids['Tagged']])
+    assert fake.calls == ["archive"]
@@ -0,0 +1,86 @@
+"""
+Tests for Bear.batch()
+"""
+from bear import Bearror
+from bear.batch import BatchOp
+from fixtures import fcub                                          # noqa: F401
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def test_batch_append(fcub):                                       # noqa: F811
+    """
+    Appends to one note go out as one add-text, with the tags combined
+    """
+    pytest.dbgfunc()
+    nid = fcub.create(title="Log", text="body")['identifier']
+    with fcub.batch() as batch:
+        one = fcub.add_text(id=nid, text="line 1", mode="append")
+        fcub.add_text(id=nid, text="line 2", tags="a,b", mode="append")
+        two = fcub.add_text(id=nid, text="", tags="b,c", mode="append")
+        assert isinstance(one, BatchOp) and one is two
+    assert fcub.transport.calls.count('add-text') == 1
+    assert one.count == 3
+    assert one.result['note'] == "# Log\nbody\nline 1\nline 2\n\n#a #b #c"
+    assert batch.done == [one]
+
+
+# -----------------------------------------------------------------------------
+def test_batch_prepend(fcub):                                      # noqa: F811
+    """
+    Merged prepends land in the same order as separate ones would
+    """
+    pytest.dbgfunc()
+    nid = fcub.create(title="Log", text="body")['identifier']
+    with fcub.batch():
+        fcub.add_text(id=nid, text="first", mode="prepend")
+        fcub.add_text(id=nid, text="second", mode="prepend")
+    assert fcub.open_note(id=nid)['note'] == "# Log\nsecond\nfirst\nbody"
+
+
+# -----------------------------------------------------------------------------
+def test_batch_interleaved(fcub):                                  # noqa: F811
+    """
+    Appends to different notes don't stop each other merging, but a
+    different mode, a title, or a read does
+    """
+    pytest.dbgfunc()
+    one = fcub.create(title="One")['identifier']
+    two = fcub.create(title="Two")['identifier']
+    with fcub.batch():
+        for idx in range(3):
+            fcub.add_text(id=one, text="1.{}".format(idx), mode="append")
+            fcub.add_text(id=two, text="2.{}".format(idx), mode="append")
+    assert fcub.transport.calls.count('add-text') == 2
+    assert fcub.open_note(id=one)['note'] == "# One\n1.0\n1.1\n1.2"
+
+    with fcub.batch():
+        fcub.add_text(id=one, text="a", mode="append")
+        fcub.add_text(id=one, text="b", mode="prepend")
+        fcub.add_text(id=one, text="c", mode="prepend")
+        fcub.add_text(title="Two", text="d", mode="append")
+        fcub.add_text(id=one, text="e", mode="prepend")
+        assert fcub.transport.calls.count('add-text') == 2
+        note = fcub.open_note(id=one)
+        assert fcub.transport.calls.count('add-text') == 6
+    assert note['note'] == "# One\ne\nc\nb\n1.0\n1.1\n1.2\na"
+
+
+# -----------------------------------------------------------------------------
+def test_batch_errors(fcub):                                       # noqa: F811
+    """
+    Every op is tried; failures are reported on the way out
+    """
+    pytest.dbgfunc()
+    nid = fcub.create(title="Real")['identifier']
+    with pytest.raises(Bearror) as err:
+        with fcub.batch() as batch:
+            bad = fcub.add_text(id="nonesuch", text="x", mode="append")
+            good = fcub.trash(id=nid)
+            with pytest.raises(Bearror):
+                fcub.batch().__enter__()
+    assert "1 of 2 batched calls failed" in str(err.value)
+    assert "could not be found" in str(bad.error)
+    assert good.result == {} and good.error is None
+    assert batch.done == [bad, good]
+    assert fcub._batch is None
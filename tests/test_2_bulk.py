@@ -0,0 +1,86 @@
+"""
+Tests for bulk_idemp_add
+"""
+import asyncio
+from bear import Bear
+from bear.aio import AsyncBear
+from bear.fake import FakeTransport
+from bear.tags import TagIndex
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def seed(fake, count=20):
+    """
+    Put *count* notes in *fake*; the even ones already have tag 'done'
+    """
+    return [fake.add_note("# N{}\n#all{}".format(_, " #done" * (_ % 2 == 0)))
+            for _ in range(count)]
+
+
+# -----------------------------------------------------------------------------
+def test_bulk_idemp_add():
+    """
+    Only notes missing a tag get an add-text, and one apiece
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    ids = seed(fake)
+    cub = Bear(transport=fake, tagindex=TagIndex())
+    cub.tagindex.build(cub)
+    report = cub.bulk_idemp_add(ids + ids[:5] + ["nonesuch"], "done,all",
+                                parallel=8)
+    assert list(report) == ids + ["nonesuch"]
+    assert fake.calls.count('add-text') == 10
+    assert fake.calls.count('open-note') == 1
+    assert report[ids[0]] == {'added': [], 'present': ["done", "all"],
+                              'error': None}
+    assert report[ids[1]]['added'] == ["done"]
+    assert "could not be found" in report["nonesuch"]['error']
+    assert all(cub.has_tag(_, "done") for _ in ids)
+
+    again = cub.bulk_idemp_add(ids, ["done"])
+    assert all(_['added'] == [] for _ in again.values())
+    assert fake.calls.count('add-text') == 10
+
+
+# -----------------------------------------------------------------------------
+def test_bulk_idemp_add_aio():
+    """
+    AsyncBear's version gives the same report
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    ids = seed(fake, 6)
+    report = asyncio.run(AsyncBear(transport=fake).bulk_idemp_add(ids,
+                                                                  "done"))
+    assert [bool(_['added']) for _ in report.values()] == [False, True] * 3
+    assert fake.calls.count('add-text') == 3
+
+
+# -----------------------------------------------------------------------------
+def test_bulk_one_open():
+    """
+    Without an index, each note is opened once however many tags are asked
+    for, and a note the index has dropped as stale is opened again
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    ids = seed(fake, 10)
+    report = Bear(transport=fake).bulk_idemp_add(ids, "done,all,new")
+    assert fake.calls.count('open-note') == 10
+    assert report[ids[0]]['present'] == ["done", "all"]
+
+    fake = FakeTransport()
+    ids = seed(fake, 10)
+    asyncio.run(AsyncBear(transport=fake).bulk_idemp_add(ids,
+                                                         "done,all,new"))
+    assert fake.calls.count('open-note') == 10
+
+    cub = Bear(transport=fake, tagindex=TagIndex())
+    cub.tagindex.build(cub)
+    cub.tagindex.stamps[ids[0]] = "then"
+    cub.search(term="N0")
+    report = cub.bulk_idemp_add(ids, ["new"])
+    assert fake.calls.count('open-note') == 11
+    assert all(_['present'] == ["new"] for _ in report.values())
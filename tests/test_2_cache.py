@@ -0,0 +1,93 @@
+"""
+Tests for the open_note cache
+"""
+from bear import Bear
+from bear.cache import NoteCache
+from bear.fake import FakeTransport
+import datetime
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def note(nid, text, mdate="2020-01-01T00:00:00Z"):
+    """
+    Return an open_note result
+    """
+    return {'identifier': nid, 'title': nid, 'note': text,
+            'modificationDate': mdate, 'is_trashed': "no"}
+
+
+# -----------------------------------------------------------------------------
+def test_cache_lru():
+    """
+    The cache stays under max_bytes by dropping the least recently used
+    """
+    pytest.dbgfunc()
+    cache = NoteCache(max_bytes=25)
+    for nid in "abc":
+        cache.put(note(nid, "x" * 10))
+    assert list(cache.entries) == ["b", "c"] and cache.nbytes == 20
+    assert cache.get("b")['note'] == "x" * 10
+    cache.put(note("d", "y" * 10))
+    assert list(cache.entries) == ["b", "d"]
+    cache.put(note("e", "z" * 30))
+    assert cache.get("e") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.put(note("f", "\u00e9" * 10))
+    assert list(cache.entries) == ["f"] and cache.nbytes == 20
+
+
+# -----------------------------------------------------------------------------
+def test_cache_ttl_validate():
+    """
+    Entries expire after ttl; a matching summary renews them and a
+    mismatched one drops them
+    """
+    pytest.dbgfunc()
+    now = [0.0]
+    cache = NoteCache(ttl=10, clock=lambda: now[0])
+    cache.put(note("a", "text"))
+    cache.put(note("b", "text"))
+    now[0] = 9
+    cache.validate([{'identifier': "a",
+                     'modificationDate': "2020-01-01T00:00:00Z"},
+                    {'identifier': "b",
+                     'modificationDate': "2020-02-02T00:00:00Z"}])
+    assert cache.get("b") is None
+    now[0] = 15
+    assert cache.get("a")
+    now[0] = 20
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+# -----------------------------------------------------------------------------
+def test_cache_bear():
+    """
+    Repeat reads cost nothing; our own writes and changes seen in a search
+    drop the cached copy
+    """
+    pytest.dbgfunc()
+    when = [datetime.datetime(2020, 1, 1)]
+    fake = FakeTransport(clock=lambda: when[0])
+    cub = Bear(transport=fake, cache=NoteCache())
+    nid = cub.create(title="Cached", tags="one")['identifier']
+    for _ in range(5):
+        assert cub.has_tag(nid, "one")
+        assert not cub.idemp_add(id=nid, tag="one")
+    assert fake.calls.count('open-note') == 1
+
+    assert cub.idemp_add(id=nid, tag="two")
+    assert cub.has_tag(nid, "two")
+    assert fake.calls.count('open-note') == 2
+
+    when[0] = datetime.datetime(2020, 1, 2)
+    fake.notes[nid].text += "\nedited in Bear"
+    fake.notes[nid].modified = when[0]
+    assert "edited" not in cub.open_note(id=nid)['note']
+    cub.search(term="Cached")
+    assert "edited" in cub.open_note(id=nid)['note']
+
+    cub.trash(id=nid)
+    assert cub.open_note(id=nid, exclude_trashed="no")['is_trashed'] == "yes"
+    assert len(cub.cache) == 0
@@ -0,0 +1,123 @@
+"""
+Tests for recording and replaying xcall traffic
+"""
+from bear import Bear, Bearror, transport
+from bear.cassette import RecordingTransport, ReplayTransport, redact
+from bear.fake import FakeTransport
+import json
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def session(cub):
+    """
+    Make some calls and return what came back
+    """
+    made = cub.create(title="Taped", text="body", tags="tape")
+    rval = [made,
+            cub.open_note(id=made['identifier']),
+            cub.add_text(id=made['identifier'], text="more", mode="append"),
+            cub.open_note(id=made['identifier']),
+            cub.open_tag("tape"),
+            cub.tags()]
+    try:
+        cub.open_note(id="nonesuch")
+    except Bearror as err:
+        rval.append(str(err))
+    return rval
+
+
+# -----------------------------------------------------------------------------
+def test_redact():
+    """
+    Token values are replaced wherever the parameter appears
+    """
+    pytest.dbgfunc()
+    assert redact("bear://x-callback-url/tags?token=ABC-123") == \
+        "bear://x-callback-url/tags?token=REDACTED"
+    assert redact("bear://x-callback-url/search?token=X&term=y") == \
+        "bear://x-callback-url/search?token=REDACTED&term=y"
+    assert redact("bear://x-callback-url/search?term=token") == \
+        "bear://x-callback-url/search?term=token"
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("name", ["tape.jsonl", "tape.jsonl.gz"])
+@pytest.mark.parametrize("match", ["url", "order"])
+def test_record_replay(tmpdir, name, match):
+    """
+    A replayed session returns just what the recorded one did
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join(name).strpath
+    rec = RecordingTransport(FakeTransport(), path)
+    live = session(Bear(transport=rec))
+    rec.close()
+    replay = ReplayTransport(path, match=match)
+    assert session(Bear(transport=replay)) == live
+    with pytest.raises(Bearror) as err:
+        Bear(transport=replay).tags()
+    assert "cassette" in str(err.value)
+
+
+# -----------------------------------------------------------------------------
+def test_token_redacted(tmpdir):
+    """
+    The token never reaches the cassette
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join("tape.jsonl")
+    rec = RecordingTransport(FakeTransport(), path.strpath)
+    Bear(transport=rec).tags()
+    rec.close()
+    [entry] = [json.loads(_) for _ in path.readlines()]
+    assert "FAKE-TOKEN" not in entry['url']
+    assert entry['url'].endswith("token=REDACTED")
+
+
+# -----------------------------------------------------------------------------
+def test_transport_errors(tmpdir):
+    """
+    A transport failure is recorded and raised again on replay
+    """
+    pytest.dbgfunc()
+
+    class Broken(FakeTransport):
+        """
+        A transport whose every call times out
+        """
+        def call(self, url):
+            raise Bearror("xcall did not finish in 1 seconds")
+
+    path = tmpdir.join("tape.jsonl").strpath
+    rec = RecordingTransport(Broken(), path)
+    with pytest.raises(Bearror):
+        Bear(transport=rec).tags()
+    rec.close()
+    with pytest.raises(Bearror) as err:
+        Bear(transport=ReplayTransport(path)).tags()
+    assert "did not finish" in str(err.value)
+
+
+# -----------------------------------------------------------------------------
+def test_env(tmpdir, monkeypatch):
+    """
+    $BEAR_TRANSPORT=replay:PATH gives every Bear object the same cassette
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join("tape.jsonl").strpath
+    rec = RecordingTransport(FakeTransport(), path)
+    Bear(transport=rec).tags()
+    Bear(transport=rec).tags()
+    rec.close()
+    monkeypatch.setattr(transport, "CASSETTES", {})
+    monkeypatch.setenv("BEAR_TRANSPORT", "replay:" + path)
+    one, two = Bear(), Bear()
+    assert isinstance(one.transport, ReplayTransport)
+    assert one.transport is two.transport
+    one.tags()
+    two.tags()
+    with pytest.raises(Bearror):
+        one.tags()
+    with pytest.raises(Bearror):
+        ReplayTransport(path, match="fuzzy")
@@ -0,0 +1,92 @@
+"""
+Tests for the read-only sqlite backend
+"""
+from bear import Bear, Bearror
+from bear.db import BearDB, iso
+from bear.fake import FakeTransport
+from fixtures import beardb                                        # noqa: F401
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def test_db_iso():
+    """
+    Core Data timestamps count from 2001-01-01
+    """
+    pytest.dbgfunc()
+    assert iso(0) == "2001-01-01T00:00:00Z"
+    assert iso(600000000.0) == "2020-01-06T10:40:00Z"
+
+
+# -----------------------------------------------------------------------------
+def test_db_open_note(beardb):                                     # noqa: F811
+    """
+    open_note() finds notes by id or title and hides the trash by default
+    """
+    pytest.dbgfunc()
+    rdr = BearDB(beardb)
+    note = rdr.open_note(id="NOTE-1")
+    assert note == {'note': "# Note 1\nbody 1\n#all #work/home",
+                    'identifier': "NOTE-1", 'title': "Note 1",
+                    'is_trashed': "no",
+                    'modificationDate': "2020-01-06T10:40:01Z",
+                    'creationDate': "2020-01-06T10:40:00Z"}
+    assert rdr.open_note(title="Note 3")['identifier'] == "NOTE-3"
+    with pytest.raises(Bearror) as err:
+        rdr.open_note(id="NOTE-2")
+    assert "The note could not be found" in str(err.value)
+    assert rdr.open_note(id="NOTE-2", exclude_trashed="no")['is_trashed'] \
+        == "yes"
+
+
+# -----------------------------------------------------------------------------
+def test_db_lists(beardb):                                         # noqa: F811
+    """
+    search(), open_tag() and tags() agree with Bear's semantics
+    """
+    pytest.dbgfunc()
+    rdr = BearDB(beardb, immutable=True)
+    assert [_['identifier'] for _ in rdr.search()] == ["NOTE-4", "NOTE-1",
+                                                       "NOTE-0"]
+    assert [_['identifier'] for _ in rdr.search(term="BODY 1")] == ["NOTE-1"]
+    assert rdr.search(term="%") == []
+    assert [_['identifier'] for _ in rdr.search(tag="work")] == ["NOTE-1"]
+    assert len(rdr.open_tag("all")) == 5
+    assert rdr.search()[0]['pin'] == "yes"
+    with pytest.raises(Bearror) as err:
+        rdr.open_tag("nonesuch")
+    assert "Tag 'nonesuch' was not found" in str(err.value)
+    assert rdr.tags() == ["all", "work", "work/home"]
+
+
+# -----------------------------------------------------------------------------
+def test_db_shapes(beardb):                                        # noqa: F811
+    """
+    Reads through the database look like reads through a url, and don't use
+    the transport
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    nid = Bear(transport=fake).create(title="Note", tags="all")['identifier']
+    via_url = Bear(transport=fake)
+    via_db = Bear(transport=fake, reader=BearDB(beardb))
+    calls = len(fake.calls)
+    assert set(via_db.open_note(id="NOTE-0")) == \
+        set(via_url.open_note(id=nid))
+    assert set(via_db.open_tag("all")[0]) == set(via_url.open_tag("all")[0])
+    assert set(via_db.search()[0]) == set(via_url.search()[0])
+    assert len(fake.calls) == calls + 3
+
+
+# -----------------------------------------------------------------------------
+def test_db_read_only(beardb, tmpdir):                             # noqa: F811
+    """
+    The database can't be written through BearDB, and a missing one is an
+    error
+    """
+    pytest.dbgfunc()
+    rdr = BearDB(beardb)
+    with pytest.raises(Exception):
+        rdr.db.execute("delete from ZSFNOTE")
+    with pytest.raises(Bearror):
+        BearDB(tmpdir.join("nonesuch.sqlite").strpath)
@@ -0,0 +1,138 @@
+"""
+Tests for decoding xcall replies and for lazy open_tag/search
+"""
+from bear import Bear, Bearror, decode
+from bear.aio import AsyncBear
+from bear.cache import NoteCache
+from bear.db import BearDB
+from bear.fake import FakeTransport
+from fixtures import beardb, fcub                                  # noqa: F401
+import asyncio
+import datetime
+import json
+import pytest
+import types
+
+
+# -----------------------------------------------------------------------------
+def test_parse():
+    """
+    A reply is parsed once per layer, however many layers it has
+    """
+    pytest.dbgfunc()
+    data = {'note': "text", 'identifier': "X"}
+    once = json.dumps(data)
+    assert decode.parse(once) == data
+    assert decode.parse(json.dumps(once)) == data
+    assert decode.parse(json.dumps(json.dumps(once))) == data
+
+
+# -----------------------------------------------------------------------------
+def test_wrapped():
+    """
+    Only the {key: "<json>", "": ""} shape is a wrapped list reply
+    """
+    pytest.dbgfunc()
+    assert decode.wrapped({'notes': "[]", '': ""}) == 'notes'
+    assert decode.wrapped({'notes': [], '': ""}) is None
+    assert decode.wrapped({'note': "x", 'title': "y"}) is None
+    assert decode.wrapped({'': ""}) is None
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("data", [
+    [],
+    [1],
+    [{'title': "a, [b]", 'pin': "no"}, {'title': "c\\"}, "]", None, 2.5],
+    [[1, [2]], {}, ""],
+])
+def test_iter_array(data):
+    """
+    iter_array yields what json.loads would have returned, however the
+    array is spaced
+    """
+    pytest.dbgfunc()
+    for text in [json.dumps(data), json.dumps(data, indent=2),
+                 "  " + json.dumps(data, separators=(",", ":")) + "\n"]:
+        result = decode.iter_array(text)
+        assert isinstance(result, types.GeneratorType)
+        assert list(result) == data
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("text", ['{"a": 1}', '[1, 2', '[1, }', ''])
+def test_iter_array_bad(text):
+    """
+    Malformed input raises ValueError while iterating
+    """
+    pytest.dbgfunc()
+    with pytest.raises(ValueError):
+        list(decode.iter_array(text))
+
+
+# -----------------------------------------------------------------------------
+def test_fast_loads():
+    """
+    A faster JSON library is used when one is installed
+    """
+    pytest.dbgfunc()
+    try:
+        import orjson
+        assert decode.loads is orjson.loads
+    except ImportError:
+        pytest.skip("orjson is not installed")
+
+
+# -----------------------------------------------------------------------------
+def test_lazy(fcub):                                               # noqa: F811
+    """
+    lazy=True gives an iterator over the same summaries
+    """
+    pytest.dbgfunc()
+    for idx in range(5):
+        fcub.create(title="Lazy {}".format(idx), text="body", tags="lazy")
+    eager = fcub.open_tag("lazy")
+    lazy = fcub.open_tag("lazy", lazy=True)
+    assert not isinstance(lazy, list)
+    assert list(lazy) == eager
+    assert list(fcub.search(term="body", lazy=True)) == fcub.search("body")
+    with pytest.raises(Bearror):
+        fcub.open_tag("nonesuch", lazy=True)
+
+
+# -----------------------------------------------------------------------------
+def test_lazy_cache():
+    """
+    A lazy listing checks the cache as it's consumed
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    cub = Bear(transport=fake, cache=NoteCache())
+    ident = fake.add_note("# Cached\n#lazy")
+    cub.open_note(id=ident)
+    fake.notes[ident].modified += datetime.timedelta(seconds=1)
+    result = cub.open_tag("lazy", lazy=True)
+    assert len(cub.cache) == 1
+    assert [_['identifier'] for _ in result] == [ident]
+    assert len(cub.cache) == 0
+
+
+# -----------------------------------------------------------------------------
+def test_lazy_async_and_reader(beardb):                            # noqa: F811
+    """
+    AsyncBear and the sqlite reader honor lazy too
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    fake.add_note("# One\n#lazy")
+    fake.add_note("# Two\n#lazy")
+    acub = AsyncBear(transport=fake)
+    result = asyncio.run(acub.open_tag("lazy", lazy=True))
+    assert sorted(_['title'] for _ in result) == ["One", "Two"]
+    result = asyncio.run(acub.search(tag="lazy", lazy=True))
+    assert sorted(_['title'] for _ in result) == ["One", "Two"]
+
+    cub = Bear(transport=FakeTransport(), reader=BearDB(beardb))
+    result = cub.open_tag("work", lazy=True)
+    assert not isinstance(result, list)
+    assert list(result) == cub.open_tag("work")
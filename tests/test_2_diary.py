@@ -0,0 +1,105 @@
+"""
+Tests for the journal note generator
+"""
+from bear import Bear, Bearror
+from bear.diary import Diary, Template, open_todos, variables
+from bear.fake import FakeTransport
+from bear.tags import note_tags
+import datetime
+import pytest
+
+JAN1 = datetime.date(2024, 1, 1)
+
+
+# -----------------------------------------------------------------------------
+def test_template():
+    """
+    Templates take strftime specs and attribute lookups, and unknown
+    variables are caught when they're compiled
+    """
+    pytest.dbgfunc()
+    tmpl = Template("{date:%A %d %B} w{week:02d} {yesterday.day} {weekend}")
+    assert tmpl.render(variables(datetime.date(2024, 1, 6))) == \
+        "Saturday 06 January w01 5 weekend"
+    assert Template("{week_start:%d}-{week_end:%d}").render(
+        variables(datetime.date(2024, 1, 10))) == "08-14"
+    with pytest.raises(Bearror) as err:
+        Template("{datum}")
+    assert "datum" in str(err.value)
+    with pytest.raises(Bearror):
+        Template("{date")
+
+
+# -----------------------------------------------------------------------------
+def test_open_todos():
+    """
+    Only unchecked todos carry over
+    """
+    pytest.dbgfunc()
+    text = "# Day\n- [ ] call mom\n- [x] pay rent\n  * [ ] fix bike\nnote"
+    assert open_todos(text) == ["- [ ] call mom", "* [ ] fix bike"]
+    assert open_todos(None) == []
+
+
+# -----------------------------------------------------------------------------
+def test_create():
+    """
+    A run creates each entry with its tags and carried todos, and a rerun
+    creates nothing, with one search either way
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    cub = Bear(transport=fake)
+    cub.create(title="2023-12-31", text="- [ ] file taxes\n- [x] party")
+    del fake.calls[:]
+    diary = Diary(cub, body="## Todo\n{todos}\n## Notes",
+                  tags="journal/{date:%Y}, {weekend}")
+    made = diary.create(JAN1, datetime.date(2024, 1, 7), parallel=3)
+    assert [_['title'] for _ in made] == ["2024-01-0{}".format(_)
+                                          for _ in range(1, 8)]
+    assert fake.calls.count("search") == 1
+    assert fake.calls.count("open-note") == 1
+    sunday = cub.open_note(title="2024-01-07")['note']
+    assert "- [ ] file taxes" in sunday and "party" not in sunday
+    assert note_tags(sunday) == {"journal", "journal/2024", "weekend"}
+    assert "weekend" not in note_tags(cub.open_note(title="2024-01-05")
+                                      ['note'])
+
+    del fake.calls[:]
+    assert diary.create(JAN1, datetime.date(2024, 1, 8)) != []
+    assert diary.create(JAN1, datetime.date(2024, 1, 8)) == []
+    assert fake.calls.count("create") == 1
+
+
+# -----------------------------------------------------------------------------
+def test_archived():
+    """
+    An entry that was archived counts as existing and isn't written again
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    fake.add_note("# 2024-01-02\n- [ ] renew passport\n#journal/2024",
+                  archived=True)
+    diary = Diary(Bear(transport=fake), tags="journal/{date:%Y}")
+    plan = diary.plan(JAN1, datetime.date(2024, 1, 3))
+    assert [_['title'] for _ in plan] == ["2024-01-01", "2024-01-03"]
+    assert "renew passport" in plan[1]['text']
+    assert Diary(Bear(transport=FakeTransport())).titles([JAN1]) == {}
+
+
+# -----------------------------------------------------------------------------
+def test_weekly():
+    """
+    Weekly entries fall on Mondays
+    """
+    pytest.dbgfunc()
+    diary = Diary(Bear(transport=FakeTransport()), period="week",
+                  title="Week {week} ({week_start:%b %d})", carry=False)
+    plan = diary.plan(datetime.date(2024, 1, 3), datetime.date(2024, 1, 31))
+    assert [_['title'] for _ in plan] == ["Week 1 (Jan 01)",
+                                          "Week 2 (Jan 08)",
+                                          "Week 3 (Jan 15)",
+                                          "Week 4 (Jan 22)",
+                                          "Week 5 (Jan 29)"]
+    with pytest.raises(Bearror):
+        Diary(None, period="month")
@@ -0,0 +1,205 @@
+"""
+Tests for the transport layer and the in-memory fake Bear backend
+"""
+from bear import Bear, Bearror
+from bear.fake import FakeTransport, parse_url
+from bear.policy import classify
+from bear.tags import note_tags
+from bear.transport import TIMEOUT, Transport, XcallTransport
+from bear.transport import default_transport
+from fixtures import fcub                                          # noqa: F401
+import asyncio
+import json
+import pytest
+import sys
+
+
+# -----------------------------------------------------------------------------
+def test_default_transport(monkeypatch):
+    """
+    $BEAR_TRANSPORT picks the fake backend; otherwise we get xcall
+    """
+    pytest.dbgfunc()
+    monkeypatch.delenv("BEAR_TRANSPORT", raising=False)
+    assert isinstance(default_transport(), XcallTransport)
+    monkeypatch.setenv("BEAR_TRANSPORT", "fake")
+    assert isinstance(default_transport(), FakeTransport)
+
+
+# -----------------------------------------------------------------------------
+def test_transport_base():
+    """
+    A transport that doesn't define call() can't be used
+    """
+    pytest.dbgfunc()
+    with pytest.raises(NotImplementedError):
+        Bear(transport=Transport()).rename_tag("a", "b")
+
+
+# -----------------------------------------------------------------------------
+def fake_xcall(tmpdir, body):
+    """
+    Write a stand-in for xcall that runs *body* and return its path
+    """
+    path = tmpdir.join("xcall")
+    path.write("#!{}\nimport json, sys, time\n{}\n"
+               "".format(sys.executable, body))
+    path.chmod(0o755)
+    return path.strpath
+
+
+# -----------------------------------------------------------------------------
+def test_xcall_argv(tmpdir):
+    """
+    The url reaches xcall as one argument, untouched by any shell
+    """
+    pytest.dbgfunc()
+    path = fake_xcall(tmpdir, "print(json.dumps({'note': sys.argv[1:]}))")
+    xport = XcallTransport(path=path)
+    url = "bear://x-callback-url/x?text=$HOME `id` \"q\" 'a' \\"
+    assert json.loads(xport.call(url)) == {'note': ["-url", url]}
+    assert set(xport.timing) == {'spawn', 'wait', 'total'}
+
+
+# -----------------------------------------------------------------------------
+def test_xcall_timeout(tmpdir):
+    """
+    A call that takes too long is killed and raises Bearror
+    """
+    pytest.dbgfunc()
+    path = fake_xcall(tmpdir, "time.sleep(30)")
+    xport = XcallTransport(path=path, timeout=0.2)
+    with pytest.raises(Bearror) as err:
+        Bear(transport=xport).change_font("Menlo")
+    assert "did not finish in 0.2 seconds" in str(err.value)
+    assert xport.timing['total'] < 5
+
+
+# -----------------------------------------------------------------------------
+def test_xcall_default_timeout(monkeypatch):
+    """
+    xcall always runs under a finite timeout, which $BEAR_TIMEOUT can set
+    """
+    pytest.dbgfunc()
+    monkeypatch.delenv("BEAR_TRANSPORT", raising=False)
+    monkeypatch.delenv("BEAR_TIMEOUT", raising=False)
+    assert default_transport().timeout == TIMEOUT
+    assert Bear().transport.timeout == TIMEOUT
+    monkeypatch.setenv("BEAR_TIMEOUT", "7.5")
+    assert default_transport().timeout == 7.5
+    assert XcallTransport(timeout=2).timeout == 2
+    monkeypatch.setenv("BEAR_TIMEOUT", "soon")
+    with pytest.raises(Bearror):
+        XcallTransport()
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("body, want", [
+    ("sys.stderr.write(json.dumps({'errorCode': 1, 'errorMessage': "
+     "'the note could not be found'}))\nsys.exit(1)",
+     "the note could not be found"),
+    ("sys.stderr.write('Bear is not running')\nsys.exit(2)",
+     "Bear is not running"),
+    ("sys.exit(3)", "xcall exited with status 3"),
+    ])
+def test_xcall_failure(tmpdir, body, want):
+    """
+    An xcall that exits nonzero raises Bearror with what it wrote to
+    stderr, for the sync and asyncio paths alike
+    """
+    pytest.dbgfunc()
+    xport = XcallTransport(path=fake_xcall(tmpdir, body))
+    cub = Bear(transport=xport)
+    url = cub._url('open-note', id="NOPE")
+    with pytest.raises(Bearror) as err:
+        cub._decode(url, xport.call(url))
+    assert str(err.value) == want
+    with pytest.raises(Bearror) as err:
+        cub._decode(url, asyncio.run(xport.acall(url)))
+    assert str(err.value) == want
+    if "note could not" in want:
+        assert classify(err.value) == 'note-not-found'
+
+
+# -----------------------------------------------------------------------------
+def test_parse_url(fcub):                                          # noqa: F811
+    """
+    The fake reads back exactly what Bear._url writes
+    """
+    pytest.dbgfunc()
+    text = "a & b = 100% #tag \"q\"\n\tplus + and ? mark"
+    cmd, params = parse_url(fcub._url('add-text', id="X", text=text))
+    assert cmd == "add-text"
+    assert params == {'id': "X", 'text': text}
+
+
+# -----------------------------------------------------------------------------
+def test_note_tags():
+    """
+    Simple, multi-word, and nested tags are recognized; headers are not
+    """
+    pytest.dbgfunc()
+    text = "# Title\n## Sub\n#work #multi word# #todo/home\n#workshop"
+    assert note_tags(text) == {"work", "multi word", "todo", "todo/home",
+                               "workshop"}
+
+
+# -----------------------------------------------------------------------------
+def test_fake_create_open(fcub):                                   # noqa: F811
+    """
+    create() and open_note() come back in Bear's reply shapes
+    """
+    pytest.dbgfunc()
+    made = fcub.create(title="Fake", text="body", tags="one,two")
+    assert set(made) == {'identifier', 'title'}
+    note = fcub.open_note(id=made['identifier'])
+    assert note['note'] == "# Fake\nbody\n#one #two"
+    assert note['title'] == "Fake"
+    assert note['is_trashed'] == "no"
+    assert fcub.open_note(title="Fake")['identifier'] == made['identifier']
+
+
+# -----------------------------------------------------------------------------
+def test_fake_lists(fcub):                                         # noqa: F811
+    """
+    search(), open_tag() and tags() unwrap the ''-keyed reply
+    """
+    pytest.dbgfunc()
+    one = fcub.create(title="One", tags="alpha,nest/child")['identifier']
+    two = fcub.create(title="Two", tags="beta")['identifier']
+    assert fcub.tags() == ["alpha", "beta", "nest", "nest/child"]
+    assert [_['identifier'] for _ in fcub.open_tag("nest")] == [one]
+    assert [_['identifier'] for _ in fcub.search(term="two")] == [two]
+    assert fcub.search(tag="alpha")[0]['pin'] == "no"
+
+
+# -----------------------------------------------------------------------------
+def test_fake_errors(fcub):                                        # noqa: F811
+    """
+    Errors come back as errorMessage and _xcall raises them
+    """
+    pytest.dbgfunc()
+    with pytest.raises(Bearror) as err:
+        fcub.open_note(id="nonesuch")
+    assert "The note could not be found" in str(err.value)
+    with pytest.raises(Bearror) as err:
+        fcub.open_tag("nonesuch")
+    assert "Tag 'nonesuch' was not found" in str(err.value)
+    with pytest.raises(Bearror) as err:
+        fcub.create()
+    assert "Empty notes" in str(err.value)
+
+
+# -----------------------------------------------------------------------------
+def test_fake_rename_trash(fcub):                                  # noqa: F811
+    """
+    rename_tag() carries nested tags along; trash() hides notes from search
+    """
+    pytest.dbgfunc()
+    nid = fcub.create(title="Note", tags="old,old/kid")['identifier']
+    fcub.rename_tag("old", "new")
+    assert fcub.open_note(id=nid)['note'] == "# Note\n#new #new/kid"
+    fcub.trash(id=nid)
+    assert fcub.search(term="Note") == []
+    assert fcub.open_note(id=nid, exclude_trashed="no")['is_trashed'] == "yes"
+    assert fcub.transport.calls.count('open-note') == 2
@@ -0,0 +1,105 @@
+"""
+Tests for the change feed
+"""
+from bear import Bear
+from bear.fake import FakeTransport
+from bear.feed import Feed
+import datetime
+import pytest
+
+
+class Clock(object):
+    """
+    A clock that moves a minute each time it's read
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Start somewhere
+        """
+        self.now = datetime.datetime(2020, 1, 1)
+
+    # -------------------------------------------------------------------------
+    def __call__(self):
+        """
+        Tick
+        """
+        self.now += datetime.timedelta(minutes=1)
+        return self.now
+
+
+# -----------------------------------------------------------------------------
+def kinds(events):
+    """
+    Return (event, title) for each event
+    """
+    return [(_['event'], _['title']) for _ in events]
+
+
+# -----------------------------------------------------------------------------
+def test_changes(tmpdir):
+    """
+    Created, modified, and trashed notes are reported once, and only the
+    changed notes are opened
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join("feed.json").strpath
+    fake = FakeTransport(clock=Clock())
+    cub = Bear(transport=fake)
+    ids = [cub.create(title=_, text="body")['identifier']
+           for _ in ["One", "Two", "Three"]]
+    assert kinds(Feed(cub, path).changes()) == [('created', "One"),
+                                                ('created', "Two"),
+                                                ('created', "Three")]
+    del fake.calls[:]
+    assert list(Feed(cub, path).changes()) == []
+    assert fake.calls == ["search"]
+
+    cub.add_text(id=ids[1], text="more", mode="append")
+    cub.create(title="Four", text="body")
+    cub.trash(id=ids[0])
+    del fake.calls[:]
+    events = list(Feed(cub, path).changes())
+    assert kinds(events) == [('modified', "Two"), ('created', "Four"),
+                             ('trashed', "One")]
+    assert events[0]['note'].endswith("more")
+    assert events[2]['note'] is None
+    assert fake.calls.count("open-note") == 2
+
+
+# -----------------------------------------------------------------------------
+def test_since():
+    """
+    With no snapshot, notes older than *since* form the baseline
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport(clock=Clock())
+    cub = Bear(transport=fake)
+    cub.create(title="Old", text="body")
+    mark = cub.search()[0]['modificationDate']
+    cub.create(title="New", text="body")
+    feed = Feed(cub, bodies=False)
+    events = list(feed.changes(since=mark))
+    assert kinds(events) == [('created', "New")]
+    assert events[0]['note'] is None
+    assert "open-note" not in fake.calls
+    assert sorted(_[1] for _ in feed.notes.values()) == ["New", "Old"]
+    assert mark < feed.watermark
+
+
+# -----------------------------------------------------------------------------
+def test_partial_run(tmpdir):
+    """
+    Events not all consumed are seen again next time
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join("feed.json").strpath
+    cub = Bear(transport=FakeTransport(clock=Clock()))
+    for title in ["One", "Two"]:
+        cub.create(title=title, text="body")
+    events = Feed(cub, path).changes()
+    next(events)
+    events.close()
+    assert len(list(Feed(cub, path).changes())) == 2
+    assert list(Feed(cub, path).changes()) == []
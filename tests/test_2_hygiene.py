@@ -0,0 +1,99 @@
+"""
+Tests for the tag hygiene analyzer
+"""
+from bear import Bear
+from bear.fake import FakeTransport
+from bear.hygiene import analyze, deletions, distance, key, tag_counts
+from bear.tags import TagIndex
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def test_helpers():
+    """
+    Distances, deletion variants, and keys
+    """
+    pytest.dbgfunc()
+    assert distance("meeting", "meetng") == 1
+    assert distance("kitten", "sitting") == 3
+    assert distance("", "abc") == 3
+    assert deletions("abc", 1) == {"abc", "bc", "ac", "ab"}
+    assert "a" in deletions("abc", 2)
+    assert key("Projects/Stories") == "project/story"
+    assert key("Boxes") == "box" and key("class") == "class"
+    assert key("bus") == "bus"
+
+
+# -----------------------------------------------------------------------------
+def test_analyze():
+    """
+    Case variants and plurals are grouped, near misses paired, and orphans
+    spotted
+    """
+    pytest.dbgfunc()
+    report = analyze(["Work", "work", "project", "projects", "story",
+                      "Stories", "meeting", "meetng", "card", "cart",
+                      "area/x", "home", "home/chores"])
+    dups = report.duplicates()
+    assert [(_['keep'], _['reason']) for _ in dups] == [
+        ("project", "plural"), ("story", "plural"), ("work", "case")]
+    assert report.near == [("meeting", "meetng", 1)]
+    assert report.orphans == ["area/x"]
+    assert report.plan() == [("Stories", "story"), ("Work", "work"),
+                             ("projects", "project")]
+    assert len(report.plan(fuzzy=True)) == 4
+    report.counts = {'meeting': 4, 'meetng': 1}
+    assert ("meetng", "meeting") in report.plan(fuzzy=True)
+
+
+# -----------------------------------------------------------------------------
+def test_plan_order():
+    """
+    Parents are renamed first and children are renamed by what their
+    parent's rename made of them
+    """
+    pytest.dbgfunc()
+    report = analyze(["Work", "work", "Work/Notes", "work/notes",
+                      "Work/Todo", "work/todo"],
+                     counts={'Work': 5, 'work': 1, 'Work/Todo': 3})
+    assert report.plan() == [("work", "Work"),
+                             ("Work/Notes", "Work/notes"),
+                             ("Work/todo", "Work/Todo")]
+
+
+# -----------------------------------------------------------------------------
+def test_execute():
+    """
+    The plan runs through rename_tag and leaves one tag per group
+    """
+    pytest.dbgfunc()
+    cub = Bear(transport=FakeTransport())
+    for tags in ["recipes", "recipe", "recipe", "Travel", "travel/plans"]:
+        cub.create(title="Note", text="body", tags=tags)
+    index = TagIndex()
+    index.build(cub)
+    report = analyze(cub.tags(), counts=tag_counts(index))
+    assert report.execute(cub) == [("Travel", "travel"),
+                                   ("recipes", "recipe")]
+    assert sorted(cub.tags()) == ["recipe", "travel", "travel/plans"]
+
+
+# -----------------------------------------------------------------------------
+def test_execute_once():
+    """
+    Two spellings that an earlier rename makes one are renamed once, and
+    every note ends up under the keeper
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    ids = [fake.add_note("# N\n#" + _)
+           for _ in ["Work/Project", "work/Project", "work/projects"]]
+    cub = Bear(transport=fake)
+    index = TagIndex()
+    index.build(cub)
+    report = analyze(cub.tags(), counts=tag_counts(index))
+    assert report.plan() == [("Work", "work"),
+                             ("work/Project", "work/projects")]
+    report.execute(cub)
+    assert sorted(cub.tags()) == ["work", "work/projects"]
+    assert [fake.notes[_].text for _ in ids] == ["# N\n#work/projects"] * 3
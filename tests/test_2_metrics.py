@@ -0,0 +1,128 @@
+"""
+Tests for call metrics
+"""
+from bear import Bear, Bearror
+from bear.aio import AsyncBear
+from bear.fake import FakeTransport
+from bear.metrics import BOUNDS, Metrics, default_path, endpoint, quantile
+import asyncio
+import json
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def test_endpoint():
+    """
+    The endpoint is the last path element before the query
+    """
+    pytest.dbgfunc()
+    assert endpoint("bear://x-callback-url/open-note?id=1&a=b/c") == \
+        "open-note"
+    assert endpoint("bear://x-callback-url/tags") == "tags"
+
+
+# -----------------------------------------------------------------------------
+def test_record_and_quantile():
+    """
+    Latencies land in the right buckets and quantiles read them back
+    """
+    pytest.dbgfunc()
+    metrics = Metrics(False, client="t")
+    for secs in [0.001, 0.002, 0.003, 0.2, 40.0]:
+        metrics.record("search", {'total': secs})
+    hist = metrics.data['t']['search']['latency']['total']
+    assert hist['count'] == 5
+    assert hist['buckets'][0] == 3
+    assert hist['buckets'][BOUNDS.index(0.25)] == 1
+    assert hist['buckets'][-1] == 1
+    assert quantile(hist, 0.5) == 0.005
+    assert quantile(hist, 0.8) == 0.25
+    assert quantile(hist, 1.0) == float("inf")
+
+
+# -----------------------------------------------------------------------------
+def test_bear_calls():
+    """
+    Each call through Bear is counted with its phases, sizes, and errors
+    """
+    pytest.dbgfunc()
+    metrics = Metrics(False, client="t")
+    cub = Bear(transport=FakeTransport(), metrics=metrics)
+    made = cub.create(title="Counted", text="body")
+    for _ in range(3):
+        cub.open_note(id=made['identifier'])
+    with pytest.raises(Bearror):
+        cub.open_note(id="nonesuch")
+    stats = metrics.to_dict()['t']
+    assert stats['create']['calls'] == 1
+    assert stats['open-note']['calls'] == 4
+    assert stats['open-note']['errors'] == 1
+    assert 0 < stats['open-note']['sent']
+    assert 0 < stats['open-note']['received']
+    assert set(stats['open-note']['latency']) == {'transport', 'decode',
+                                                  'total'}
+
+    asyncio.run(AsyncBear(transport=FakeTransport(), metrics=metrics).tags())
+    assert metrics.to_dict()['t']['tags']['calls'] == 1
+
+
+# -----------------------------------------------------------------------------
+def test_flush_and_load(tmpdir):
+    """
+    Flushes from several clients add up in the file
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join("metrics.json").strpath
+    one, two = Metrics(path, client="one"), Metrics(path, client="two")
+    for _ in range(2):
+        one.record("tags", {'total': 0.1}, sent=10, received=20)
+        one.flush()
+    two.record("tags", {'total': 0.1}, error=True)
+    two.flush()
+    two.flush()
+    total = Metrics.load(path)
+    assert total.data['one']['tags']['calls'] == 2
+    assert total.data['one']['tags']['sent'] == 20
+    assert total.data['two']['tags']['errors'] == 1
+    assert one.data == {}
+    assert "one" in total.summary() and "50.0" not in total.summary()
+
+
+# -----------------------------------------------------------------------------
+def test_default_path(tmpdir, monkeypatch, capsys):
+    """
+    With no path, counts go to the file 'bear stats' reads by default
+    """
+    pytest.dbgfunc()
+    monkeypatch.setenv("HOME", tmpdir.strpath)
+    metrics = Metrics(client="t")
+    assert metrics.path == default_path()
+    metrics.record("tags", {'total': 0.1})
+    metrics.flush()
+    assert Metrics.load().data['t']['tags']['calls'] == 1
+    pytest.importorskip("tbx")
+    import bear.__main__ as main
+    main.dispatch(main.__doc__, argv=["stats"])
+    assert "tags" in capsys.readouterr().out
+
+
+# -----------------------------------------------------------------------------
+def test_export(tmpdir):
+    """
+    Prometheus text and JSON exports
+    """
+    pytest.dbgfunc()
+    metrics = Metrics(False, client="t")
+    metrics.record("open-tag", {'total': 0.02, 'decode': 0.01}, sent=5)
+    text = metrics.prometheus()
+    assert 'bear_calls_total{client="t",endpoint="open-tag"} 1' in text
+    assert ('bear_latency_seconds_bucket{client="t",endpoint="open-tag",'
+            'phase="total",le="0.01"} 0') in text
+    assert ('bear_latency_seconds_bucket{client="t",endpoint="open-tag",'
+            'phase="total",le="+Inf"} 1') in text
+    prom = tmpdir.join("bear.prom")
+    metrics.export(prom.strpath)
+    assert prom.read() == text
+    jsn = tmpdir.join("bear.json")
+    metrics.export(jsn.strpath)
+    assert json.loads(jsn.read()) == metrics.to_dict()
@@ -0,0 +1,96 @@
+"""
+Tests for the Note and NoteSummary result objects
+"""
+from bear import Bear
+from bear.fake import FakeTransport
+from bear.note import Note, NoteSummary, format_date, parse_date
+from bear.search import SearchIndex
+from bear.tags import TagIndex
+import datetime
+import pytest
+import sys
+
+summary = {'title': "A note", 'identifier': "NOTE-1",
+           'modificationDate': "2020-03-04T05:06:07Z",
+           'creationDate': "2019-01-02T03:04:05Z", 'pin': "yes"}
+
+
+# -----------------------------------------------------------------------------
+def test_dates():
+    """
+    Bear's timestamps parse to UTC datetimes and format back unchanged
+    """
+    pytest.dbgfunc()
+    when = parse_date("2020-03-04T05:06:07Z")
+    assert when == datetime.datetime(2020, 3, 4, 5, 6, 7,
+                                     tzinfo=datetime.timezone.utc)
+    assert format_date(when) == "2020-03-04T05:06:07Z"
+    assert parse_date(None) is None
+    assert format_date(None) is None
+
+
+# -----------------------------------------------------------------------------
+def test_summary():
+    """
+    A NoteSummary has parsed fields, answers dict lookups as the dict did,
+    and is smaller than the dict
+    """
+    pytest.dbgfunc()
+    item = NoteSummary(summary)
+    assert item.pinned is True
+    assert item.modified.year == 2020
+    assert item['modificationDate'] == summary['modificationDate']
+    assert item.get('score') is None
+    assert item.get('nonesuch', 17) == 17
+    with pytest.raises(KeyError):
+        item['note']
+    assert item.to_dict() == summary
+    assert not hasattr(item, '__dict__')
+    assert sys.getsizeof(item) < sys.getsizeof(dict(summary))
+    with pytest.raises(AttributeError):
+        item.body
+
+
+# -----------------------------------------------------------------------------
+def test_objects():
+    """
+    With objects=True, results come back as objects, bodies are fetched
+    once, and the helpers that read results still work
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    cub = Bear(transport=fake, objects=True, tagindex=TagIndex(),
+               searchindex=SearchIndex(":memory:"))
+    made = cub.create(title="Objects", text="some body", tags="obj")
+    note = cub.open_note(id=made['identifier'])
+    assert isinstance(note, Note)
+    assert note.body == "# Objects\nsome body\n#obj"
+    assert note.trashed is False
+    assert note.to_dict()['note'] == note.body
+
+    [item] = cub.open_tag("obj")
+    assert isinstance(item, NoteSummary)
+    before = fake.calls.count('open-note')
+    assert item.body == note.body
+    assert item.body == note.body
+    assert fake.calls.count('open-note') == before + 1
+    assert [type(_) for _ in cub.search("body", lazy=True)] == [NoteSummary]
+
+    assert cub.has_tag(made['identifier'], "obj")
+    cub.tagindex.build(cub)
+    assert cub.tagindex.intersect("obj") == {made['identifier']}
+    assert cub.searchindex.refresh(cub) == 0
+    [hit] = cub.search("body", local=True)
+    assert hit.identifier == made['identifier'] and 0 < hit.score
+
+
+# -----------------------------------------------------------------------------
+def test_dicts_by_default():
+    """
+    Without objects=True, nothing changes
+    """
+    pytest.dbgfunc()
+    cub = Bear(transport=FakeTransport())
+    made = cub.create(title="Plain", text="body", tags="plain")
+    assert type(cub.open_note(id=made['identifier'])) is dict
+    assert type(cub.open_tag("plain")[0]) is dict
@@ -0,0 +1,211 @@
+"""
+Tests for retries and the circuit breaker
+"""
+from bear import Bear, Bearror
+from bear.fake import FakeTransport
+from bear.policy import Policy, classify
+import pytest
+
+
+class Flaky(FakeTransport):
+    """
+    A fake Bear that fails the calls whose numbers (from 0) are in *fail*,
+    with *how*: 'empty' replies with nothing, 'timeout' raises like xcall
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, fail=(), how="empty"):
+        """
+        Set up the failures
+        """
+        FakeTransport.__init__(self)
+        self.fail = set(fail)
+        self.how = how
+        self.count = 0
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Fail or answer
+        """
+        self.count += 1
+        if self.count - 1 in self.fail:
+            if self.how == "timeout":
+                raise Bearror("xcall did not finish in 5 seconds")
+            return ''
+        return FakeTransport.call(self, url)
+
+
+class Clock(object):
+    """
+    A clock that only moves when slept on
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Start at zero
+        """
+        self.now = 0.0
+        self.naps = []
+
+    # -------------------------------------------------------------------------
+    def __call__(self):
+        """
+        Tell the time
+        """
+        return self.now
+
+    # -------------------------------------------------------------------------
+    def sleep(self, secs):
+        """
+        Pass the time
+        """
+        self.naps.append(secs)
+        self.now += secs
+
+
+# -----------------------------------------------------------------------------
+def policy(clock, **kw):
+    """
+    Return a Policy on *clock* with no randomness in its backoff
+    """
+    return Policy(clock=clock, sleep=clock.sleep, rand=lambda: 1.0, **kw)
+
+
+# -----------------------------------------------------------------------------
+def test_classify():
+    """
+    Failures sort into kinds
+    """
+    pytest.dbgfunc()
+    assert classify('', 'open-note') == 'empty'
+    assert classify('', 'trash') is None
+    assert classify({'note': ""}, 'open-note') is None
+    assert classify(Bearror("xcall did not finish in 3 seconds")) == 'timeout'
+    assert classify(Bearror("Worker 12 did not answer in 3 seconds")) == \
+        'timeout'
+    assert classify(Bearror("Worker 12 has gone away")) == 'transient'
+    assert classify(Bearror("The note could not be found")) == \
+        'note-not-found'
+    assert classify(Bearror("The tag could not be found")) == 'tag-not-found'
+    assert classify(Bearror("Empty notes are not allowed")) == 'error'
+
+
+# -----------------------------------------------------------------------------
+def test_classify_tag_named():
+    """
+    Bear's tag error is classified by its own text, not the text raised
+    with the tag name worked in
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    fake.call = lambda url: '{"errorMessage": "The tag could not be found"}'
+    with pytest.raises(Bearror) as err:
+        Bear(transport=fake, policy=Policy()).search("x", tag="work")
+    assert str(err.value) == "The tag work could not be found"
+    assert classify(err.value) == 'tag-not-found'
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("how", ["empty", "timeout"])
+def test_read_retried(how):
+    """
+    A read that fails transiently is retried with growing backoff
+    """
+    pytest.dbgfunc()
+    fake = Flaky(fail=[1, 2], how=how)
+    clock = Clock()
+    cub = Bear(transport=fake, policy=policy(clock))
+    made = cub.create(title="Retry", text="body")
+    assert cub.open_note(id=made['identifier'])['title'] == "Retry"
+    assert fake.count == 4
+    assert clock.naps == [0.25, 0.5]
+    assert cub.policy.failures[how] == 2
+
+
+# -----------------------------------------------------------------------------
+def test_give_up():
+    """
+    Retries run out, and definite answers aren't retried at all
+    """
+    pytest.dbgfunc()
+    clock = Clock()
+    cub = Bear(transport=Flaky(fail=range(100)),
+               policy=policy(clock, retries=2, threshold=100))
+    with pytest.raises(Bearror) as err:
+        cub.tags()
+    assert "empty reply to tags" in str(err.value)
+    assert cub.transport.count == 3
+
+    cub = Bear(transport=Flaky(), policy=policy(clock))
+    with pytest.raises(Bearror):
+        cub.open_note(id="nonesuch")
+    assert cub.transport.count == 1
+
+
+# -----------------------------------------------------------------------------
+def test_writes_not_retried():
+    """
+    A write that may have landed is not sent again
+    """
+    pytest.dbgfunc()
+    fake = Flaky(fail=[0], how="timeout")
+    cub = Bear(transport=fake, policy=policy(Clock()))
+    with pytest.raises(Bearror):
+        cub.create(title="Once", text="body")
+    assert fake.count == 1
+
+
+# -----------------------------------------------------------------------------
+def test_guarded():
+    """
+    idemp_add is retried as a whole, and the tag lands once
+    """
+    pytest.dbgfunc()
+    fake = Flaky(how="timeout")
+    cub = Bear(transport=fake, policy=policy(Clock()))
+    made = cub.create(title="Guarded", text="body")
+    fake.fail = {fake.count + 1}
+    assert cub.idemp_add(id=made['identifier'], tag="once") is True
+    assert fake.notes[made['identifier']].text.count("#once") == 1
+
+    report = cub.bulk_idemp_add([made['identifier']], "twice")
+    assert report[made['identifier']]['added'] == ["twice"]
+
+
+# -----------------------------------------------------------------------------
+def test_breaker():
+    """
+    Failures in a row open the breaker, calls then fail fast, and after the
+    cooldown one trial call decides whether it closes
+    """
+    pytest.dbgfunc()
+    fake = Flaky(fail=range(1, 4), how="timeout")
+    clock = Clock()
+    cub = Bear(transport=fake,
+               policy=policy(clock, retries=0, threshold=3, cooldown=10.0))
+    made = cub.create(title="Breaker", text="body")
+    for _ in range(3):
+        with pytest.raises(Bearror):
+            cub.open_note(id=made['identifier'])
+    assert cub.policy.state() == "open"
+    with pytest.raises(Bearror) as err:
+        cub.open_note(id=made['identifier'])
+    assert "not responding" in str(err.value)
+    assert fake.count == 4
+
+    clock.now += 10.0
+    assert cub.policy.state() == "half-open"
+    assert cub.open_note(id=made['identifier'])['title'] == "Breaker"
+    assert cub.policy.state() == "closed"
+
+    fake.fail = set(range(fake.count, fake.count + 4))
+    for _ in range(3):
+        with pytest.raises(Bearror):
+            cub.open_note(id=made['identifier'])
+    clock.now += 10.0
+    with pytest.raises(Bearror) as err:
+        cub.open_note(id=made['identifier'])
+    assert "did not finish" in str(err.value)
+    assert cub.policy.state() == "open"
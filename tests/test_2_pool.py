@@ -0,0 +1,64 @@
+"""
+Tests for the bounded xcall pool transport
+"""
+from bear import Bear, Bearror
+from bear.fake import FakeTransport
+from bear.pool import XcallPool
+from bear.transport import XcallTransport
+import pytest
+import threading
+import time
+
+
+class Slow(FakeTransport):
+    """
+    A fake that takes a moment over each call, so calls overlap
+    """
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Wait, then answer
+        """
+        time.sleep(0.02)
+        return super(Slow, self).call(url)
+
+
+# -----------------------------------------------------------------------------
+def test_pool_round_trip():
+    """
+    Calls go straight through to the inner transport, errors included
+    """
+    pytest.dbgfunc()
+    with XcallPool(size=1, inner=FakeTransport()) as pool:
+        cub = Bear(transport=pool)
+        made = cub.create(title="Pooled", text="body")
+        note = cub.open_note(id=made['identifier'])
+        assert note['note'] == "# Pooled\nbody"
+        with pytest.raises(Bearror) as err:
+            cub.open_note(id="nonesuch")
+        assert "The note could not be found" in str(err.value)
+        assert pool.calls == 3 and pool.running == 0
+    assert isinstance(XcallPool(timeout=2).inner, XcallTransport)
+    assert XcallPool(timeout=2).inner.timeout == 2
+
+
+# -----------------------------------------------------------------------------
+def test_pool_bounded():
+    """
+    Concurrent callers never have more than size calls in flight
+    """
+    pytest.dbgfunc()
+    with XcallPool(size=2, inner=Slow()) as pool:
+        cub = Bear(transport=pool)
+        thl = [threading.Thread(target=cub.change_font, args=("Menlo",))
+               for _ in range(8)]
+        for thread in thl:
+            thread.start()
+        for thread in thl:
+            thread.join()
+        assert pool.peak == 2
+        assert pool.calls == 8 and pool.running == 0
+    with pytest.raises(Bearror) as err:
+        pool.call("bear://x-callback-url/tags")
+    assert "closed" in str(err.value)
@@ -0,0 +1,178 @@
+"""
+Tests for the priority scheduler
+"""
+from bear import Bear, Bearror
+from bear.aio import AsyncBear
+from bear.fake import FakeTransport
+from bear.metrics import endpoint
+from bear.scheduler import CURRENT, Bucket, Scheduler, priority
+import asyncio
+import threading
+import time
+import pytest
+
+
+class Gate(FakeTransport):
+    """
+    A fake Bear that logs each call with the priority it was made under and,
+    while *gate* is clear, holds every call until it's set
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Start with the gate open
+        """
+        FakeTransport.__init__(self)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.log = []
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Wait at the gate, then log and answer
+        """
+        self.gate.wait()
+        self.log.append((endpoint(url), CURRENT.get()))
+        return FakeTransport.call(self, url)
+
+
+# -----------------------------------------------------------------------------
+def queue_up(sched, klass, client, func, nthreads=1):
+    """
+    Start *nthreads* threads calling *func* under *klass* and *client*, one
+    at a time, each only once the one before it has been queued (or
+    picked)
+    """
+    def run():
+        with priority(klass, client):
+            func()
+
+    def seen():
+        return sum(sched.waiting().values()) + sum(sched.served.values())
+
+    threads = []
+    for _ in range(nthreads):
+        before = seen()
+        thread = threading.Thread(target=run)
+        thread.start()
+        while seen() == before:
+            time.sleep(0.001)
+        threads.append(thread)
+    return threads
+
+
+# -----------------------------------------------------------------------------
+def test_bucket():
+    """
+    Tokens run out and come back at the rate
+    """
+    pytest.dbgfunc()
+    now = [0.0]
+    bucket = Bucket(2, burst=2, clock=lambda: now[0])
+    for _ in range(2):
+        assert bucket.ready() == 0
+        bucket.take()
+    assert bucket.ready() == 0.5
+    now[0] += 0.25
+    assert bucket.ready() == 0.25
+    now[0] += 10
+    assert bucket.ready() == 0
+    assert bucket.tokens == 2
+
+
+# -----------------------------------------------------------------------------
+def test_priority_first():
+    """
+    An interactive call queued behind a bulk sweep goes next
+    """
+    pytest.dbgfunc()
+    gate = Gate()
+    sched = Scheduler(gate)
+    cub = Bear(transport=sched)
+    made = cub.create(title="Urgent", text="body")
+    gate.gate.clear()
+    threads = queue_up(sched, "bulk", None, cub.tags)
+    threads += queue_up(sched, "bulk", "nightly",
+                        lambda: cub.trash(id=made['identifier']), 3)
+    threads += queue_up(sched, "interactive", "me",
+                        lambda: cub.open_note(id=made['identifier']))
+    assert sched.waiting() == {'interactive': 1, 'normal': 0, 'bulk': 3}
+    del gate.log[:]
+    gate.gate.set()
+    for thread in threads:
+        thread.join()
+    assert [_[0] for _ in gate.log[:2]] == ["tags", "open-note"]
+    assert gate.log[1][1] == ("interactive", "me")
+    assert sched.served['bulk'] == 4
+
+
+# -----------------------------------------------------------------------------
+def test_fair():
+    """
+    Clients in a class take turns, however many calls each has queued
+    """
+    pytest.dbgfunc()
+    gate = Gate()
+    sched = Scheduler(gate)
+    cub = Bear(transport=sched)
+    gate.gate.clear()
+    threads = queue_up(sched, "normal", "first", cub.tags)
+    threads += queue_up(sched, "normal", "greedy", cub.tags, 3)
+    threads += queue_up(sched, "normal", "modest", cub.tags)
+    gate.gate.set()
+    for thread in threads:
+        thread.join()
+    clients = [_[1][1] for _ in gate.log]
+    assert clients == ["first", "greedy", "modest", "greedy", "greedy"]
+
+
+# -----------------------------------------------------------------------------
+def test_rate_limit():
+    """
+    A rate limited class waits for tokens, and doesn't hold up the others
+    """
+    pytest.dbgfunc()
+    sched = Scheduler(FakeTransport(), rates={'bulk': (20, 1)})
+    cub = Bear(transport=sched)
+    start = time.monotonic()
+    with priority("bulk"):
+        for _ in range(4):
+            cub.tags()
+    assert 0.14 < time.monotonic() - start
+    start = time.monotonic()
+    for _ in range(4):
+        cub.tags()
+    assert time.monotonic() - start < 0.1
+
+    with pytest.raises(Bearror):
+        Scheduler(FakeTransport(), rates={'urgent': 5})
+    with pytest.raises(Bearror):
+        with priority("urgent"):
+            pass
+
+
+# -----------------------------------------------------------------------------
+def test_context_carried():
+    """
+    The priority follows calls into bulk_idemp_add's threads and through
+    AsyncBear
+    """
+    pytest.dbgfunc()
+    gate = Gate()
+    cub = Bear(transport=Scheduler(gate))
+    ids = [cub.create(title="N{}".format(_), text="x")['identifier']
+           for _ in range(3)]
+    del gate.log[:]
+    with priority("bulk", "sweep"):
+        cub.bulk_idemp_add(ids, "swept")
+    assert {_[1] for _ in gate.log} == {("bulk", "sweep")}
+
+    async def main():
+        with priority("interactive", "repl"):
+            return await AsyncBear(transport=cub.transport).tags()
+
+    del gate.log[:]
+    asyncio.run(main())
+    assert gate.log == [("tags", ("interactive", "repl"))]
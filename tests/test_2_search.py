@@ -0,0 +1,119 @@
+"""
+Tests for the local full-text search index
+"""
+from bear import Bear, Bearror
+from bear.fake import FakeTransport
+from bear.search import SearchIndex, fts_query
+import datetime
+import pytest
+
+
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def sbear(tmpdir):
+    """
+    Provide a Bear object on a fake with a few notes and an on-disk index
+    """
+    fake = FakeTransport()
+    fake.add_note("# Bread recipe\nflour water salt yeast\n#food")
+    fake.add_note("# Shopping\nbread, milk\n#food")
+    fake.add_note("# Diary\nbaked bread and more bread and bread\n#diary")
+    fake.add_note("# Quote\nthe quick brown fox jumps\n#misc")
+    path = tmpdir.join("search.sqlite").strpath
+    return Bear(transport=fake, searchindex=SearchIndex(path))
+
+
+# -----------------------------------------------------------------------------
+def test_fts_query():
+    """
+    User queries are quoted so FTS5 syntax can't leak in
+    """
+    pytest.dbgfunc()
+    assert fts_query('bread "quick brown" fo* a"b OR') == \
+        '"bread" "quick brown" "fo"* "a""b" "OR"'
+    assert fts_query(' "" * ') == ""
+
+
+# -----------------------------------------------------------------------------
+def test_search_rank(sbear):
+    """
+    Title matches outrank body matches, which rank by frequency
+    """
+    pytest.dbgfunc()
+    assert sbear.searchindex.refresh(sbear) == 4
+    hits = sbear.search("bread", local=True)
+    assert [_['title'] for _ in hits] == ["Bread recipe", "Diary",
+                                          "Shopping"]
+    assert hits[0]['score'] > hits[1]['score'] > hits[2]['score']
+    assert len(sbear.search("bread", local=True, k=1)) == 1
+    assert [_['title'] for _ in sbear.search("bread", local=True,
+                                             tag="food")] == \
+        ["Bread recipe", "Shopping"]
+
+
+# -----------------------------------------------------------------------------
+def test_search_phrase(sbear):
+    """
+    Phrases must match in order; prefixes match any completion
+    """
+    pytest.dbgfunc()
+    sbear.searchindex.refresh(sbear)
+    assert len(sbear.search('"quick brown"', local=True)) == 1
+    assert sbear.search('"brown quick"', local=True) == []
+    assert len(sbear.search("bak*", local=True)) == 1
+    assert sbear.search("", local=True) == []
+
+
+# -----------------------------------------------------------------------------
+def test_search_incremental(sbear, tmpdir):
+    """
+    Refresh fetches only changed notes; the index lives on disk
+    """
+    pytest.dbgfunc()
+    fake = sbear.transport
+    sbear.searchindex.refresh(sbear)
+    assert sbear.searchindex.refresh(sbear) == 0
+    nid = sbear.search("fox", local=True)[0]['identifier']
+    fake.notes[nid].text += "\nand a lazy dog"
+    fake.notes[nid].modified += datetime.timedelta(seconds=5)
+    assert sbear.searchindex.refresh(sbear) == 1
+    sbear.trash(id=sbear.search("diary", local=True)[0]['identifier'])
+    again = SearchIndex(tmpdir.join("search.sqlite").strpath)
+    assert len(again) == 3
+    assert again.query("lazy dog")[0]['identifier'] == nid
+
+    made = sbear.create(title="New", text="zebra")['identifier']
+    sbear.open_note(id=made)
+    assert sbear.search("zebra", local=True)[0]['identifier'] == made
+    with pytest.raises(Bearror):
+        Bear(transport=fake).search("x", local=True)
+
+
+# -----------------------------------------------------------------------------
+def test_search_tag(sbear, tmpdir):
+    """
+    A tag filter is applied in sqlite, keeps the limit, follows edits, and
+    is kept on disk
+    """
+    pytest.dbgfunc()
+    fake = sbear.transport
+    fake.add_note("# Rye\nbread with caraway\n#food/baking")
+    sbear.searchindex.refresh(sbear)
+    hits = sbear.search("bread", local=True, tag="food", k=2)
+    assert [_['title'] for _ in hits] == ["Bread recipe", "Shopping"]
+    assert [_['title'] for _ in sbear.search("bread", local=True,
+                                             tag="food/baking")] == ["Rye"]
+    assert sbear.search("bread", local=True, tag="nonesuch") == []
+
+    nid = hits[0]['identifier']
+    fake.notes[nid].text = fake.notes[nid].text.replace("#food", "#misc")
+    fake.notes[nid].modified += datetime.timedelta(seconds=5)
+    sbear.searchindex.refresh(sbear)
+    assert nid not in [_['identifier'] for _ in
+                       sbear.search("bread", local=True, tag="food")]
+
+    path = tmpdir.join("search.sqlite").strpath
+    sbear.searchindex.close()
+    again = SearchIndex(path)
+    assert [_['title'] for _ in again.query("bread", tag="misc")] == \
+        ["Bread recipe"]
@@ -0,0 +1,166 @@
+"""
+Tests for the bear daemon and its client
+"""
+from bear import Bear, Bearror
+from bear.fake import FakeTransport
+from bear.serve import BearClient, BearServer, connect
+import os
+import pytest
+import socket
+import stat
+
+
+class Recorder(object):
+    """
+    Stands in for BearServer and BearClient in the command line tests,
+    noting how they're built and called
+    """
+    made = []
+
+    # -------------------------------------------------------------------------
+    def __init__(self, path=None, pool=None):
+        """
+        Note the arguments
+        """
+        self.path = path
+        Recorder.made.append({'path': path, 'pool': pool})
+
+    # -------------------------------------------------------------------------
+    def call(self, method, *args, **kw):
+        """
+        Note the call
+        """
+        Recorder.made[-1].update(method=method, args=list(args), kw=kw)
+        return {}
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        """
+        Nothing to close
+        """
+
+    # -------------------------------------------------------------------------
+    def serve_forever(self):
+        """
+        Return at once
+        """
+
+
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def served(tmp_path):
+    """
+    A daemon on a throwaway socket, serving a fake Bear, and a client for it
+    """
+    server = BearServer(str(tmp_path / "s"),
+                        bear=Bear(transport=FakeTransport())).start()
+    client = BearClient(server.path, timeout=5)
+    yield server, client
+    client.close()
+    server.close()
+
+
+# -----------------------------------------------------------------------------
+def test_round_trip(served):
+    """
+    Calls go through the socket and come back as JSON
+    """
+    pytest.dbgfunc()
+    server, client = served
+    made = client.create(title="Groceries", text="eggs", tags="home")
+    note = client.open_note(id=made['identifier'])
+    assert note['title'] == "Groceries"
+    assert "eggs" in note['note']
+    found = client.search(term="Groceries")
+    assert [_['identifier'] for _ in found] == [made['identifier']]
+    assert client.search(term="Groceries", lazy=True) == found
+    assert "home" in client.tags()
+    assert client.ping()['calls'] == 5
+    assert stat.S_IMODE(os.stat(server.path).st_mode) == 0o600
+
+
+# -----------------------------------------------------------------------------
+def test_errors(served):
+    """
+    Failures on the server side come back as Bearror and leave the
+    connection usable
+    """
+    pytest.dbgfunc()
+    server, client = served
+    with pytest.raises(Bearror) as err:
+        client.open_note()
+    assert "id or title" in str(err.value)
+    with pytest.raises(Bearror) as err:
+        client.call("raw_url", "bear://x-callback-url/tags")
+    assert "does not offer" in str(err.value)
+    with pytest.raises(Bearror):
+        client.create(colour="red")
+    with pytest.raises(AttributeError):
+        client.raw_url
+    assert client.ping()['pid'] == os.getpid()
+
+
+# -----------------------------------------------------------------------------
+def test_socket_reuse(served, tmp_path):
+    """
+    A live daemon's socket is left alone; a dead one's is replaced
+    """
+    pytest.dbgfunc()
+    server, client = served
+    with pytest.raises(Bearror):
+        BearServer(server.path, bear=server.bear).start()
+    assert client.ping()
+
+    stale = str(tmp_path / "stale")
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    dead.bind(stale)
+    dead.close()
+    assert os.path.exists(stale)
+    second = BearServer(stale, bear=server.bear).start()
+    try:
+        assert BearClient(stale, timeout=5).ping()
+    finally:
+        second.close()
+    assert not os.path.exists(stale)
+
+
+# -----------------------------------------------------------------------------
+def test_connect(served, tmp_path):
+    """
+    connect() uses the daemon if it's up and Bear otherwise
+    """
+    pytest.dbgfunc()
+    server, _ = served
+    client = connect(server.path, timeout=5)
+    assert isinstance(client, BearClient)
+    client.close()
+    assert isinstance(connect(str(tmp_path / "none")), Bear)
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("argv, want", [
+    ("client open_note id=ABC",
+     {'path': None, 'method': "open_note", 'args': [], 'kw': {'id': "ABC"}}),
+    ("client ping", {'path': None, 'method': "ping", 'args': [], 'kw': {}}),
+    ("client -s /tmp/b.sock search groceries tag=home",
+     {'path': "/tmp/b.sock", 'method': "search", 'args': ["groceries"],
+      'kw': {'tag': "home"}}),
+    ("serve -p 2", {'path': None, 'pool': 2}),
+    ("serve", {'path': None, 'pool': 4}),
+    ("serve --socket /tmp/b.sock --pool 8", {'path': "/tmp/b.sock",
+                                             'pool': 8}),
+    ])
+def test_command_line(argv, want, monkeypatch, capsys):
+    """
+    'bear serve' and 'bear client' hand their options to the daemon and
+    client as documented
+    """
+    pytest.dbgfunc()
+    pytest.importorskip("tbx")
+    import bear.__main__ as main
+    monkeypatch.setattr(main, "BearServer", Recorder)
+    monkeypatch.setattr(main, "BearClient", Recorder)
+    Recorder.made = []
+    main.dispatch(main.__doc__, argv=argv.split())
+    got = Recorder.made[0]
+    assert {k: got.get(k) for k in want} == want
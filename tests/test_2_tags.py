@@ -0,0 +1,197 @@
+"""
+Tests for the tag syntax helpers and TagIndex
+"""
+from bear import Bear, Bearror
+from bear.fake import FakeTransport
+from bear.tags import TagIndex, hashtag, lineage
+from bear.writebehind import Journal
+from fixtures import fcub                                          # noqa: F401
+import datetime
+import pytest
+import threading
+
+
+class Gated(FakeTransport):
+    """
+    A fake Bear that holds each call until its gate is open
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Start with the gate open
+        """
+        FakeTransport.__init__(self)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Wait for the gate, then answer
+        """
+        self.gate.wait(5)
+        return FakeTransport.call(self, url)
+
+
+# -----------------------------------------------------------------------------
+def test_tag_helpers():
+    """
+    hashtag() writes tags the way Bear does; lineage() lists parents
+    """
+    pytest.dbgfunc()
+    assert hashtag("work") == "#work"
+    assert hashtag("two words") == "#two words#"
+    assert lineage("a/b/c") == ["a", "a/b", "a/b/c"]
+
+
+# -----------------------------------------------------------------------------
+def test_tagindex_ops():
+    """
+    update, add, intersect, rename and remove keep both maps in step
+    """
+    pytest.dbgfunc()
+    idx = TagIndex()
+    idx.update("n1", "# One\n#work #todo/home")
+    idx.update("n2", "# Two\n#work #workshop")
+    idx.add("n3", ["#todo/home"])
+    assert idx.has_tag("n1", "#todo") and not idx.has_tag("n3", "work")
+    assert idx.has_tag("nonesuch", "work") is None
+    assert idx.intersect("work", "todo") == {"n1"}
+    assert idx.intersect("todo/home") == {"n1", "n3"}
+    idx.rename("todo", "chores")
+    assert idx.intersect("chores/home") == {"n1", "n3"}
+    assert idx.intersect("todo") == set()
+    assert idx.has_tag("n3", "chores")
+    idx.rename("work")
+    assert idx.tags["n2"] == {"workshop"}
+    idx.update("n2", "# Two")
+    idx.remove("n1")
+    assert idx.intersect("workshop") == set()
+    assert idx.intersect("chores") == {"n3"}
+
+
+# -----------------------------------------------------------------------------
+def test_has_tag_prefix(fcub):                                     # noqa: F811
+    """
+    '#workshop' doesn't count as '#work', with or without an index
+    """
+    pytest.dbgfunc()
+    nid = fcub.create(title="Prefix", tags="workshop")['identifier']
+    assert not fcub.has_tag(nid, "work")
+    assert fcub.idemp_add(id=nid, tag="work")
+    assert fcub.has_tag(nid, "#work")
+
+
+# -----------------------------------------------------------------------------
+def test_tagindex_bear():
+    """
+    Once built, the index answers has_tag and idemp_add without fetching
+    notes, and follows our own changes
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    ids = [fake.add_note("# N{}\n#all #n{}".format(_, _)) for _ in range(5)]
+    cub = Bear(transport=fake, tagindex=TagIndex())
+    cub.tagindex.build(cub)
+    assert cub.tagindex.intersect("all", "n2") == {ids[2]}
+    for nid in ids:
+        assert cub.has_tag(nid, "all")
+        assert not cub.idemp_add(id=nid, tag="all")
+    assert 'open-note' not in fake.calls
+
+    assert cub.idemp_add(id=ids[0], tag="new")
+    assert cub.has_tag(ids[0], "new")
+    cub.rename_tag("new", "newer")
+    assert cub.tagindex.intersect("newer") == {ids[0]}
+    with cub.batch():
+        cub.add_text(id=ids[1], text="", tags="late", mode="append")
+        assert not cub.has_tag(ids[1], "late")
+    assert cub.has_tag(ids[1], "late")
+    assert 'open-note' not in fake.calls
+
+
+# -----------------------------------------------------------------------------
+def test_tagindex_undelivered(tmpdir):
+    """
+    Writes held in a batch or a journal reach the index only when Bear
+    carries them out, so one that fails leaves no tag behind
+    """
+    pytest.dbgfunc()
+    fake = Gated()
+    nid = fake.add_note("# Note\n#old")
+    cub = Bear(transport=fake, tagindex=TagIndex())
+    cub.tagindex.build(cub)
+    with pytest.raises(Bearror):
+        with cub.batch():
+            cub.add_text(id=nid, text="", tags="kept", mode="append")
+            cub.add_text(id="nonesuch", text="", tags="lost",
+                         mode="append")
+            cub.rename_tag("old", "older")
+    assert cub.has_tag(nid, "kept") and cub.has_tag(nid, "older")
+    assert not cub.tagindex.intersect("lost")
+
+    fake.gate.clear()
+    cub = Bear(transport=fake, tagindex=cub.tagindex,
+               journal=Journal(tmpdir.join("journal.db").strpath))
+    cub.add_text(id=nid, text="", tags="queued", mode="append")
+    assert not cub.has_tag(nid, "queued")
+    fake.gate.set()
+    assert cub.journal.drain(5) == 0
+    assert cub.has_tag(nid, "queued")
+    cub.journal.close()
+
+
+# -----------------------------------------------------------------------------
+def test_tagindex_stale():
+    """
+    A note changed outside this client drops out of the index when a search
+    shows its new modificationDate, so idemp_add looks at it again
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    nid = fake.add_note("# Note\n#keep #gone")
+    cub = Bear(transport=fake, tagindex=TagIndex())
+    cub.tagindex.build(cub)
+    assert not cub.idemp_add(id=nid, tag="gone")
+    fake.notes[nid].text = "# Note\n#keep"
+    fake.notes[nid].modified += datetime.timedelta(minutes=1)
+    cub.search(term="Note")
+    assert cub.has_tag(nid, "keep")
+    assert cub.idemp_add(id=nid, tag="gone")
+    assert fake.notes[nid].text.endswith("#gone")
+    assert cub.has_tag(nid, "gone")
+
+    cub.open_note(id=nid)
+    assert cub.tagindex.stamps[nid] is not None
+    fake.notes[nid].modified += datetime.timedelta(minutes=1)
+    list(cub.open_tag("keep", lazy=True))
+    assert cub.tagindex.has_tag(nid, "keep") is None
+
+
+# -----------------------------------------------------------------------------
+def test_tagindex_parents():
+    """
+    Renaming or deleting a nested tag takes away the parents it brought,
+    but not those another tag (or the note itself) still gives
+    """
+    pytest.dbgfunc()
+    idx = TagIndex()
+    idx.update("n1", "# One\n#a/b")
+    idx.update("n2", "# Two\n#a/b #a/c")
+    idx.update("n3", "# Three\n#a #a/b")
+    idx.rename("a/b", "c")
+    assert not idx.has_tag("n1", "a") and idx.has_tag("n1", "c")
+    assert idx.has_tag("n2", "a") and idx.has_tag("n3", "a")
+    assert idx.intersect("a") == {"n2", "n3"}
+    idx.rename("a/c")
+    assert idx.tags["n2"] == {"c"}
+    assert idx.intersect("a") == {"n3"}
+
+    fake = FakeTransport()
+    nid = fake.add_note("# Note\n#x/y/z")
+    cub = Bear(transport=fake, tagindex=TagIndex())
+    cub.tagindex.build(cub)
+    cub.rename_tag("x/y", "w")
+    assert not cub.has_tag(nid, "x") and not cub.has_tag(nid, "x/y")
+    assert cub.has_tag(nid, "w/z")
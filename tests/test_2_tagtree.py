@@ -0,0 +1,130 @@
+"""
+Tests for the tag trie
+"""
+from bear import Bear, Bearror
+from bear.fake import FakeTransport
+from bear.tags import TagIndex
+from bear.tagtree import TagTree
+import pytest
+
+NAMES = ["todo", "todo/work", "todo/work/urgent", "todo/home", "work",
+         "area/health"]
+
+
+class Rec(object):
+    """
+    Stands in for a Bear object, noting rename_tag calls
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Nothing yet
+        """
+        self.calls = []
+
+    # -------------------------------------------------------------------------
+    def rename_tag(self, old, new):
+        """
+        Note the call
+        """
+        self.calls.append((old, new))
+
+
+# -----------------------------------------------------------------------------
+def test_lookup():
+    """
+    Lookups, subtrees, and counts
+    """
+    pytest.dbgfunc()
+    tree = TagTree(NAMES, counts={'todo': 7, 'todo/work': 4})
+    assert "todo/work/urgent" in tree
+    assert "todo/urgent" not in tree
+    assert "area" in tree
+    assert tree.subtree("todo") == ["todo", "todo/home", "todo/work",
+                                    "todo/work/urgent"]
+    assert tree.subtree("nothing") == []
+    assert list(tree) == ["area", "area/health", "todo", "todo/home",
+                          "todo/work", "todo/work/urgent", "work"]
+    assert len(tree) == 7
+    assert tree.count("todo") == 7
+    assert tree.count("todo/home") is None
+
+
+# -----------------------------------------------------------------------------
+def test_plan():
+    """
+    Redundant moves are dropped, children follow their parents, and a move
+    into a name being vacated waits for it
+    """
+    pytest.dbgfunc()
+    tree = TagTree(NAMES)
+    assert tree.plan({'todo': "tasks", 'todo/work': "tasks/work",
+                      'todo/work/urgent': "tasks/work/urgent"}) == \
+        [("todo", "tasks")]
+    assert tree.plan({'todo': "tasks", 'todo/home': "home"}) == \
+        [("todo", "tasks"), ("tasks/home", "home")]
+    assert tree.plan({'work': "career", 'todo/work': "work"}) == \
+        [("work", "career"), ("todo/work", "work")]
+    with pytest.raises(Bearror):
+        tree.plan({'nothing': "something"})
+
+
+# -----------------------------------------------------------------------------
+def test_swap():
+    """
+    Moves that wait on each other are untangled with a temporary name
+    """
+    pytest.dbgfunc()
+    tree = TagTree(["a", "b", "a/x"])
+    calls = tree.plan({'a': "b", 'b': "a"})
+    assert calls == [("b", "a~1"), ("a", "b"), ("a~1", "a")]
+    tree.execute(Rec(), {'a': "b", 'b': "a"})
+    assert list(tree) == ["a", "b", "b/x"]
+
+
+# -----------------------------------------------------------------------------
+def test_execute():
+    """
+    A subtree move goes through Bear and the tree keeps up
+    """
+    pytest.dbgfunc()
+    cub = Bear(transport=FakeTransport())
+    for tags in ["todo/work", "todo/home", "todo/work/urgent", "home"]:
+        cub.create(title="Note", text="body", tags=tags)
+    index = TagIndex()
+    index.build(cub)
+    tree = TagTree.build(cub, index)
+    assert tree.count("todo") == 3
+    calls = tree.execute(cub, {'todo/work': "work", 'todo/home': "home"})
+    assert calls == [("todo/home", "home"), ("todo/work", "work")]
+    assert sorted(cub.tags()) == sorted(tree)
+    assert tree.count("home") is None
+    assert tree.count("work") == 2
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("tags, moves, want", [
+    (["d/d", "d/a", "d/a/c"],
+     {'d/a': "a", 'd': "a/c", 'd/a/c': "a/b"},
+     ["a/c/d", "a", "a/b"]),
+    (["c/a", "c/x", "a/a"],
+     {'c/a': "b", 'c': "a"},
+     ["b", "a/x", "a/a"]),
+    (["a", "b/x", "b"],
+     {'a': "b", 'b': "a"},
+     ["b", "a/x", "a"]),
+    ])
+def test_execute_nested(tags, moves, want):
+    """
+    Children carried along with a parent never land on a tag bound
+    elsewhere: every note ends up where the moves send its tag
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    ids = [fake.add_note("# N\n#" + _) for _ in tags]
+    cub = Bear(transport=fake)
+    tree = TagTree.build(cub)
+    tree.execute(cub, moves)
+    assert [fake.notes[_].text for _ in ids] == ["# N\n#" + _ for _ in want]
+    assert sorted(cub.tags()) == sorted(tree)
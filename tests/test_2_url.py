@@ -0,0 +1,262 @@
+"""
+Tests for bear.url and for splitting long add-text calls
+"""
+from bear import Bear, Bearror
+from bear.aio import AsyncBear
+from bear.batch import Batch
+from bear.fake import FakeTransport, parse_url
+from bear import url
+from bear.pool import XcallPool
+from fixtures import fcub                                          # noqa: F401
+import asyncio
+import base64
+import io
+import os
+import pathlib
+import pytest
+
+
+# -----------------------------------------------------------------------------
+def twins(text):
+    """
+    Return two fakes holding the same note: one that takes urls of any
+    length and one that takes no more than 300 characters per url
+    """
+    big, small = FakeTransport(), FakeTransport()
+    small.max_url = 300
+    return (big, big.add_note(text)), (small, small.add_note(text))
+
+
+# -----------------------------------------------------------------------------
+def test_quote():
+    """
+    str and bytes get the same treatment, and a str always comes back
+    """
+    pytest.dbgfunc()
+    raw = "a b%c#d\"e\nf\tg>h<i^j&k{l}m|n\\o`p/q=r"
+    exp = ("a%20b%25c%23d%22e%0af%09g%3eh%3ci%5ej%26k%7bl%7dm%7cn%5co%60p"
+           "/q=r")
+    assert url.quote(raw) == exp
+    assert url.quote(raw.encode()) == exp
+    assert url.quote("café olé".encode()) == "café%20olé"
+
+
+# -----------------------------------------------------------------------------
+def test_build():
+    """
+    build() and Bear._url() agree, and the fake reads back what was sent
+    """
+    pytest.dbgfunc()
+    kw = {'text': "x & y = z\n#tag", 'mode': "append", 'id': "NOTE-1"}
+    assert url.build('tags', {}) == "bear://x-callback-url/tags"
+    result = url.build('add-text', kw)
+    assert result == Bear(transport=FakeTransport())._url('add-text', **kw)
+    assert parse_url(result) == ('add-text', kw)
+
+
+# -----------------------------------------------------------------------------
+def test_arg_limit():
+    """
+    The xcall limit is positive and, on Linux, within MAX_ARG_STRLEN
+    """
+    pytest.dbgfunc()
+    assert 0 < url.arg_limit() < 2 * 1024 * 1024
+
+
+# -----------------------------------------------------------------------------
+def test_split_text():
+    """
+    Pieces fit the budget, break only at newlines, and rejoin to the text
+    """
+    pytest.dbgfunc()
+    text = "\n".join("line {} with some #words".format(_) for _ in range(50))
+    pieces = url.split_text(text, 100)
+    assert 1 < len(pieces)
+    assert "\n".join(pieces) == text
+    assert all(len(url.quote(_)) <= 100 for _ in pieces)
+    assert url.split_text("short", 100) == ["short"]
+    with pytest.raises(ValueError):
+        url.split_text("x" * 101, 100)
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("mode", ["append", "prepend", "replace",
+                                  "replace_all"])
+def test_add_text_split(mode):
+    """
+    A long add-text goes out in several urls, each under the limit, and
+    leaves the note just as one long url would have
+    """
+    pytest.dbgfunc()
+    text = "\n".join("item {} of the list".format(_) for _ in range(60))
+    (big, bid), (small, sid) = twins("# Title\nfirst body line")
+    exp = Bear(transport=big).add_text(id=bid, text=text, mode=mode,
+                                       tags="long,list")
+    result = Bear(transport=small).add_text(id=sid, text=text, mode=mode,
+                                            tags="long,list")
+    assert 1 < small.calls.count('add-text')
+    assert result['note'] == exp['note']
+
+
+# -----------------------------------------------------------------------------
+def test_add_text_split_batch_async():
+    """
+    Batches and AsyncBear split too
+    """
+    pytest.dbgfunc()
+    text = "\n".join("entry {}".format(_) for _ in range(80))
+    (big, bid), (small, sid) = twins("# Log")
+    exp = Bear(transport=big).add_text(id=bid, text=text, mode="append")
+    cub = Bear(transport=small)
+    half = text.index("\n", len(text) // 2)
+    with Batch(cub):
+        cub.add_text(id=sid, text=text[:half], mode="append")
+        cub.add_text(id=sid, text=text[half + 1:], mode="append")
+    assert 2 < small.calls.count('add-text')
+    assert small.notes[sid].text == exp['note']
+
+    (big, bid), (small, sid) = twins("# Log")
+    result = asyncio.run(AsyncBear(transport=small).add_text(
+        id=sid, text=text, mode="append"))
+    assert 1 < small.calls.count('add-text')
+    assert result['note'] == exp['note']
+
+
+# -----------------------------------------------------------------------------
+def test_too_long():
+    """
+    A line too long for any url, or a long url of another kind, is an error
+    """
+    pytest.dbgfunc()
+    (_, _), (small, sid) = twins("# Title")
+    cub = Bear(transport=small)
+    with pytest.raises(Bearror) as err:
+        cub.add_text(id=sid, text="x" * 400, mode="append")
+    assert "too long for one url" in str(err.value)
+    with pytest.raises(Bearror) as err:
+        cub.create(title="t", text="x" * 400)
+    assert "longer than the 300" in str(err.value)
+    assert small.calls == []
+
+
+# -----------------------------------------------------------------------------
+def test_font_quoted_once(fcub):                                  # noqa: F811
+    """
+    A font name with a space reaches Bear intact
+    """
+    pytest.dbgfunc()
+    fcub.change_font("Helvetica Neue")
+    assert fcub.transport.font == "Helvetica Neue"
+
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 299, 300, 301, 1000])
+def test_file_payload(tmpdir, size):
+    """
+    However the file is given and wherever the chunks fall, the pieces join
+    up to its quoted base64 encoding
+    """
+    pytest.dbgfunc()
+    data = os.urandom(size)
+    path = tmpdir.join("blob.bin")
+    path.write_binary(data)
+    exp = url.quote(base64.b64encode(data)).replace("+", "%2b")
+    exp = exp.replace("/", "%2f").replace("=", "%3d")
+    by_path = url.FilePayload(pathlib_path(path), chunk=100)
+    assert "".join(by_path) == exp
+    assert by_path.name() == "blob.bin"
+    assert by_path.encoded_size() == len(base64.b64encode(data))
+    with open(path.strpath, "rb") as fobj:
+        assert "".join(url.FilePayload(fobj, chunk=100)) == exp
+    assert "".join(url.FilePayload(Dribble(data), chunk=100)) == exp
+    assert url.FilePayload(Dribble(data)).size() is None
+
+
+# -----------------------------------------------------------------------------
+def test_add_file_path(tmpdir, fcub):                              # noqa: F811
+    """
+    add_file and create take a path or file object, and default the
+    filename
+    """
+    pytest.dbgfunc()
+    data = os.urandom(5000)
+    path = tmpdir.join("pic.png")
+    path.write_binary(data)
+    fake = fcub.transport
+    made = fcub.create(title="Attached", file=pathlib_path(path))
+    assert fake.notes[made['identifier']].files == {'pic.png': data}
+    with open(path.strpath, "rb") as fobj:
+        fcub.add_file(id=made['identifier'], content=fobj, filename="b.png",
+                      mode="append")
+    note = fcub.add_file(id=made['identifier'], content=io.BytesIO(data),
+                         filename="c.png", mode="append")
+    assert "[file:c.png]" in note['note']
+    assert fake.notes[made['identifier']].files['b.png'] == data
+    assert fake.notes[made['identifier']].files['c.png'] == data
+    with pytest.raises(Bearror) as err:
+        fcub.add_file(id=made['identifier'], content=io.BytesIO(data))
+    assert "requires filename" in str(err.value)
+
+
+# -----------------------------------------------------------------------------
+def test_add_file_too_big(tmpdir):
+    """
+    A file that can't fit in a url is refused before it's read
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join("big.bin")
+    path.write_binary(b"x" * 3000)
+    fake = FakeTransport()
+    fake.max_url = 1000
+    cub = Bear(transport=fake)
+    with pytest.raises(Bearror) as err:
+        cub.create(title="t", file=pathlib_path(path))
+    assert "longer than the 1000" in str(err.value)
+    assert fake.calls == []
+
+
+# -----------------------------------------------------------------------------
+def test_add_file_pool(tmpdir):
+    """
+    The pool hands a streamed url on to its inner transport
+    """
+    pytest.dbgfunc()
+    data = os.urandom(50000)
+    path = tmpdir.join("doc.pdf")
+    path.write_binary(data)
+    with XcallPool(size=1, inner=FakeTransport()) as pool:
+        cub = Bear(transport=pool)
+        made = cub.create(title="Pooled", text="body")
+        note = cub.add_file(id=made['identifier'],
+                            content=pathlib_path(path), mode="append")
+        assert note['note'].endswith("[file:doc.pdf]")
+        assert cub.open_note(id=made['identifier'])['note'] == note['note']
+
+
+# -----------------------------------------------------------------------------
+def pathlib_path(tmppath):
+    """
+    Turn a py.path from tmpdir into a pathlib.Path
+    """
+    return pathlib.Path(tmppath.strpath)
+
+
+class Dribble(object):
+    """
+    A file-like object with no file descriptor whose read() comes up short
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, data):
+        """
+        Hold *data*
+        """
+        self.data = data
+
+    # -------------------------------------------------------------------------
+    def read(self, size):
+        """
+        Return at most 7 bytes
+        """
+        rval, self.data = self.data[:7], self.data[7:]
+        return rval
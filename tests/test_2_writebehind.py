@@ -0,0 +1,188 @@
+"""
+Tests for the write-behind journal
+"""
+from bear import Bear, Bearror
+from bear.cache import NoteCache
+from bear.fake import FakeTransport
+from bear.writebehind import Entry, Journal
+import pytest
+import threading
+
+
+class Flaky(FakeTransport):
+    """
+    A fake Bear that times out on the calls whose numbers (from 0) are in
+    *fail*
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, fail=()):
+        """
+        Set up the failures
+        """
+        FakeTransport.__init__(self)
+        self.fail = set(fail)
+        self.count = 0
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Fail or answer
+        """
+        self.count += 1
+        if self.count - 1 in self.fail:
+            raise Bearror("xcall did not finish in 5 seconds")
+        return FakeTransport.call(self, url)
+
+
+class Gated(FakeTransport):
+    """
+    A fake Bear that holds add-text calls until its gate is open
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Start with the gate open
+        """
+        FakeTransport.__init__(self)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    # -------------------------------------------------------------------------
+    def call(self, url):
+        """
+        Wait for the gate if it's an add-text, then answer
+        """
+        if "/add-text?" in url:
+            self.gate.wait(5)
+        return FakeTransport.call(self, url)
+
+
+# -----------------------------------------------------------------------------
+def titles(fake):
+    """
+    Return the titles of the live notes in *fake*
+    """
+    return sorted(_.title for _ in fake.notes.values() if not _.trashed)
+
+
+# -----------------------------------------------------------------------------
+def test_write_behind(tmpdir):
+    """
+    Writes return an Entry at once and land in order; reads go straight
+    through
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    journal = Journal(tmpdir.join("journal.db").strpath)
+    cub = Bear(transport=fake, journal=journal)
+    entry = cub.create(title="Later", text="body")
+    assert isinstance(entry, Entry)
+    more = cub.add_text(title="Later", text="more", mode="append")
+    made = entry.wait(5)
+    assert made['title'] == "Later"
+    more.wait(5)
+    assert cub.open_note(id=made['identifier'])['note'].endswith("more")
+    assert journal.drain(5) == 0
+    assert journal.counts() == {'done': 2}
+    assert journal.entry(entry.seq).result == made
+    journal.close()
+
+
+# -----------------------------------------------------------------------------
+def test_cache_follows_delivery(tmpdir):
+    """
+    A read while a write is queued can't leave the old note in the cache
+    once the write lands
+    """
+    pytest.dbgfunc()
+    fake = Gated()
+    nid = fake.add_note("# T\nbody")
+    journal = Journal(tmpdir.join("journal.db").strpath)
+    cub = Bear(transport=fake, cache=NoteCache(), journal=journal)
+    assert cub.open_note(id=nid)['note'] == "# T\nbody"
+    fake.gate.clear()
+    cub.add_text(id=nid, text="new line", mode="append")
+    assert cub.open_note(id=nid)['note'] == "# T\nbody"
+    fake.gate.set()
+    assert journal.drain(5) == 0
+    assert cub.open_note(id=nid)['note'] == "# T\nbody\nnew line"
+    journal.close()
+
+
+# -----------------------------------------------------------------------------
+def test_failure_moves_on(tmpdir):
+    """
+    A write Bear refuses is marked failed and the next one still goes
+    """
+    pytest.dbgfunc()
+    fake = FakeTransport()
+    journal = Journal(tmpdir.join("journal.db").strpath)
+    cub = Bear(transport=fake, journal=journal)
+    bad = cub.add_text(id="nonesuch", text="lost", mode="append")
+    good = cub.create(title="Fine", text="body")
+    journal.drain(5)
+    with pytest.raises(Bearror) as err:
+        bad.wait(5)
+    assert "failed" in str(err.value)
+    assert good.wait(5)['title'] == "Fine"
+    assert journal.counts() == {'done': 1, 'failed': 1}
+    journal.close()
+
+
+# -----------------------------------------------------------------------------
+def test_recover(tmpdir):
+    """
+    After a crash, an interrupted trash is sent again but an interrupted
+    create waits for someone to say whether it landed
+    """
+    pytest.dbgfunc()
+    path = tmpdir.join("journal.db").strpath
+    fake = FakeTransport()
+    made = Bear(transport=fake).create(title="Doomed", text="body")
+    journal = Journal(path)
+    first = journal.route('create', {'title': "Maybe", 'text': "body"})
+    journal.route('trash', {'id': made['identifier']})
+    journal.route('create', {'title': "After", 'text': "body"})
+    journal.db.execute("update journal set state = 'sent' where seq < 3")
+    journal.db.close()
+
+    journal = Journal(path)
+    assert journal.counts() == {'queued': 2, 'unknown': 1}
+    assert [_.seq for _ in journal.unknown()] == [first.seq]
+    Bear(transport=fake, journal=journal)
+    assert journal.drain(5) == 2
+    assert titles(fake) == ["Doomed"]
+    with pytest.raises(Bearror):
+        journal.resolve(first.seq + 1, resend=True)
+
+    journal.resolve(first.seq, resend=False)
+    assert journal.drain(5) == 0
+    assert titles(fake) == ["After"]
+    assert journal.entry(first.seq).state == "skipped"
+    journal.close()
+
+
+# -----------------------------------------------------------------------------
+def test_timeouts(tmpdir):
+    """
+    A timed out trash is retried; a timed out create is unknown
+    """
+    pytest.dbgfunc()
+    fake = Flaky()
+    made = Bear(transport=fake).create(title="Old", text="body")
+    fake.fail = {fake.count, fake.count + 2}
+    journal = Journal(tmpdir.join("journal.db").strpath, backoff=0.01)
+    cub = Bear(transport=fake, journal=journal)
+    gone = cub.trash(id=made['identifier'])
+    maybe = cub.create(title="New", text="body")
+    gone.wait(5)
+    with pytest.raises(Bearror) as err:
+        maybe.wait(5)
+    assert "unknown" in str(err.value)
+    assert titles(fake) == []
+    journal.resolve(maybe.seq, resend=True)
+    assert journal.drain(5) == 0
+    assert titles(fake) == ["New"]
+    journal.close()